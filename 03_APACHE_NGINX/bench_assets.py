@@ -0,0 +1,115 @@
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import build_assets
+
+# Generates a synthetic site (hand-indented pages with comments, a stylesheet, scripts,
+# SVG icons and images), builds it with build_assets and prints bytes on the wire before
+# and after.
+
+PAGES = int(os.environ.get('BENCH_PAGES', 200))
+WORDS = ['cloud', 'instance', 'bucket', 'scaling', 'latency', 'request', 'cache', 'server', 'deploy',
+         'region', 'network', 'storage', 'metric', 'health', 'traffic', 'website', 'static', 'content']
+
+
+def paragraph(rng, words=60):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+def generate(root, rng):
+    rules = []
+    for number in range(400):
+        rules.append(f"""/* Component {number} */
+.component-{number} {{
+    margin: {rng.randint(0, 20)}px {rng.randint(0, 20)}px;
+    padding: {rng.randint(0, 20)}px;
+    color: #{rng.randrange(0xffffff):06x};
+    background-image: url("../img/icon{number % 20}.svg");
+}}
+""")
+    write(os.path.join(root, 'css', 'site.css'), '\n'.join(rules))
+
+    functions = []
+    for number in range(300):
+        functions.append(f"""// Handler {number}: updates the widget when the user interacts with it
+function handler{number}(event) {{
+    /* Look the element up each time, the page may have re-rendered */
+    var element = document.querySelector(".component-{number}");
+    if (!element) {{
+        return null;   // nothing to do
+    }}
+    element.textContent = "Clicked " + {number} + " // not a comment";
+    return element.className.replace(/component-\\d+/g, "active");
+}}
+""")
+    write(os.path.join(root, 'js', 'app.js'), '\n'.join(functions))
+
+    for number in range(20):
+        write(os.path.join(root, 'img', f"icon{number}.svg"),
+              f"""<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24">
+    <!-- icon {number} -->
+    <circle cx="12" cy="12" r="{rng.randint(4, 11)}" fill="#{rng.randrange(0xffffff):06x}"/>
+    <path d="M{rng.randint(0, 24)} {rng.randint(0, 24)} L{rng.randint(0, 24)} {rng.randint(0, 24)} Z" stroke="black"/>
+</svg>
+""")
+    for number in range(10):
+        with open(os.path.join(root, 'img', f"photo{number}.jpg"), 'wb') as f:
+            f.write(os.urandom(50_000))  # already compressed, like a real JPEG
+
+    for number in range(PAGES):
+        sections = '\n'.join(f"""        <!-- section {s} -->
+        <section class="component-{rng.randrange(400)}">
+            <h2>Section {s}</h2>
+            <p>
+                {paragraph(rng)}
+            </p>
+            <img src="img/photo{rng.randrange(10)}.jpg" alt="photo">
+        </section>""" for s in range(8))
+        write(os.path.join(root, f"page{number}.html"), f"""<!DOCTYPE html>
+<html>
+    <head>
+        <title>Page {number}</title>
+        <link rel="stylesheet" href="css/site.css">
+        <script src="js/app.js"></script>
+    </head>
+    <body>
+        <nav>
+            <a href="/page{(number + 1) % PAGES}.html">Next</a>
+        </nav>
+{sections}
+    </body>
+</html>
+""")
+
+
+def main():
+    rng = random.Random(7)
+    workdir = tempfile.mkdtemp()
+    try:
+        source = os.path.join(workdir, 'site')
+        output = os.path.join(workdir, 'dist')
+        generate(source, rng)
+        start = time.perf_counter()
+        stats = build_assets.build(source, output)
+        elapsed = time.perf_counter() - start
+        print(f"{len(stats)} files built in {elapsed:.2f}s")
+        print("All files:")
+        build_assets.print_report(stats, per_file=False)
+        print("Text assets only (HTML, CSS, JS, SVG):")
+        build_assets.print_report([entry for entry in stats if entry['file'].endswith(build_assets.COMPRESSIBLE)],
+                                  per_file=False)
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+import boto3
+from moto.server import ThreadedMotoServer
+
+import s3sync
+
+# Syncs a synthetic website from a local moto S3 server three times: into an empty
+# docroot, again with nothing changed, and after changing a few objects. The first run
+# is also compared with a serial copy of every object, like `aws s3 cp --recursive`.
+
+FILES = int(os.environ.get('BENCH_FILES', 300))
+FILE_SIZE = int(os.environ.get('BENCH_FILE_SIZE', 64 * 1024))
+LARGE_FILE_SIZE = 40 * 1024 * 1024
+PORT = int(os.environ.get('BENCH_PORT', 5056))
+BUCKET = 'bench-website'
+PREFIX = 'Website/'
+
+
+def serial_copy(s3, destination):
+    start = time.perf_counter()
+    transferred = 0
+    for item in s3sync.list_remote(s3, BUCKET, PREFIX).values():
+        path = os.path.join(destination, item['key'][len(PREFIX):])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        s3.download_file(BUCKET, item['key'], path)
+        transferred += item['size']
+    return {'bytes': transferred, 'seconds': time.perf_counter() - start}
+
+
+def report(label, stats):
+    print(f"{label:28} {stats['bytes'] / 1e6:9.2f} MB {stats['seconds']:8.2f} s"
+          + (f"  {stats['downloaded']} downloaded, {stats['skipped']} unchanged" if 'downloaded' in stats else ''))
+
+
+def main():
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = ThreadedMotoServer(port=PORT, verbose=False)
+    server.start()
+    workdir = tempfile.mkdtemp()
+    try:
+        endpoint = f"http://127.0.0.1:{PORT}"
+        os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+        os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+        os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+        s3 = s3sync.make_client(endpoint_url=endpoint)
+        s3.create_bucket(Bucket=BUCKET)
+        for number in range(FILES):
+            s3.put_object(Bucket=BUCKET, Key=f"{PREFIX}pages/page{number}.html", Body=os.urandom(FILE_SIZE))
+        s3.upload_file(__file__, BUCKET, f"{PREFIX}index.html")
+        with tempfile.NamedTemporaryFile() as large:
+            large.write(os.urandom(LARGE_FILE_SIZE))
+            large.flush()
+            s3.upload_file(large.name, BUCKET, f"{PREFIX}media/video.bin")
+        print(f"{FILES + 2} objects, {(FILES * FILE_SIZE + LARGE_FILE_SIZE) / 1e6:.1f} MB")
+
+        report('serial copy', serial_copy(boto3.client('s3', endpoint_url=endpoint), os.path.join(workdir, 'serial')))
+
+        docroot = os.path.join(workdir, 'html')
+        manifest = os.path.join(workdir, 'manifest.json')
+        report('sync, empty docroot', s3sync.sync(s3, BUCKET, PREFIX, docroot, manifest))
+        report('sync, nothing changed', s3sync.sync(s3, BUCKET, PREFIX, docroot, manifest))
+        for number in range(5):
+            s3.put_object(Bucket=BUCKET, Key=f"{PREFIX}pages/page{number}.html", Body=os.urandom(FILE_SIZE))
+        report('sync, 5 objects changed', s3sync.sync(s3, BUCKET, PREFIX, docroot, manifest))
+    finally:
+        shutil.rmtree(workdir)
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,455 @@
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+import sys
+
+try:
+    import brotli  # optional: pip install brotli; without it only .gz variants are built
+except ImportError:
+    brotli = None
+
+# Build stage for the static site. HTML, CSS and JS are minified, every asset other than
+# the HTML pages gets its content hash in the file name (so it can be cached for a year),
+# references to assets are rewritten to the hashed names, and compressible files get .gz
+# and .br siblings at maximum compression. The generated Apache and Nginx snippets serve
+# those siblings directly, so the web server never compresses on the fly.
+#
+# --publish uploads the build to the S3 prefix the web server's s3sync pulls from, with
+# Content-Type, Content-Encoding and Cache-Control on every object, so the bucket can
+# also be served directly or through CloudFront. Publishing is always this explicit
+# step, never a side effect of launching a web server. The snippets and the
+# asset-manifest.json (original -> hashed names) are written next to the build
+# (--config-dir), not into it, so they are never published or served.
+
+COMPRESSIBLE = ('.html', '.htm', '.css', '.js', '.mjs', '.svg', '.json', '.xml', '.txt', '.ico')
+HASH_LENGTH = 8
+HERE = os.path.dirname(os.path.abspath(__file__))
+CONTENT_ENCODINGS = {'.gz': 'gzip', '.br': 'br'}
+CACHEABLE_PATTERN = r"\.[0-9a-f]{%d}\.(css|js|mjs|svg|png|jpe?g|gif|webp|avif|ico|woff2?|ttf|json)" % HASH_LENGTH
+PRECOMPRESSED_TYPES = {
+    'html': 'text/html', 'css': 'text/css', 'js': 'application/javascript', 'mjs': 'application/javascript',
+    'svg': 'image/svg+xml', 'json': 'application/json', 'xml': 'application/xml', 'txt': 'text/plain',
+}
+BLOCK_TAGS = {
+    '!doctype', 'html', 'head', 'body', 'title', 'meta', 'link', 'script', 'style', 'div', 'p', 'h1', 'h2',
+    'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'li', 'dl', 'dt', 'dd', 'table', 'thead', 'tbody', 'tfoot', 'tr',
+    'td', 'th', 'section', 'article', 'aside', 'header', 'footer', 'nav', 'main', 'form', 'fieldset',
+    'br', 'hr', 'noscript', 'figure', 'figcaption', 'blockquote',
+}
+
+
+# --- minifiers ---
+
+def minify_css(css):
+    css = re.sub(r"/\*.*?\*/", '', css, flags=re.S)
+    css = re.sub(r"\s+", ' ', css)
+    # Spaces before ':' stay: 'a :hover' and 'a:hover' are different selectors
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    css = re.sub(r":\s+", ':', css)
+    css = css.replace(';}', '}')
+    return css.strip()
+
+
+def minify_js(js):
+    """Remove comments and indentation; strings, template literals and regexes are left intact"""
+    out = []
+    i = 0
+    length = len(js)
+    previous = ''  # last significant character written, to tell a regex from a division
+    while i < length:
+        char = js[i]
+        following = js[i + 1] if i + 1 < length else ''
+        if char in '\'"`':
+            end = i + 1
+            while end < length and js[end] != char:
+                end += 2 if js[end] == '\\' else 1
+            out.append(js[i:end + 1])
+            i = end + 1
+            previous = char
+        elif char == '/' and following == '*':
+            end = js.find('*/', i + 2)
+            i = length if end == -1 else end + 2
+        elif char == '/' and following == '/':
+            end = js.find('\n', i)
+            i = length if end == -1 else end
+        elif char == '/' and (not previous or previous in '(,=:[!&|?{};+-*%<>~^'):
+            end = i + 1
+            in_class = False
+            while end < length and (js[end] != '/' or in_class) and js[end] != '\n':
+                if js[end] == '\\':
+                    end += 1
+                elif js[end] == '[':
+                    in_class = True
+                elif js[end] == ']':
+                    in_class = False
+                end += 1
+            out.append(js[i:end + 1])
+            i = end + 1
+            previous = '/'
+        else:
+            out.append(char)
+            if not char.isspace():
+                previous = char
+            i += 1
+    lines = (line.strip() for line in ''.join(out).splitlines())
+    # Newlines are kept so automatic semicolon insertion still sees them
+    return '\n'.join(line for line in lines if line)
+
+
+def minify_html(html):
+    preserved = []
+
+    def keep(match):
+        tag = match.group(1).lower()
+        body = match.group(2)
+        if tag == 'style':
+            body = minify_css(body)
+        elif tag == 'script' and 'src=' not in match.group(0)[:match.start(2) - match.start(0)]:
+            body = minify_js(body)
+        preserved.append(match.group(0)[:match.start(2) - match.start(0)] + body + f"</{match.group(1)}>")
+        # Looks like the original tag to the whitespace rules below
+        return f"<{tag} \0{len(preserved) - 1}\0>"
+
+    html = re.sub(r"<(pre|textarea|script|style)\b[^>]*>(.*?)</\1\s*>", keep, html, flags=re.S | re.I)
+    # Comments, except conditional comments
+    html = re.sub(r"<!--(?!\[if).*?-->", '', html, flags=re.S)
+    html = re.sub(r"\s+", ' ', html)
+
+    def between_tags(match):
+        # Whitespace next to a block-level tag does not render
+        names = [re.match(r"</?([!\w]+)", tag) for tag in (match.group(1), match.group(2))]
+        if any(name and name.group(1).lower() in BLOCK_TAGS for name in names):
+            return match.group(1)
+        return match.group(0)
+
+    html = re.sub(r"(<[^>]+>) (?=(<[^>]+>))", between_tags, html)
+    blocks = '|'.join(sorted(BLOCK_TAGS - {'!doctype'}))
+    html = re.sub(r"(<(?:%s)\b[^>]*>) " % blocks, r"\1", html, flags=re.I)
+    html = re.sub(r" (</(?:%s)>)" % blocks, r"\1", html, flags=re.I)
+    html = re.sub(r"<\w+ \0(\d+)\0>", lambda match: preserved[int(match.group(1))], html)
+    return html.strip()
+
+
+MINIFIERS = {'.html': minify_html, '.htm': minify_html, '.css': minify_css, '.js': minify_js, '.mjs': minify_js}
+
+
+# --- hashing and reference rewriting ---
+
+def hashed_name(relative, content):
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    root, extension = posixpath.splitext(relative)
+    return f"{root}.{digest}{extension}"
+
+
+def rewrite_references(text, relative, renamed):
+    """Point src/href attributes and CSS url()s that name a renamed asset at its hashed name"""
+    directory = posixpath.dirname(relative)
+
+    def replace(url):
+        if re.match(r"^([a-z]+:|//|#|data:)", url, re.I):
+            return url
+        path, separator, rest = url.partition('?')
+        if not separator:
+            path, separator, rest = url.partition('#')
+        absolute = path.startswith('/')
+        target = posixpath.normpath(path.lstrip('/') if absolute else posixpath.join(directory, path))
+        if target not in renamed:
+            return url
+        new = renamed[target]
+        new = '/' + new if absolute else posixpath.relpath(new, directory or '.')
+        return new + separator + rest
+
+    text = re.sub(r"""((?:src|href)\s*=\s*)(["'])([^"']+)\2""",
+                  lambda m: m.group(1) + m.group(2) + replace(m.group(3)) + m.group(2), text, flags=re.I)
+    text = re.sub(r"""url\(\s*(["']?)([^"')]+)\1\s*\)""",
+                  lambda m: f"url({m.group(1)}{replace(m.group(2))}{m.group(1)})", text)
+    return text
+
+
+# --- compression ---
+
+def compress_variants(path, content):
+    """Write .gz and .br next to path when they are smaller; return {'gz': bytes, 'br': bytes}"""
+    sizes = {}
+    if not path.endswith(COMPRESSIBLE):
+        return sizes
+    # mtime=0 keeps the .gz identical for identical input
+    variants = [('gz', gzip.compress(content, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('br', brotli.compress(content, quality=11)))
+    for suffix, compressed in variants:
+        if len(compressed) < len(content):
+            with open(f"{path}.{suffix}", 'wb') as f:
+                f.write(compressed)
+            sizes[suffix] = len(compressed)
+    return sizes
+
+
+# --- build ---
+
+def collect(source):
+    files = []
+    for directory, subdirs, names in os.walk(source):
+        subdirs[:] = sorted(d for d in subdirs if not d.startswith('.'))
+        for name in sorted(names):
+            if name.startswith('.') or name.endswith(('.gz', '.br')):
+                continue
+            files.append(os.path.relpath(os.path.join(directory, name), source).replace(os.sep, '/'))
+    return files
+
+
+def _order(relative):
+    # Assets that reference nothing first, then CSS, then JS, pages last
+    extension = posixpath.splitext(relative)[1].lower()
+    return {'.css': 1, '.js': 2, '.mjs': 2, '.html': 3, '.htm': 3}.get(extension, 0)
+
+
+def build(source, output, include=None, manifest=None):
+    """Build source into output and return per-file statistics.
+
+    include optionally limits the build to these relative paths (e.g. only the site's
+    pages in a directory that also holds scripts). manifest is an optional path, outside
+    output, for the JSON map of original to hashed asset names.
+    """
+    files = [f for f in collect(source) if include is None or f in include]
+    if os.path.isdir(output):
+        shutil.rmtree(output)
+    renamed = {}
+    stats = []
+    for relative in sorted(files, key=lambda f: (_order(f), f)):
+        with open(os.path.join(source, relative), 'rb') as f:
+            original = f.read()
+        extension = posixpath.splitext(relative)[1].lower()
+        content = original
+        if extension in MINIFIERS:
+            text = content.decode('utf-8')
+            text = rewrite_references(MINIFIERS[extension](text), relative, renamed)
+            content = text.encode('utf-8')
+        target = relative if extension in ('.html', '.htm') else hashed_name(relative, content)
+        if target != relative:
+            renamed[relative] = target
+        path = os.path.join(output, target)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+        sizes = compress_variants(path, content)
+        # What Apache's mod_deflate (zlib level 6) sends for the unbuilt file today
+        deflated = len(gzip.compress(original, 6)) if relative.endswith(COMPRESSIBLE) else len(original)
+        stats.append({'file': relative, 'output': target, 'original': len(original),
+                      'deflated': min(deflated, len(original)), 'minified': len(content),
+                      'gz': sizes.get('gz'), 'br': sizes.get('br')})
+    if manifest:
+        os.makedirs(os.path.dirname(os.path.abspath(manifest)), exist_ok=True)
+        with open(manifest, 'w') as f:
+            json.dump(renamed, f, indent=2, sort_keys=True)
+    return stats
+
+
+def build_site(source=None, output=os.path.join(HERE, 'dist'), manifest=None):
+    """Build source, or the pages next to this script, into output"""
+    if source:
+        return build(source, output, manifest=manifest)
+    pages = {name for name in os.listdir(HERE) if name.endswith('.html')}
+    return build(HERE, output, include=pages, manifest=manifest)
+
+
+# --- publishing ---
+
+def object_metadata(relative):
+    """put_object arguments that let S3 serve relative the way the Apache snippet does"""
+    base, suffix = posixpath.splitext(relative)
+    metadata = {}
+    if suffix in CONTENT_ENCODINGS:
+        metadata['ContentEncoding'] = CONTENT_ENCODINGS[suffix]
+    else:
+        base = relative
+    extension = posixpath.splitext(base)[1].lstrip('.').lower()
+    content_type = PRECOMPRESSED_TYPES.get(extension) or mimetypes.guess_type(base)[0]
+    if content_type:
+        metadata['ContentType'] = content_type
+    if re.search(CACHEABLE_PATTERN + '$', base, re.I):
+        metadata['CacheControl'] = 'public, max-age=31536000, immutable'
+    elif extension in ('html', 'htm'):
+        metadata['CacheControl'] = 'no-cache'
+    return metadata
+
+
+def publish(s3, output, bucket, prefix, delete=False):
+    """Upload output (including .gz/.br) to s3://bucket/prefix; returns statistics.
+
+    Objects whose ETag already matches the local MD5 are skipped, so an unchanged build
+    uploads nothing and s3sync on the instances downloads nothing.
+    """
+    prefix = prefix.rstrip('/') + '/' if prefix else ''
+    remote = {}
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for item in page.get('Contents', []):
+            remote[item['Key'][len(prefix):]] = item['ETag'].strip('"')
+    stats = {'uploaded': 0, 'unchanged': 0, 'deleted': 0, 'bytes': 0}
+    local = set()
+    for directory, _, names in os.walk(output):
+        for name in sorted(names):
+            path = os.path.join(directory, name)
+            relative = os.path.relpath(path, output).replace(os.sep, '/')
+            local.add(relative)
+            with open(path, 'rb') as f:
+                content = f.read()
+            if remote.get(relative) == hashlib.md5(content).hexdigest():
+                stats['unchanged'] += 1
+                continue
+            s3.put_object(Bucket=bucket, Key=prefix + relative, Body=content, **object_metadata(relative))
+            stats['uploaded'] += 1
+            stats['bytes'] += len(content)
+    stale = sorted(set(remote) - local) if delete else []
+    for start in range(0, len(stale), 1000):
+        s3.delete_objects(Bucket=bucket, Delete={
+            'Objects': [{'Key': prefix + relative} for relative in stale[start:start + 1000]], 'Quiet': True
+        })
+    stats['deleted'] = len(stale)
+    return stats
+
+
+def parse_s3_url(url):
+    if not url.startswith('s3://'):
+        raise ValueError(f"Expected s3://bucket/prefix/, got {url}")
+    bucket, _, prefix = url[len('s3://'):].partition('/')
+    return bucket, prefix
+
+
+# --- server configuration ---
+
+def apache_config(docroot='/var/www/html'):
+    types = '|'.join(PRECOMPRESSED_TYPES)
+    forced = '\n'.join(
+        f"    <FilesMatch \"\\.{extension}\\.(br|gz)$\">\n        ForceType {mime}\n    </FilesMatch>"
+        for extension, mime in PRECOMPRESSED_TYPES.items()
+    )
+    return f"""# Generated by build_assets.py. Needs: a2enmod rewrite headers
+<Directory "{docroot}">
+    # Serve the .br/.gz built next to each file instead of compressing per request
+    RewriteEngine On
+    RewriteCond %{{HTTP:Accept-Encoding}} \\bbr\\b
+    RewriteCond %{{REQUEST_FILENAME}}.br -f
+    RewriteRule ^(.+\\.({types}))$ $1.br [L]
+    RewriteCond %{{HTTP:Accept-Encoding}} \\bgzip\\b
+    RewriteCond %{{REQUEST_FILENAME}}.gz -f
+    RewriteRule ^(.+\\.({types}))$ $1.gz [L]
+
+    RemoveType .gz .br
+    RemoveEncoding .gz .br
+{forced}
+    <FilesMatch "\\.br$">
+        SetEnv no-gzip 1
+        SetEnv no-brotli 1
+        Header set Content-Encoding br
+        Header append Vary Accept-Encoding
+    </FilesMatch>
+    <FilesMatch "\\.gz$">
+        SetEnv no-gzip 1
+        SetEnv no-brotli 1
+        Header set Content-Encoding gzip
+        Header append Vary Accept-Encoding
+    </FilesMatch>
+    <FilesMatch "\\.({types})$">
+        Header append Vary Accept-Encoding
+    </FilesMatch>
+
+    # Hashed names change whenever the content does, so they can be cached for good
+    <FilesMatch "{CACHEABLE_PATTERN}(\\.(br|gz))?$">
+        Header set Cache-Control "public, max-age=31536000, immutable"
+    </FilesMatch>
+    # Pages keep their names and must be revalidated
+    <FilesMatch "\\.html?(\\.(br|gz))?$">
+        Header set Cache-Control "no-cache"
+    </FilesMatch>
+</Directory>
+"""
+
+
+def nginx_config(brotli_module=False):
+    brotli_line = 'brotli_static on;' if brotli_module else (
+        '# brotli_static on;  # needs ngx_brotli (libnginx-mod-http-brotli-static)')
+    return f"""# Generated by build_assets.py. Include inside the server block.
+# Serve the .gz/.br built next to each file instead of compressing per request
+gzip off;
+gzip_static on;
+gzip_vary on;
+{brotli_line}
+
+# Hashed names change whenever the content does, so they can be cached for good
+location ~* "{CACHEABLE_PATTERN}$" {{
+    add_header Cache-Control "public, max-age=31536000, immutable";
+    access_log off;
+}}
+
+# Pages keep their names and must be revalidated
+location ~* \\.html?$ {{
+    add_header Cache-Control "no-cache";
+}}
+"""
+
+
+def print_report(stats, per_file=True):
+    print(f"{'file':40} {'original':>9} {'minified':>9} {'gzip':>9} {'brotli':>9}")
+    totals = {'original': 0, 'deflated': 0, 'minified': 0, 'gz': 0, 'br': 0}
+    for entry in stats:
+        gz = entry['gz'] or entry['minified']
+        br = entry['br'] or gz
+        if per_file:
+            print(f"{entry['file'][:40]:40} {entry['original']:9} {entry['minified']:9} {gz:9} {br:9}")
+        totals['original'] += entry['original']
+        totals['deflated'] += entry['deflated']
+        totals['minified'] += entry['minified']
+        totals['gz'] += gz
+        totals['br'] += br
+    print(f"{'total':40} {totals['original']:9} {totals['minified']:9} {totals['gz']:9} {totals['br']:9}")
+    print(f"  bytes on the wire, {'as-is, uncompressed':24} {totals['original']:9}")
+    print(f"  bytes on the wire, {'as-is, mod_deflate':24} {totals['deflated']:9}")
+    for key, label in (('gz', 'minified + gzip -9'), ('br', 'minified + brotli')):
+        saved = 100.0 * (1 - totals[key] / max(1, totals['deflated']))
+        print(f"  bytes on the wire, {label:24} {totals[key]:9} ({saved:5.1f}% less)")
+    if brotli is None:
+        print("  brotli is not installed, so no .br files were built (pip install brotli)")
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Minify, hash and precompress a static site')
+    parser.add_argument('source', nargs='?', help='site directory (default: the pages next to this script)')
+    parser.add_argument('--output', default=os.path.join(HERE, 'dist'))
+    parser.add_argument('--config-dir', default=os.path.join(HERE, 'server-config'),
+                        help='where the server snippets and asset manifest go; kept out of --output '
+                             'so they are not served')
+    parser.add_argument('--docroot', default='/var/www/html', help='document root for the Apache snippet')
+    parser.add_argument('--nginx-brotli', action='store_true', help='the Nginx build has the ngx_brotli module')
+    parser.add_argument('--publish', metavar='S3_URL',
+                        help='upload the build, e.g. to the s3://bucket/prefix/ ec2websiteStartUP.py syncs from')
+    parser.add_argument('--delete', action='store_true', help='with --publish, remove objects not in the build')
+    args = parser.parse_args()
+
+    os.makedirs(args.config_dir, exist_ok=True)
+    stats = build_site(args.source, args.output, os.path.join(args.config_dir, 'asset-manifest.json'))
+    with open(os.path.join(args.config_dir, 'apache-assets.conf'), 'w') as f:
+        f.write(apache_config(args.docroot))
+    with open(os.path.join(args.config_dir, 'nginx-assets.conf'), 'w') as f:
+        f.write(nginx_config(args.nginx_brotli))
+    print_report(stats)
+    print(f"Built into {args.output}; server snippets and asset manifest in {args.config_dir}")
+    if args.publish:
+        import boto3  # only needed for publishing
+        bucket, prefix = parse_s3_url(args.publish)
+        published = publish(boto3.client('s3'), args.output, bucket, prefix, args.delete)
+        print(f"Published to {args.publish}: {published['uploaded']} uploaded "
+              f"({published['bytes'] / 1e6:.2f} MB), {published['unchanged']} unchanged, "
+              f"{published['deleted']} deleted")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,19 +1,28 @@
-import boto3
-import time
 import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from aws_common import clients, registry, waiting
+import build_assets
 
 a=os.environ.get('AWS_ID')
 b=os.environ.get('AWS_SEC')
 print(a,b)
 
-ec2 = boto3.client('ec2')
-s3 = boto3.client('s3')
+# Shared client, created on first use
+ec2 = clients.lazy_client('ec2')
 
 aws_access_ley=os.environ.get
 
+# Published separately, never by launching an instance:
+#   python build_assets.py --publish s3://shauryatripathi22b/Website/
+WEBSITE_SOURCE = 's3://shauryatripathi22b/Website/'
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 's3sync.py')) as f:
+    s3sync_source = f.read()
+
 user_data_script = f"""#!/bin/bash
 apt update -y
-apt install -y apache2
+apt install -y apache2 python3-boto3
 systemctl start apache2
 systemctl enable apache2
 
@@ -25,76 +34,97 @@ sudo aws configure set aws_secret_access_key {b}
 sudo aws configure set default.region ap-south-1
 sudo aws configure set default.output json
 
-# Copy website files from S3 to EC2
-sudo aws s3 cp s3://shauryatripathi22b/Website/ /var/www/html/ --recursive
-
-# Log the output of the S3 copy command
-sudo aws s3 cp s3://shauryatripathi22b/Website/ /var/www/html/ --recursive > /tmp/s3_copy_log.txt 2>&1
+# Delta-only, parallel copy of the website from S3; runs again on every boot and then
+# only downloads what changed in the bucket
+cat > /usr/local/bin/s3sync.py <<'S3SYNC'
+{s3sync_source}
+S3SYNC
+cat > /var/lib/cloud/scripts/per-boot/s3sync.sh <<'BOOT'
+#!/bin/bash
+python3 /usr/local/bin/s3sync.py {WEBSITE_SOURCE} /var/www/html/ --delete > /tmp/s3_copy_log.txt 2>&1
+chown -R www-data:www-data /var/www/html
+BOOT
+chmod +x /var/lib/cloud/scripts/per-boot/s3sync.sh
+/var/lib/cloud/scripts/per-boot/s3sync.sh
+
+# Serve the .br/.gz files built by build_assets.py, with long-lived caching for hashed assets
+a2enmod rewrite headers
+cat > /etc/apache2/conf-available/precompressed-assets.conf <<'CONF'
+{build_assets.apache_config('/var/www/html')}
+CONF
+a2enconf precompressed-assets
+systemctl reload apache2
 
 # Ensure proper permissions
 chown -R www-data:www-data /var/www/html
 chmod -R 755 /var/www/html
 """
 
+def create_security_group():
+    security_group = ec2.create_security_group(
+        GroupName='WebServerSG',
+        Description='Security group for web server with port 80 open'
+    )
+
+    # Add inbound rule to allow HTTP traffic
+    ec2.authorize_security_group_ingress(
+        GroupId=security_group['GroupId'],
+        IpProtocol='tcp',
+        FromPort=80,
+        ToPort=80,
+        CidrIp='0.0.0.0/0'
+    )
+    return security_group['GroupId']
+
 def get_or_create_security_group():
-    try:
-        security_groups = ec2.describe_security_groups(GroupNames=['WebServerSG'])
-        return security_groups['SecurityGroups'][0]['GroupId']
-    except ec2.exceptions.ClientError:
-        security_group = ec2.create_security_group(
-            GroupName='WebServerSG',
-            Description='Security group for web server with port 80 open'
-        )
-        
-        # Add inbound rule to allow HTTP traffic
-        ec2.authorize_security_group_ingress(
-            GroupId=security_group['GroupId'],
-            IpProtocol='tcp',
-            FromPort=80,
-            ToPort=80,
-            CidrIp='0.0.0.0/0'
-        )
-        return security_group['GroupId']
-
-# Get or create security group
-security_group_id = get_or_create_security_group()
-
-# Check if an instance with this security group already exists
-instances = ec2.describe_instances(
-    Filters=[
-        {'Name': 'instance-state-name', 'Values': ['running', 'pending']},
-        {'Name': 'instance.group-id', 'Values': [security_group_id]}
-    ]
-)
-
-if instances['Reservations']:
-    # Use existing instance
-    instance_id = instances['Reservations'][0]['Instances'][0]['InstanceId']
-    print(f"Using existing instance: {instance_id}")
-else:
-    response = ec2.run_instances(
-        ImageId='ami-0522ab6e1ddcc7055',
-        InstanceType='t2.micro',
-        MinCount=1,
-        MaxCount=1,
-        UserData=user_data_script,
-        SecurityGroupIds=[security_group_id],
-        KeyName='test1'  # Replace with your key pair name
+    return registry.security_group_id(ec2, 'WebServerSG', create=create_security_group)
+
+def main():
+    # Get or create security group
+    security_group_id = get_or_create_security_group()
+
+    # Check if an instance with this security group already exists
+    instances = ec2.describe_instances(
+        Filters=[
+            {'Name': 'instance-state-name', 'Values': ['running', 'pending']},
+            {'Name': 'instance.group-id', 'Values': [security_group_id]}
+        ]
     )
-    instance_id = response['Instances'][0]['InstanceId']
-    print(f"Launched new instance: {instance_id}")
-
-# Wait for the instance to be in 'running' state
-while True:
-    instances = ec2.describe_instances(InstanceIds=[instance_id])
-    state = instances['Reservations'][0]['Instances'][0]['State']['Name']
-    if state == 'running':
-        break
-    print("Instance is starting... waiting 10 seconds")
-    time.sleep(10)
-
-instances = ec2.describe_instances(InstanceIds=[instance_id])
-public_dns = instances['Reservations'][0]['Instances'][0]['PublicDnsName']
-
-print(f"Instance is now running. Public DNS: {public_dns}")
-print("You can now open this DNS in a browser to verify if the static website works.")
\ No newline at end of file
+
+    if instances['Reservations']:
+        # Use existing instance
+        instance_id = instances['Reservations'][0]['Instances'][0]['InstanceId']
+        print(f"Using existing instance: {instance_id}")
+    else:
+        # A group deleted since it was cached is looked up or recreated on the next run
+        with registry.forget_on_not_found(registry.security_group_key(ec2, 'WebServerSG')):
+            response = ec2.run_instances(
+                ImageId='ami-0522ab6e1ddcc7055',
+                InstanceType='t2.micro',
+                MinCount=1,
+                MaxCount=1,
+                UserData=user_data_script,
+                SecurityGroupIds=[security_group_id],
+                KeyName='test1'  # Replace with your key pair name
+            )
+        instance_id = response['Instances'][0]['InstanceId']
+        print(f"Launched new instance: {instance_id}")
+
+    # Wait for the instance to be in 'running' state
+    def instance_running():
+        instances = ec2.describe_instances(InstanceIds=[instance_id])
+        instance = instances['Reservations'][0]['Instances'][0]
+        print(f"Instance state: {instance['State']['Name']}")
+        return instance['State']['Name'] == 'running' and instance
+
+    # A freshly launched instance is briefly unknown to describe_instances
+    instance = waiting.wait_until(instance_running, timeout=300, initial=2, maximum=15,
+                                  description=f"instance {instance_id}",
+                                  retry_codes=('InvalidInstanceID.NotFound',))
+    public_dns = instance['PublicDnsName']
+
+    print(f"Instance is now running. Public DNS: {public_dns}")
+    print("You can now open this DNS in a browser to verify if the static website works.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+
+# Delta-only sync of an S3 prefix into a local directory, used by the web server's boot
+# script instead of `aws s3 cp --recursive`. The prefix is listed page by page, each
+# object's ETag and size are compared with a manifest from the previous run, and only new
+# or changed objects are downloaded, concurrently, with multipart for large files. Every
+# file is written to a temporary name and renamed into place, so Apache never serves a
+# half-written page. The manifest lives outside the docroot so it is never served.
+
+DEFAULT_WORKERS = 16
+MULTIPART_THRESHOLD = 8 * 1024 * 1024
+MANIFEST_DIR = '/var/lib/s3sync'
+TEMP_SUFFIX = '.s3sync-tmp'
+
+
+def parse_s3_url(url):
+    if not url.startswith('s3://'):
+        raise ValueError(f"Expected s3://bucket/prefix, got {url}")
+    bucket, _, prefix = url[len('s3://'):].partition('/')
+    return bucket, prefix
+
+
+def default_manifest_path(bucket, prefix, destination):
+    name = f"{bucket}-{prefix}-{os.path.abspath(destination)}".replace('/', '_').strip('_')
+    return os.path.join(MANIFEST_DIR, f"{name}.json")
+
+
+def list_remote(s3, bucket, prefix):
+    """{relative path: {'key', 'etag', 'size'}} for every object under prefix"""
+    remote = {}
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for item in page.get('Contents', []):
+            relative = item['Key'][len(prefix):].lstrip('/')
+            # Zero-byte "folder" placeholders created by the console
+            if not relative or relative.endswith('/'):
+                continue
+            remote[relative] = {'key': item['Key'], 'etag': item['ETag'].strip('"'), 'size': item['Size']}
+    return remote
+
+
+def load_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(path, manifest):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temporary = path + TEMP_SUFFIX
+    with open(temporary, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(temporary, path)
+
+
+def plan(remote, manifest, destination):
+    """Return (changed, stale): paths to download and paths no longer in the bucket"""
+    changed = []
+    for relative, entry in remote.items():
+        local = os.path.join(destination, relative)
+        if manifest.get(relative) != entry or not os.path.isfile(local) or os.path.getsize(local) != entry['size']:
+            changed.append(relative)
+    stale = [relative for relative in manifest if relative not in remote]
+    return sorted(changed), sorted(stale)
+
+
+def _safe_path(destination, relative):
+    path = os.path.abspath(os.path.join(destination, relative))
+    if not path.startswith(os.path.abspath(destination) + os.sep):
+        raise ValueError(f"Refusing to write outside {destination}: {relative}")
+    return path
+
+
+def download(s3, bucket, key, path, transfer_config):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = path + TEMP_SUFFIX
+    try:
+        s3.download_file(bucket, key, temporary, Config=transfer_config)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+def sync(s3, bucket, prefix, destination, manifest_path=None, workers=DEFAULT_WORKERS, delete=False):
+    """Bring destination up to date with s3://bucket/prefix and return transfer statistics"""
+    start = time.perf_counter()
+    manifest_path = manifest_path or default_manifest_path(bucket, prefix, destination)
+    manifest = load_manifest(manifest_path)
+    remote = list_remote(s3, bucket, prefix)
+    changed, stale = plan(remote, manifest, destination)
+
+    transfer_config = TransferConfig(multipart_threshold=MULTIPART_THRESHOLD,
+                                     multipart_chunksize=MULTIPART_THRESHOLD, max_concurrency=4)
+    stats = {'listed': len(remote), 'downloaded': 0, 'skipped': len(remote) - len(changed),
+             'deleted': 0, 'failed': 0, 'bytes': 0}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(download, s3, bucket, remote[relative]['key'],
+                        _safe_path(destination, relative), transfer_config): relative
+            for relative in changed
+        }
+        for future in as_completed(futures):
+            relative = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                stats['failed'] += 1
+                manifest.pop(relative, None)
+                print(f"Failed to download {relative}: {e}", file=sys.stderr)
+                continue
+            manifest[relative] = remote[relative]
+            stats['downloaded'] += 1
+            stats['bytes'] += remote[relative]['size']
+
+    for relative in stale:
+        if delete:
+            try:
+                os.remove(_safe_path(destination, relative))
+                stats['deleted'] += 1
+            except FileNotFoundError:
+                pass
+        manifest.pop(relative, None)
+
+    save_manifest(manifest_path, manifest)
+    stats['seconds'] = time.perf_counter() - start
+    return stats
+
+
+def make_client(workers=DEFAULT_WORKERS, endpoint_url=None):
+    # Each worker may run up to max_concurrency multipart threads of its own
+    return boto3.client('s3', endpoint_url=endpoint_url,
+                        config=Config(max_pool_connections=workers * 4, retries={'mode': 'adaptive'}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Download only new or changed objects from an S3 prefix')
+    parser.add_argument('source', help='s3://bucket/prefix/')
+    parser.add_argument('destination', help='local directory, e.g. /var/www/html')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--manifest', help=f"manifest path (default under {MANIFEST_DIR})")
+    parser.add_argument('--delete', action='store_true', help='remove local files deleted from the bucket')
+    parser.add_argument('--endpoint-url', help='S3-compatible endpoint, e.g. a local test server')
+    args = parser.parse_args()
+
+    bucket, prefix = parse_s3_url(args.source)
+    stats = sync(make_client(args.workers, args.endpoint_url), bucket, prefix, args.destination,
+                 args.manifest, args.workers, args.delete)
+    print(f"{stats['downloaded']} downloaded ({stats['bytes'] / 1e6:.2f} MB), {stats['skipped']} unchanged, "
+          f"{stats['deleted']} deleted, {stats['failed']} failed of {stats['listed']} objects "
+          f"in {stats['seconds']:.2f}s")
+    sys.exit(1 if stats['failed'] else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+import logging
+import os
+import time
+
+import boto3
+from moto.server import ThreadedMotoServer
+
+from fleet import FleetManager
+
+# Runs a moto server locally, launches BENCH_INSTANCES instances split over two groups
+# and compares per-instance calls (the old lab4 pattern) with FleetManager, counting
+# API calls and wall time for launch, describe, health and terminate.
+
+INSTANCES = int(os.environ.get('BENCH_INSTANCES', 400))
+PORT = int(os.environ.get('BENCH_PORT', 5055))
+AMAZON_LINUX_AMI = 'ami-02b49a24cfb95941c'
+UBUNTU_AMI = 'ami-0522ab6e1ddcc7055'
+
+
+class CallCounter:
+    def __init__(self, client):
+        self.count = 0
+        client.meta.events.register('before-call.ec2.*', self._count)
+
+    def _count(self, **kwargs):
+        self.count += 1
+
+
+def make_client():
+    client = boto3.client(
+        'ec2', region_name='us-east-1', endpoint_url=f"http://127.0.0.1:{PORT}",
+        aws_access_key_id='testing', aws_secret_access_key='testing'
+    )
+    return client
+
+
+def timed(label, counter, fn):
+    before = counter.count
+    start = time.perf_counter()
+    result = fn()
+    print(f"  {label:10} {time.perf_counter() - start:8.2f} s {counter.count - before:6} calls")
+    return result
+
+
+def sequential(ec2, counter):
+    print("Per-instance calls:")
+    half = INSTANCES // 2
+
+    def launch():
+        ids = []
+        for ami, count in ((AMAZON_LINUX_AMI, half), (UBUNTU_AMI, INSTANCES - half)):
+            for _ in range(count):
+                response = ec2.run_instances(ImageId=ami, InstanceType='t2.micro', MinCount=1, MaxCount=1)
+                ids.append(response['Instances'][0]['InstanceId'])
+        return ids
+
+    ids = timed('launch', counter, launch)
+    timed('describe', counter, lambda: [ec2.describe_instances(InstanceIds=[i]) for i in ids])
+    timed('health', counter, lambda: [ec2.describe_instance_status(InstanceIds=[i]) for i in ids])
+
+    def terminate():
+        for i in ids:
+            ec2.terminate_instances(InstanceIds=[i])
+            ec2.get_waiter('instance_terminated').wait(InstanceIds=[i], WaiterConfig={'Delay': 1})
+
+    timed('terminate', counter, terminate)
+
+
+def batched(ec2, counter):
+    print("FleetManager:")
+    fleet = FleetManager(ec2)
+    half = INSTANCES // 2
+    groups = {
+        'amazon-linux': {'ImageId': AMAZON_LINUX_AMI, 'InstanceType': 't2.micro', 'count': half},
+        'ubuntu': {'ImageId': UBUNTU_AMI, 'InstanceType': 't2.micro', 'count': INSTANCES - half},
+    }
+    launched = timed('launch', counter, lambda: fleet.launch_groups(groups))
+    ids = [i for group in launched.values() for i in group]
+    timed('describe', counter, lambda: fleet.describe(ids))
+    timed('health', counter, lambda: fleet.health(ids))
+    timed('terminate', counter, lambda: fleet.terminate(ids))
+
+
+def main():
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = ThreadedMotoServer(port=PORT, verbose=False)
+    server.start()
+    try:
+        for run in (sequential, batched):
+            ec2 = make_client()
+            counter = CallCounter(ec2)
+            run(ec2, counter)
+            print(f"  {'total':10} {'':8}   {counter.count:6} calls")
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
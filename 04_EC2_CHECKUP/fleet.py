@@ -0,0 +1,103 @@
+from concurrent.futures import ThreadPoolExecutor
+
+# Fleet-level EC2 operations for the checkup lab. Instance IDs are sent in chunks the
+# APIs accept, every describe goes through a paginator, groups of different AMIs and
+# instance types launch concurrently, and state changes wait once per chunk rather
+# than once per instance.
+
+# DescribeInstanceStatus rejects MaxResults together with InstanceIds, and filters
+# take at most 200 values, so 200 IDs per call keeps every operation in range.
+ID_BATCH_SIZE = 200
+DESCRIBE_PAGE_SIZE = 1000
+
+
+def chunks(items, size=ID_BATCH_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class FleetManager:
+    def __init__(self, ec2_client, max_workers=8):
+        self.ec2 = ec2_client
+        self.max_workers = max_workers
+
+    def _map(self, fn, items):
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return list(pool.map(fn, items))
+
+    def launch_groups(self, groups):
+        """Launch {name: run_instances kwargs without MinCount/MaxCount, plus 'count'} concurrently.
+
+        Returns {name: [instance ids]}.
+        """
+        def launch(item):
+            name, spec = item
+            spec = dict(spec)
+            count = spec.pop('count', 1)
+            response = self.ec2.run_instances(MinCount=count, MaxCount=count, **spec)
+            return name, [instance['InstanceId'] for instance in response['Instances']]
+
+        return dict(self._map(launch, groups.items()))
+
+    def describe(self, instance_ids):
+        """Instance descriptions for the given IDs, in batches, through the paginator"""
+        paginator = self.ec2.get_paginator('describe_instances')
+
+        def describe_batch(batch):
+            return [
+                instance
+                for page in paginator.paginate(InstanceIds=batch)
+                for reservation in page['Reservations']
+                for instance in reservation['Instances']
+            ]
+
+        return [instance for batch in self._map(describe_batch, chunks(instance_ids)) for instance in batch]
+
+    def list_instances(self, states=('running',)):
+        """Every instance in the given states, following NextToken across the whole account"""
+        paginator = self.ec2.get_paginator('describe_instances')
+        pages = paginator.paginate(
+            Filters=[{'Name': 'instance-state-name', 'Values': list(states)}],
+            PaginationConfig={'PageSize': DESCRIBE_PAGE_SIZE}
+        )
+        return [instance for page in pages for reservation in page['Reservations']
+                for instance in reservation['Instances']]
+
+    def health(self, instance_ids=None):
+        """Instance status entries, including instances that are not running"""
+        paginator = self.ec2.get_paginator('describe_instance_status')
+        if instance_ids is None:
+            pages = paginator.paginate(IncludeAllInstances=True,
+                                       PaginationConfig={'PageSize': DESCRIBE_PAGE_SIZE})
+            return [status for page in pages for status in page['InstanceStatuses']]
+
+        def status_batch(batch):
+            return [
+                status
+                for page in paginator.paginate(InstanceIds=batch, IncludeAllInstances=True)
+                for status in page['InstanceStatuses']
+            ]
+
+        return [status for batch in self._map(status_batch, chunks(instance_ids)) for status in batch]
+
+    def _change_state(self, operation, waiter_name, instance_ids, wait=True):
+        def run_batch(batch):
+            getattr(self.ec2, operation)(InstanceIds=batch)
+            if wait:
+                self.ec2.get_waiter(waiter_name).wait(InstanceIds=batch)
+            return batch
+
+        return [i for batch in self._map(run_batch, chunks(instance_ids)) for i in batch]
+
+    def wait(self, waiter_name, instance_ids):
+        self._map(lambda batch: self.ec2.get_waiter(waiter_name).wait(InstanceIds=batch), chunks(instance_ids))
+
+    def stop(self, instance_ids, wait=True):
+        return self._change_state('stop_instances', 'instance_stopped', instance_ids, wait)
+
+    def start(self, instance_ids, wait=True):
+        return self._change_state('start_instances', 'instance_running', instance_ids, wait)
+
+    def terminate(self, instance_ids, wait=True):
+        return self._change_state('terminate_instances', 'instance_terminated', instance_ids, wait)
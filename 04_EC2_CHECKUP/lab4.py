@@ -1,34 +1,38 @@
-import boto3
 import time
 import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from aws_common import clients, registry
+from fleet import FleetManager
+
+# Shared EC2 client, created on first use so importing this module makes no AWS calls
+ec2 = clients.lazy_client('ec2')
+fleet = FleetManager(ec2)
+# Pick with aws_common/instance_bench.py; Graviton (arm64) types need arm64 AMIs
+INSTANCE_TYPE = os.environ.get('INSTANCE_TYPE', 't2.micro')
+
+def create_security_group():
+    security_group = ec2.create_security_group(
+        GroupName='WebServerSG',
+        Description='Security group for web server with port 80 open'
+    )
 
-# Initialize EC2 client
-ec2 = boto3.client('ec2')
+    # Add inbound rule to allow HTTP traffic
+    ec2.authorize_security_group_ingress(
+        GroupId=security_group['GroupId'],
+        IpProtocol='tcp',
+        FromPort=80,
+        ToPort=80,
+        CidrIp='0.0.0.0/0'
+    )
+    return security_group['GroupId']
 
 def get_or_create_security_group():
-    try:
-        security_groups = ec2.describe_security_groups(GroupNames=['WebServerSG'])
-        return security_groups['SecurityGroups'][0]['GroupId']
-    except ec2.exceptions.ClientError:
-        security_group = ec2.create_security_group(
-            GroupName='WebServerSG',
-            Description='Security group for web server with port 80 open'
-        )
-        
-        # Add inbound rule to allow HTTP traffic
-        ec2.authorize_security_group_ingress(
-            GroupId=security_group['GroupId'],
-            IpProtocol='tcp',
-            FromPort=80,
-            ToPort=80,
-            CidrIp='0.0.0.0/0'
-        )
-        return security_group['GroupId']
-
-# Get or create security group
-security_group_id = get_or_create_security_group()
-
-def launch_instance(instance_type, ami_id, count=1,security_group_id=security_group_id):
+    return registry.security_group_id(ec2, 'WebServerSG', create=create_security_group)
+
+def launch_instance(instance_type, ami_id, count=1,security_group_id=None):
+    security_group_id = security_group_id or get_or_create_security_group()
     response = ec2.run_instances(
         ImageId=ami_id,
         InstanceType=instance_type,
@@ -38,65 +42,53 @@ def launch_instance(instance_type, ami_id, count=1,security_group_id=security_gr
     )
     return [instance['InstanceId'] for instance in response['Instances']]
 
-def launch_instance_with_website(instance_type, ami_id, count=1,security_group_id=security_group_id):
-    user_data = """#!/bin/bash
+WEBSITE_USER_DATA = """#!/bin/bash
 yum update -y
 yum install -y httpd
 systemctl start httpd
 systemctl enable httpd
 echo "<h1>Hello from AWS EC2!, This is shaurya Mani Tripathi</h1>" > /var/www/html/index.html
 """
+
+def launch_instance_with_website(instance_type, ami_id, count=1,security_group_id=None):
+    security_group_id = security_group_id or get_or_create_security_group()
     response = ec2.run_instances(
         ImageId=ami_id,
         InstanceType=instance_type,
         MinCount=count,
         MaxCount=count,
         SecurityGroupIds=[security_group_id],
-        UserData=user_data
+        UserData=WEBSITE_USER_DATA
     )
-    # print dns link
-    instance = ec2.describe_instances(InstanceIds=[response['Instances'][0]['InstanceId']])['Reservations'][0]['Instances'][0]
-    public_dns = instance['PublicDnsName']
-    print(f"You can access the website at: http://{public_dns}")
+    # The public DNS name is only assigned once the instance is running; see print_website_links
     return [instance['InstanceId'] for instance in response['Instances']]
 
-
+def print_website_links(instance_ids):
+    for instance in fleet.describe(instance_ids):
+        if instance.get('PublicDnsName'):
+            print(f"You can access the website at: http://{instance['PublicDnsName']}")
 
 
 def list_instances():
-    response = ec2.describe_instances(
-        Filters=[{'Name': 'instance-state-name', 'Values': ['running']}]
-    )
-    instances = []
-    for reservation in response['Reservations']:
-        instances.extend(reservation['Instances'])
-    return instances
+    return fleet.list_instances(states=['running'])
 
 def check_instance_health(instance_ids):
-    response = ec2.describe_instance_status(InstanceIds=instance_ids)
-    return response['InstanceStatuses']
+    return fleet.health(instance_ids)
 
 
 def stop_instances(instance_ids):
-    ec2.stop_instances(InstanceIds=instance_ids)
     print(f"Stopping instances: {instance_ids}")
-    waiter=ec2.get_waiter('instance_stopped')
-    waiter.wait(InstanceIds=instance_ids)
+    fleet.stop(instance_ids)
 
 def terminate_instances(instance_ids):
-    ec2.terminate_instances(InstanceIds=instance_ids)
     print(f"Terminating instances: {instance_ids}")
-    waiter=ec2.get_waiter('instance_terminated')
-    waiter.wait(InstanceIds=instance_ids)
+    fleet.terminate(instance_ids)
 
 def start_instances(instance_ids):
-    ec2.start_instances(InstanceIds=instance_ids)
     print(f"Starting instances: {instance_ids}")
-    waiter=ec2.get_waiter('instance_running')
-    waiter.wait(InstanceIds=instance_ids)
+    fleet.start(instance_ids)
     print(f"waiting for ok status: {instance_ids}")
-    waiter2=ec2.get_waiter('instance_status_ok')
-    waiter2.wait(InstanceIds=instance_ids)
+    fleet.wait('instance_status_ok', instance_ids)
 
 def host_http_server(instance_id):
     user_data = """#!/bin/bash
@@ -132,21 +124,28 @@ sudo echo "<h1>Hello from AWS EC2!, This is shaurya Mani Tripathi</h1>" > /var/w
     print(f"You can access the website at: http://{public_dns}")
 
 def main():
-    # Launch t2.micro Amazon Linux instance
+    # Launch an Amazon Linux web server and two Ubuntu instances of INSTANCE_TYPE concurrently
     amazon_linux_ami = 'ami-02b49a24cfb95941c'  # Amazon Linux 2023 AMI
-    micro_instance = launch_instance_with_website('t2.micro', amazon_linux_ami)[0]
-    print(f"Launched t2.micro instance: {micro_instance}")
-
-    # Launch two t2.micro Ubuntu instances
     ubuntu_ami = 'ami-0522ab6e1ddcc7055'  # Ubuntu Server 24.04 LTS (HVM), SSD Volume Type
-    micro_instances = launch_instance('t2.micro', ubuntu_ami, count=2)
-    print(f"Launched two more t2.micro instances with ubuntu image: {micro_instances}")
+    security_group_id = get_or_create_security_group()
+    # A group deleted since it was cached is looked up or recreated on the next run
+    with registry.forget_on_not_found(registry.security_group_key(ec2, 'WebServerSG')):
+        launched = fleet.launch_groups({
+            'amazon-linux-web': {'ImageId': amazon_linux_ami, 'InstanceType': INSTANCE_TYPE, 'count': 1,
+                                 'SecurityGroupIds': [security_group_id], 'UserData': WEBSITE_USER_DATA},
+            'ubuntu': {'ImageId': ubuntu_ami, 'InstanceType': INSTANCE_TYPE, 'count': 2,
+                       'SecurityGroupIds': [security_group_id]},
+        })
+    micro_instance = launched['amazon-linux-web'][0]
+    micro_instances = launched['ubuntu']
+    print(f"Launched {INSTANCE_TYPE} instance: {micro_instance}")
+    print(f"Launched two more {INSTANCE_TYPE} instances with ubuntu image: {micro_instances}")
 
     # Create a list of instance IDs to check
     instance_ids = [micro_instance] + micro_instances
-    waiter = ec2.get_waiter('instance_running')
     print(f"Waiting for instances to be in running state: {instance_ids}")
-    waiter.wait(InstanceIds=instance_ids)
+    fleet.wait('instance_running', instance_ids)
+    print_website_links([micro_instance])
 
     # List all running instances
     running_instances = list_instances()
@@ -156,9 +155,8 @@ def main():
 
     # Check health of running instances
     all_instance_ids = [micro_instance] + micro_instances
-    waiter2 = ec2.get_waiter('instance_status_ok')
     print(f"Waiting for instances to be in healthy state: {all_instance_ids}")
-    waiter2.wait(InstanceIds=all_instance_ids)
+    fleet.wait('instance_status_ok', all_instance_ids)
     health_statuses = check_instance_health(all_instance_ids)
 
 
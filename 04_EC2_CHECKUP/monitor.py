@@ -0,0 +1,219 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from aws_common import clients
+from fleet import FleetManager
+
+# Long-running health monitor for every instance in the region. Each cycle is one
+# paginated describe_instance_status with IncludeAllInstances (1000 statuses per call),
+# so a cycle costs ceil(N/1000) calls. Only transitions are stored, in a bounded deque
+# per instance, and every transition is passed to the alert handlers.
+
+DEFAULT_INTERVAL = 60
+DEFAULT_HISTORY = 50
+# Reported for instances that no longer appear in describe_instance_status
+GONE = ('gone', 'not-applicable', 'not-applicable')
+
+
+def snapshot(status):
+    """(instance state, instance status, system status) of a describe_instance_status entry"""
+    return (
+        status['InstanceState']['Name'],
+        status.get('InstanceStatus', {}).get('Status', 'not-applicable'),
+        status.get('SystemStatus', {}).get('Status', 'not-applicable'),
+    )
+
+
+def healthy(state):
+    return state[0] == 'running' and state[1] == 'ok' and state[2] == 'ok'
+
+
+def print_alert(instance_id, previous, current, timestamp):
+    before = '/'.join(previous) if previous else 'new'
+    print(f"[{datetime.fromtimestamp(timestamp, timezone.utc):%H:%M:%S}] "
+          f"{instance_id}: {before} -> {'/'.join(current)}")
+
+
+def sns_alert(sns_client, topic_arn):
+    """Alert handler that publishes each transition to an SNS topic"""
+    def alert(instance_id, previous, current, timestamp):
+        sns_client.publish(
+            TopicArn=topic_arn,
+            Subject=f"{instance_id} is now {current[0]}/{current[1]}/{current[2]}",
+            Message=json.dumps({
+                'instance_id': instance_id,
+                'previous': previous,
+                'current': current,
+                'time': timestamp,
+            })
+        )
+    return alert
+
+
+class HealthMonitor:
+    def __init__(self, fleet, interval=DEFAULT_INTERVAL, history=DEFAULT_HISTORY,
+                 alerts=(print_alert,), clock=time.time):
+        self.fleet = fleet
+        self.interval = interval
+        self.history_length = history
+        self.alerts = list(alerts)
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._current = {}
+        self._history = {}
+        self.cycles = 0
+        self.last_cycle_seconds = None
+
+    def _record(self, instance_id, state, timestamp):
+        previous = self._current.get(instance_id)
+        if previous == state:
+            return None
+        self._current[instance_id] = state
+        transitions = self._history.setdefault(instance_id, deque(maxlen=self.history_length))
+        transitions.append((timestamp, state))
+        return instance_id, previous, state, timestamp
+
+    def poll_once(self):
+        """Run one cycle and return the transitions it observed"""
+        start = time.perf_counter()
+        statuses = self.fleet.health()
+        timestamp = self.clock()
+        changes = []
+        with self._lock:
+            seen = set()
+            for status in statuses:
+                seen.add(status['InstanceId'])
+                changes.append(self._record(status['InstanceId'], snapshot(status), timestamp))
+            for instance_id in set(self._current) - seen:
+                changes.append(self._record(instance_id, GONE, timestamp))
+            self.cycles += 1
+            self.last_cycle_seconds = time.perf_counter() - start
+        changes = [change for change in changes if change is not None]
+        for change in changes:
+            for alert in self.alerts:
+                try:
+                    alert(*change)
+                except Exception as e:
+                    # A broken alert channel must not stop the monitor
+                    print(f"Alert handler failed: {e}")
+        return changes
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                print(f"Health poll failed: {e}")
+            self._stop.wait(self.interval)
+
+    def stop(self):
+        self._stop.set()
+
+    def current(self):
+        with self._lock:
+            instances = {
+                instance_id: {
+                    'state': state[0],
+                    'instance_status': state[1],
+                    'system_status': state[2],
+                    'healthy': healthy(state),
+                    'since': self._history[instance_id][-1][0],
+                }
+                for instance_id, state in self._current.items() if state != GONE
+            }
+            return {
+                'instances': instances,
+                'healthy': sum(1 for entry in instances.values() if entry['healthy']),
+                'total': len(instances),
+                'cycles': self.cycles,
+                'last_cycle_seconds': self.last_cycle_seconds,
+            }
+
+    def history(self, instance_id=None):
+        with self._lock:
+            ids = [instance_id] if instance_id else list(self._history)
+            return {
+                i: [{'time': timestamp, 'state': list(state)} for timestamp, state in self._history[i]]
+                for i in ids if i in self._history
+            }
+
+
+def make_handler(monitor):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.rstrip('/')
+            if path in ('', '/health'):
+                body = monitor.current()
+            elif path == '/history':
+                body = monitor.history()
+            elif path.startswith('/history/'):
+                body = monitor.history(path[len('/history/'):])
+                if not body:
+                    self.send_error(404, 'Unknown instance')
+                    return
+            else:
+                self.send_error(404)
+                return
+            payload = json.dumps(body, indent=2).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def print_table(monitor):
+    summary = monitor.current()
+    for instance_id, entry in sorted(summary['instances'].items()):
+        print(f"{instance_id:22} {entry['state']:14} {entry['instance_status']:16} {entry['system_status']:16}")
+    print(f"{summary['healthy']}/{summary['total']} healthy "
+          f"(cycle took {summary['last_cycle_seconds']:.2f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Monitor the health of every EC2 instance in the region')
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL, help='seconds between polls')
+    parser.add_argument('--history', type=int, default=DEFAULT_HISTORY, help='transitions kept per instance')
+    parser.add_argument('--port', type=int, default=8080, help='port of the HTTP endpoint')
+    parser.add_argument('--once', action='store_true', help='poll once, print a table and exit')
+    parser.add_argument('--sns-topic', help='also publish alerts to this SNS topic ARN')
+    args = parser.parse_args()
+
+    alerts = [print_alert]
+    if args.sns_topic:
+        alerts.append(sns_alert(clients.client('sns'), args.sns_topic))
+    monitor = HealthMonitor(FleetManager(clients.client('ec2')), interval=args.interval,
+                            history=args.history, alerts=alerts)
+
+    if args.once:
+        monitor.poll_once()
+        print_table(monitor)
+        return
+
+    server = ThreadingHTTPServer(('0.0.0.0', args.port), make_handler(monitor))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Serving health on http://localhost:{args.port}/health (history at /history/<instance-id>)")
+    try:
+        monitor.run()
+    except KeyboardInterrupt:
+        monitor.stop()
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+# Parameters of WebServerASG and its original SimpleScaling setup, as boto3 request
+# parameters. lab5.py sends them to AWS and simulator.py replays them offline, so a
+# change here is simulated exactly as it would be deployed.
+
+ASG_NAME = 'WebServerASG'
+
+GROUP_SIZE = {
+    'MinSize': 1,
+    'MaxSize': 3,
+    'DesiredCapacity': 1,
+}
+
+# The scaling alarms evaluate CPU over 1-minute (or shorter) periods, so the launch
+# template enables detailed monitoring; without it EC2 publishes CPU every 5 minutes and
+# the alarms sit in INSUFFICIENT_DATA or react late
+DETAILED_MONITORING = True
+
+SCALE_UP_POLICY = {
+    'PolicyName': 'ScaleUpPolicy',
+    'PolicyType': 'SimpleScaling',
+    'AdjustmentType': 'ChangeInCapacity',
+    'ScalingAdjustment': 1,
+    'Cooldown': 300,
+}
+
+SCALE_DOWN_POLICY = {
+    'PolicyName': 'ScaleDownPolicy',
+    'PolicyType': 'SimpleScaling',
+    'AdjustmentType': 'ChangeInCapacity',
+    'ScalingAdjustment': -1,
+    'Cooldown': 300,
+}
+
+HIGH_CPU_ALARM = {
+    'AlarmName': 'HighCPUUtilization',
+    'ComparisonOperator': 'GreaterThanThreshold',
+    'EvaluationPeriods': 2,
+    'MetricName': 'CPUUtilization',
+    'Namespace': 'AWS/EC2',
+    'Period': 30,
+    'Statistic': 'Average',
+    'Threshold': 10.0,
+    'AlarmDescription': 'Alarm when CPU exceeds 10%',
+    'Unit': 'Percent',
+}
+
+LOW_CPU_ALARM = {
+    'AlarmName': 'LowCPUUtilization',
+    'ComparisonOperator': 'LessThanThreshold',
+    'EvaluationPeriods': 2,
+    'MetricName': 'CPUUtilization',
+    'Namespace': 'AWS/EC2',
+    'Period': 30,
+    'Statistic': 'Average',
+    'Threshold': 10.0,
+    'AlarmDescription': 'Alarm when CPU is less than 10%',
+    'Unit': 'Percent',
+}
@@ -1,35 +1,46 @@
-import boto3
-import time
-import base64
+import argparse
+import json
+import os
+import sys
 
-# Initialize clients
-ec2 = boto3.client('ec2')
-autoscaling = boto3.client('autoscaling')
-cloudwatch = boto3.client('cloudwatch')
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from aws_common import clients, registry, waiting
+import scaling
+import warmstart
+from asg_config import ASG_NAME, DETAILED_MONITORING, GROUP_SIZE
+
+# Shared clients, created on first use so importing this module makes no AWS calls
+ec2 = clients.lazy_client('ec2')
+autoscaling = clients.lazy_client('autoscaling')
+cloudwatch = clients.lazy_client('cloudwatch')
+iam = clients.lazy_client('iam')
 
 # Define constants
 AMI_ID = 'ami-02b49a24cfb95941c' 
-INSTANCE_TYPE = 't2.micro'
+# Pick with aws_common/instance_bench.py; Graviton (arm64) types need an arm64 AMI
+INSTANCE_TYPE = os.environ.get('INSTANCE_TYPE', 't2.micro')
 KEY_NAME = 'test1'  
 SECURITY_GROUP_NAME = 'WebServerSG'
+# 'target-tracking', 'step', 'predictive', or 'simple' for the original +/-1 policies
+SCALING_MODE = os.environ.get('SCALING_MODE', 'target-tracking')
+# Launch from the image with httpd preinstalled once `python lab5.py bake` has built it
+USE_BAKED_IMAGE = os.environ.get('USE_BAKED_IMAGE', '1') == '1'
+# Lets instances release the warm pool's launch lifecycle hook as soon as httpd answers
+INSTANCE_PROFILE_NAME = 'WebServerInstanceRole'
+# Stopped, pre-initialised instances kept next to the group; 0 disables the warm pool
+WARM_POOL_SIZE = int(os.environ.get('WARM_POOL_SIZE', '1'))
 
 def create_security_group():
-    try:
+    def create():
         response = ec2.create_security_group(
             GroupName=SECURITY_GROUP_NAME,
             Description='Security group for web server with port 80 open'
         )
         security_group_id = response['GroupId']
-        
+
         ec2.authorize_security_group_ingress(
             GroupId=security_group_id,
             IpPermissions=[
-                {
-                    'IpProtocol': 'tcp',
-                    'FromPort': 80,
-                    'ToPort': 80,
-                    'IpRanges': [{'CidrIp': '0.0.0.0/0'}]
-                },
                 {
                     'IpProtocol': 'tcp',
                     'FromPort': 80,
@@ -40,44 +51,83 @@ def create_security_group():
         )
         print(f"Created Security Group: {security_group_id}")
         return security_group_id
-    except ec2.exceptions.ClientError as e:
-        if e.response['Error']['Code'] == 'InvalidGroup.Duplicate':
-            response = ec2.describe_security_groups(GroupNames=[SECURITY_GROUP_NAME])
-            return response['SecurityGroups'][0]['GroupId']
-        else:
-            raise
 
-def create_launch_template(security_group_id):
-    user_data = """#!/bin/bash
-yum update -y
-yum install -y httpd
-systemctl start httpd
-systemctl enable httpd
-echo "<h1>Hello from AWS EC2 Auto Scaling!,"\u0053\u0068\u0061\u0075\u0072\u0079\u0061\u0020\u004D\u0061\u006E\u0069\u0020\u0054\u0072\u0069\u0070\u0061\u0074\u0068\u0069"</h1>" > /var/www/html/index.html
+    return registry.security_group_id(ec2, SECURITY_GROUP_NAME, create=create)
+
+def create_instance_profile():
+    """Instance profile whose role may complete this group's lifecycle actions"""
+    if registry.role_arn(iam, INSTANCE_PROFILE_NAME) is None:
+        iam.create_role(
+            RoleName=INSTANCE_PROFILE_NAME,
+            AssumeRolePolicyDocument=json.dumps({
+                'Version': '2012-10-17',
+                'Statement': [{'Effect': 'Allow', 'Principal': {'Service': 'ec2.amazonaws.com'},
+                               'Action': 'sts:AssumeRole'}]
+            })
+        )
+        print(f"Created role {INSTANCE_PROFILE_NAME}")
+    iam.put_role_policy(
+        RoleName=INSTANCE_PROFILE_NAME,
+        PolicyName='CompleteLifecycleAction',
+        PolicyDocument=json.dumps({
+            'Version': '2012-10-17',
+            'Statement': [{
+                'Effect': 'Allow',
+                'Action': 'autoscaling:CompleteLifecycleAction',
+                'Resource': f"arn:aws:autoscaling:*:*:autoScalingGroup:*:autoScalingGroupName/{ASG_NAME}"
+            }]
+        })
+    )
+    try:
+        iam.create_instance_profile(InstanceProfileName=INSTANCE_PROFILE_NAME)
+        iam.add_role_to_instance_profile(InstanceProfileName=INSTANCE_PROFILE_NAME, RoleName=INSTANCE_PROFILE_NAME)
+        iam.get_waiter('instance_profile_exists').wait(InstanceProfileName=INSTANCE_PROFILE_NAME)
+        print(f"Created instance profile {INSTANCE_PROFILE_NAME}")
+    except iam.exceptions.EntityAlreadyExistsException:
+        pass
+    return INSTANCE_PROFILE_NAME
+
+def bake():
+    """Build the httpd image once; later runs launch from it"""
+    security_group_id = create_security_group()
+    image_id = warmstart.bake_image(ec2, AMI_ID, INSTANCE_TYPE, security_group_id)
+    print(f"Launch template will use {image_id} on the next run of lab5.py")
+
+def create_launch_template(security_group_id, instance_profile):
+    site_script = """echo "<h1>Hello from AWS EC2 Auto Scaling!,"\u0053\u0068\u0061\u0075\u0072\u0079\u0061\u0020\u004D\u0061\u006E\u0069\u0020\u0054\u0072\u0069\u0070\u0061\u0074\u0068\u0069"</h1>" > /var/www/html/index.html
 """
+    # Baking takes minutes, so it is not done here; without an image yum runs at boot
+    baked_image = warmstart.baked_image_id(ec2, AMI_ID) if USE_BAKED_IMAGE else None
+    if USE_BAKED_IMAGE and baked_image is None:
+        print("No baked image yet, installing httpd at boot; run `python lab5.py bake` to build one")
+    image_id = baked_image or AMI_ID
+    encoded_user_data = warmstart.user_data(site_script, baked=baked_image is not None)
+    profile = {'Name': instance_profile}
+    monitoring = {'Enabled': DETAILED_MONITORING}
     
-    encoded_user_data = base64.b64encode(user_data.encode('utf-8')).decode('utf-8')
-    
-    try:
+    def create():
         response = ec2.create_launch_template(
             LaunchTemplateName='WebServerTemplate',
             VersionDescription='Web Server Template',
             LaunchTemplateData={
-                'ImageId': AMI_ID,
+                'ImageId': image_id,
                 'InstanceType': INSTANCE_TYPE,
                 'KeyName': KEY_NAME,
                 'UserData': encoded_user_data,
                 'SecurityGroupIds': [security_group_id],
+                'IamInstanceProfile': profile,
+                'Monitoring': monitoring,
             }
         )
         return response['LaunchTemplate']['LaunchTemplateId']
-    except ec2.exceptions.ClientError as e:
-        if e.response['Error']['Code'] == 'InvalidLaunchTemplateName.AlreadyExistsException':
-            print("Launch template already exists. Using existing template.")
-            response = ec2.describe_launch_templates(LaunchTemplateNames=['WebServerTemplate'])
-            return response['LaunchTemplates'][0]['LaunchTemplateId']
-        else:
-            raise
+
+    template_id = registry.launch_template_id(ec2, 'WebServerTemplate', create=create)
+    # An existing template gets a new version when the image, user data, profile or monitoring changed
+    warmstart.use_launch_data(ec2, template_id,
+                              {'ImageId': image_id, 'UserData': encoded_user_data, 'IamInstanceProfile': profile,
+                               'Monitoring': monitoring})
+    return template_id
+
 def get_available_azs():
     response = ec2.describe_availability_zones(Filters=[{'Name': 'opt-in-status', 'Values': ['opt-in-not-required']}])
     return [az['ZoneName'] for az in response['AvailabilityZones']]
@@ -86,109 +136,63 @@ def get_available_azs():
 def create_auto_scaling_group(launch_template_id):
     try:
         autoscaling.create_auto_scaling_group(
-            AutoScalingGroupName='WebServerASG',
+            AutoScalingGroupName=ASG_NAME,
             LaunchTemplate={
                 'LaunchTemplateId': launch_template_id,
                 'Version': '$Latest'
             },
-            MinSize=1,
-            MaxSize=3,
-            DesiredCapacity=1,
-            AvailabilityZones=get_available_azs(),  
+            AvailabilityZones=get_available_azs(),
+            **GROUP_SIZE
         )
-        print("Created Auto Scaling Group: WebServerASG")
+        print(f"Created Auto Scaling Group: {ASG_NAME}")
     except autoscaling.exceptions.ClientError as e:
         if e.response['Error']['Code'] == 'AlreadyExists':
             print("Auto Scaling Group already exists. Skipping creation.")
         else:
             raise
 
-def create_scaling_policies():
+def wait_for_in_service_instances(timeout=300):
+    def in_service():
+        response = autoscaling.describe_auto_scaling_groups(AutoScalingGroupNames=[ASG_NAME])
+        return [
+            instance['InstanceId'] for instance in response['AutoScalingGroups'][0]['Instances']
+            if instance['LifecycleState'] == 'InService'
+        ]
     try:
-        scale_up_policy = autoscaling.put_scaling_policy(
-            AutoScalingGroupName='WebServerASG',
-            PolicyName='ScaleUpPolicy',
-            PolicyType='SimpleScaling',
-            AdjustmentType='ChangeInCapacity',
-            ScalingAdjustment=1,
-            Cooldown=300
-        )
-        
-        scale_down_policy = autoscaling.put_scaling_policy(
-            AutoScalingGroupName='WebServerASG',
-            PolicyName='ScaleDownPolicy',
-            PolicyType='SimpleScaling',
-            AdjustmentType='ChangeInCapacity',
-            ScalingAdjustment=-1,
-            Cooldown=300
-        )
-        
-        return scale_up_policy['PolicyARN'], scale_down_policy['PolicyARN']
-    except autoscaling.exceptions.ClientError as e:
-        print(f"Error creating scaling policies: {e}")
-        return None, None
+        return waiting.wait_until(in_service, timeout=timeout, initial=5, maximum=20,
+                                  description=f"{ASG_NAME} instances")
+    except TimeoutError:
+        return []
 
-def create_cloudwatch_alarms(scale_up_policy_arn, scale_down_policy_arn):
-    try:
-        cloudwatch.put_metric_alarm(
-            AlarmName='HighCPUUtilization',
-            ComparisonOperator='GreaterThanThreshold',
-            EvaluationPeriods=2,
-            MetricName='CPUUtilization',
-            Namespace='AWS/EC2',
-            Period=30,
-            Statistic='Average',
-            Threshold=10.0,
-            ActionsEnabled=True,
-            AlarmActions=[scale_up_policy_arn],
-            AlarmDescription='Alarm when CPU exceeds 10%',
-            Dimensions=[
-                {
-                    'Name': 'AutoScalingGroupName',
-                    'Value': 'WebServerASG'
-                },
-            ],
-            Unit='Percent'
-        )
-        
-        cloudwatch.put_metric_alarm(
-            AlarmName='LowCPUUtilization',
-            ComparisonOperator='LessThanThreshold',
-            EvaluationPeriods=2,
-            MetricName='CPUUtilization',
-            Namespace='AWS/EC2',
-            Period=30,
-            Statistic='Average',
-            Threshold=10.0,
-            ActionsEnabled=True,
-            AlarmActions=[scale_down_policy_arn],
-            AlarmDescription='Alarm when CPU is less than 10%',
-            Dimensions=[
-                {
-                    'Name': 'AutoScalingGroupName',
-                    'Value': 'WebServerASG'
-                },
-            ],
-            Unit='Percent'
-        )
-        print("Created CloudWatch Alarms")
-    except cloudwatch.exceptions.ClientError as e:
-        print(f"Error creating CloudWatch alarms: {e}")
+def configure_scaling():
+    # Every mode goes through apply_plan, which removes the policies, alarms and scheduled
+    # actions of the mode used before
+    if SCALING_MODE == 'predictive':
+        history = scaling.fetch_cpu_history(cloudwatch, ASG_NAME)
+        if len({timestamp.hour for timestamp, _, _ in history}) < 24:
+            print("Less than a day of CPU history, using target tracking until there is more.")
+            plan = scaling.target_tracking_plan()
+        else:
+            plan = scaling.predictive_plan(history)
+    else:
+        plan = scaling.PLANS[SCALING_MODE]()
+    scaling.apply_plan(autoscaling, cloudwatch, ASG_NAME, plan)
 
 def main():
     try:
         security_group_id = create_security_group()
-        launch_template_id = create_launch_template(security_group_id)
+        instance_profile = create_instance_profile()
+        # A group or template deleted since it was cached is looked up or recreated on the next run
+        with registry.forget_on_not_found(registry.security_group_key(ec2, SECURITY_GROUP_NAME),
+                                          registry.launch_template_key(ec2, 'WebServerTemplate')):
+            launch_template_id = create_launch_template(security_group_id, instance_profile)
         create_auto_scaling_group(launch_template_id)
-        scale_up_policy_arn, scale_down_policy_arn = create_scaling_policies()
-        if scale_up_policy_arn and scale_down_policy_arn:
-            create_cloudwatch_alarms(scale_up_policy_arn, scale_down_policy_arn)
+        if WARM_POOL_SIZE:
+            warmstart.configure_warm_pool(autoscaling, ASG_NAME, min_size=WARM_POOL_SIZE)
+        configure_scaling()
         
         print("Auto Scaling configuration complete. Waiting for instances to launch...")
-        time.sleep(60)  
-        
-        response = autoscaling.describe_auto_scaling_groups(AutoScalingGroupNames=['WebServerASG'])
-        instance_ids = [instance['InstanceId'] for instance in response['AutoScalingGroups'][0]['Instances']]
+        instance_ids = wait_for_in_service_instances()
         
         if instance_ids:
             instance_response = ec2.describe_instances(InstanceIds=instance_ids)
@@ -203,4 +207,10 @@ def main():
         print(f"An error occurred: {e}")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description='Auto Scaling group for the web server')
+    parser.add_argument('command', nargs='?', choices=['deploy', 'bake'], default='deploy',
+                        help='bake: build the image with httpd preinstalled (takes several minutes)')
+    if parser.parse_args().command == 'bake':
+        bake()
+    else:
+        main()
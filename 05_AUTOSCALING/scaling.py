@@ -0,0 +1,243 @@
+import math
+from datetime import datetime, timedelta, timezone
+
+import asg_config
+
+# Scaling configurations for WebServerASG. A plan is a dict of boto3 request parameters:
+# 'policies' (put_scaling_policy), 'alarms' (put_metric_alarm, naming the policy they
+# trigger) and 'scheduled' (put_scheduled_update_group_action). apply_plan() sends a plan
+# to AWS and simulator.py replays the same plan against a CPU trace offline.
+#
+# Scale-out and scale-in use different thresholds and different evaluation windows so
+# that a group sitting near one threshold does not flap between sizes.
+
+DEFAULT_TARGET_CPU = 50.0
+DEFAULT_WARMUP = 180
+METRIC_PERIOD = 60
+# Alarms left behind by the original SimpleScaling setup
+LEGACY_ALARMS = [asg_config.HIGH_CPU_ALARM['AlarmName'], asg_config.LOW_CPU_ALARM['AlarmName']]
+
+
+def _cpu_alarm(name, policy, operator, threshold, evaluation_periods, period=METRIC_PERIOD, description=''):
+    return {
+        'AlarmName': name,
+        'Policy': policy,
+        'ComparisonOperator': operator,
+        'EvaluationPeriods': evaluation_periods,
+        'MetricName': 'CPUUtilization',
+        'Namespace': 'AWS/EC2',
+        'Period': period,
+        'Statistic': 'Average',
+        'Threshold': threshold,
+        'AlarmDescription': description,
+        'Unit': 'Percent',
+    }
+
+
+def simple_plan():
+    """The original lab5 setup from asg_config: +/-1 instance on one shared threshold"""
+    return {
+        'name': 'simple',
+        'policies': [dict(asg_config.SCALE_UP_POLICY), dict(asg_config.SCALE_DOWN_POLICY)],
+        'alarms': [
+            dict(asg_config.HIGH_CPU_ALARM, Policy=asg_config.SCALE_UP_POLICY['PolicyName']),
+            dict(asg_config.LOW_CPU_ALARM, Policy=asg_config.SCALE_DOWN_POLICY['PolicyName']),
+        ],
+        'scheduled': [],
+    }
+
+
+def target_tracking_plan(target=DEFAULT_TARGET_CPU, warmup=DEFAULT_WARMUP):
+    """Keep average CPU at target; AWS creates and owns the alarms"""
+    return {
+        'name': 'target-tracking',
+        'policies': [{
+            'PolicyName': 'CPUTargetTracking',
+            'PolicyType': 'TargetTrackingScaling',
+            'EstimatedInstanceWarmup': warmup,
+            'TargetTrackingConfiguration': {
+                'PredefinedMetricSpecification': {'PredefinedMetricType': 'ASGAverageCPUUtilization'},
+                'TargetValue': target,
+            },
+        }],
+        'alarms': [],
+        'scheduled': [],
+    }
+
+
+def step_plan(scale_out_at=70.0, scale_in_at=30.0, warmup=DEFAULT_WARMUP):
+    """Scale out in larger steps the further CPU is above scale_out_at; scale in one at a time.
+
+    Scale-out reacts after 2 minutes, scale-in only after 5, and the gap between the two
+    thresholds is the hysteresis band in which the group keeps its size.
+    """
+    if scale_in_at >= scale_out_at:
+        raise ValueError('scale_in_at must be below scale_out_at')
+    return {
+        'name': 'step',
+        'policies': [
+            {'PolicyName': 'StepScaleOut', 'PolicyType': 'StepScaling',
+             'AdjustmentType': 'ChangeInCapacity', 'MetricAggregationType': 'Average',
+             'EstimatedInstanceWarmup': warmup,
+             'StepAdjustments': [
+                 {'MetricIntervalLowerBound': 0.0, 'MetricIntervalUpperBound': 15.0, 'ScalingAdjustment': 1},
+                 {'MetricIntervalLowerBound': 15.0, 'MetricIntervalUpperBound': 25.0, 'ScalingAdjustment': 2},
+                 {'MetricIntervalLowerBound': 25.0, 'ScalingAdjustment': 3},
+             ]},
+            {'PolicyName': 'StepScaleIn', 'PolicyType': 'StepScaling',
+             'AdjustmentType': 'ChangeInCapacity', 'MetricAggregationType': 'Average',
+             'StepAdjustments': [
+                 {'MetricIntervalUpperBound': 0.0, 'ScalingAdjustment': -1},
+             ]},
+        ],
+        'alarms': [
+            _cpu_alarm(f"{asg_config.ASG_NAME}-CPUHigh", 'StepScaleOut', 'GreaterThanOrEqualToThreshold',
+                       scale_out_at, 2, description=f"Scale out while CPU is at or above {scale_out_at:g}%"),
+            _cpu_alarm(f"{asg_config.ASG_NAME}-CPULow", 'StepScaleIn', 'LessThanThreshold',
+                       scale_in_at, 5, description=f"Scale in while CPU is below {scale_in_at:g}%"),
+        ],
+        'scheduled': [],
+    }
+
+
+def hourly_demand_profile(samples, percentile=0.9):
+    """{hour of day (UTC): demand} from (timestamp, average CPU, in-service instances) samples.
+
+    Demand is in percent of one instance, so 150 means one and a half busy instances.
+    """
+    by_hour = {}
+    for timestamp, cpu, instances in samples:
+        by_hour.setdefault(timestamp.hour, []).append(cpu * instances)
+    profile = {}
+    for hour, values in by_hour.items():
+        values.sort()
+        profile[hour] = values[min(len(values) - 1, int(percentile * len(values)))]
+    return profile
+
+
+def scheduled_actions(profile, target=DEFAULT_TARGET_CPU, min_size=asg_config.GROUP_SIZE['MinSize'],
+                      max_size=asg_config.GROUP_SIZE['MaxSize'], lead_minutes=10):
+    """Daily MinSize changes that put enough capacity in place before each hour's usual load.
+
+    Consecutive hours needing the same capacity share one action. Each action starts
+    lead_minutes early so instances are in service when the load arrives.
+    """
+    actions = []
+    previous = None
+    for hour in range(24):
+        demand = profile.get(hour, 0.0)
+        capacity = max(min_size, min(max_size, math.ceil(demand / target)))
+        if capacity == previous:
+            continue
+        start = (datetime(2000, 1, 1, hour, tzinfo=timezone.utc) - timedelta(minutes=lead_minutes))
+        actions.append({
+            'ScheduledActionName': f"{asg_config.ASG_NAME}-{hour:02d}00",
+            'Recurrence': f"{start.minute} {start.hour} * * *",
+            'MinSize': capacity,
+        })
+        previous = capacity
+    return actions
+
+
+def predictive_plan(samples, target=DEFAULT_TARGET_CPU, min_size=asg_config.GROUP_SIZE['MinSize'],
+                    max_size=asg_config.GROUP_SIZE['MaxSize'], warmup=DEFAULT_WARMUP):
+    """Scheduled capacity learned from history, with target tracking on top for the unexpected"""
+    plan = target_tracking_plan(target, warmup)
+    plan['name'] = 'predictive'
+    plan['scheduled'] = scheduled_actions(hourly_demand_profile(samples), target, min_size, max_size)
+    return plan
+
+
+def fetch_cpu_history(cloudwatch, asg_name, days=14, period=3600):
+    """(timestamp, average CPU, in-service instances) samples for the group.
+
+    The instance count comes from the group metrics that apply_plan() enables; before
+    they exist every sample counts as one instance.
+    """
+    end = datetime.now(timezone.utc)
+    queries = [
+        {'Id': 'cpu', 'MetricStat': {'Metric': {
+            'Namespace': 'AWS/EC2', 'MetricName': 'CPUUtilization',
+            'Dimensions': [{'Name': 'AutoScalingGroupName', 'Value': asg_name}]},
+            'Period': period, 'Stat': 'Average'}},
+        {'Id': 'instances', 'MetricStat': {'Metric': {
+            'Namespace': 'AWS/AutoScaling', 'MetricName': 'GroupInServiceInstances',
+            'Dimensions': [{'Name': 'AutoScalingGroupName', 'Value': asg_name}]},
+            'Period': period, 'Stat': 'Average'}},
+    ]
+    series = {'cpu': {}, 'instances': {}}
+    paginator = cloudwatch.get_paginator('get_metric_data')
+    for page in paginator.paginate(MetricDataQueries=queries, StartTime=end - timedelta(days=days), EndTime=end):
+        for result in page['MetricDataResults']:
+            series[result['Id']].update(zip(result['Timestamps'], result['Values']))
+    return sorted(
+        (timestamp, cpu, series['instances'].get(timestamp, 1.0))
+        for timestamp, cpu in series['cpu'].items()
+    )
+
+
+def _delete_stale(autoscaling, cloudwatch, asg_name, plan):
+    keep_policies = {policy['PolicyName'] for policy in plan['policies']}
+    paginator = autoscaling.get_paginator('describe_policies')
+    for page in paginator.paginate(AutoScalingGroupName=asg_name):
+        for policy in page['ScalingPolicies']:
+            if policy['PolicyName'] not in keep_policies:
+                # Deleting a target tracking policy also deletes the alarms AWS made for it
+                autoscaling.delete_policy(AutoScalingGroupName=asg_name, PolicyName=policy['PolicyName'])
+                print(f"Deleted scaling policy {policy['PolicyName']}")
+
+    keep_alarms = {alarm['AlarmName'] for alarm in plan['alarms']}
+    candidates = set(LEGACY_ALARMS + [alarm['AlarmName'] for alarm in step_plan()['alarms']]) - keep_alarms
+    stale_alarms = [
+        alarm['AlarmName']
+        for alarm in cloudwatch.describe_alarms(AlarmNames=sorted(candidates))['MetricAlarms']
+    ]
+    if stale_alarms:
+        cloudwatch.delete_alarms(AlarmNames=stale_alarms)
+        print(f"Deleted alarms {', '.join(stale_alarms)}")
+
+    keep_actions = {action['ScheduledActionName'] for action in plan['scheduled']}
+    paginator = autoscaling.get_paginator('describe_scheduled_actions')
+    for page in paginator.paginate(AutoScalingGroupName=asg_name):
+        for action in page['ScheduledUpdateGroupActions']:
+            if action['ScheduledActionName'] not in keep_actions:
+                autoscaling.delete_scheduled_action(
+                    AutoScalingGroupName=asg_name, ScheduledActionName=action['ScheduledActionName']
+                )
+
+
+def apply_plan(autoscaling, cloudwatch, asg_name, plan):
+    """Make the group's policies, alarms and scheduled actions match plan"""
+    # Group metrics feed GroupInServiceInstances into fetch_cpu_history
+    autoscaling.enable_metrics_collection(AutoScalingGroupName=asg_name, Granularity='1Minute')
+    _delete_stale(autoscaling, cloudwatch, asg_name, plan)
+
+    arns = {}
+    for policy in plan['policies']:
+        response = autoscaling.put_scaling_policy(AutoScalingGroupName=asg_name, **policy)
+        arns[policy['PolicyName']] = response['PolicyARN']
+        print(f"Put {policy['PolicyType']} policy {policy['PolicyName']}")
+
+    for alarm in plan['alarms']:
+        alarm = dict(alarm)
+        policy = alarm.pop('Policy')
+        cloudwatch.put_metric_alarm(
+            ActionsEnabled=True,
+            AlarmActions=[arns[policy]],
+            Dimensions=[{'Name': 'AutoScalingGroupName', 'Value': asg_name}],
+            **alarm
+        )
+        print(f"Put alarm {alarm['AlarmName']} -> {policy}")
+
+    for action in plan['scheduled']:
+        autoscaling.put_scheduled_update_group_action(AutoScalingGroupName=asg_name, **action)
+    if plan['scheduled']:
+        print(f"Put {len(plan['scheduled'])} scheduled actions")
+    return arns
+
+
+PLANS = {
+    'simple': simple_plan,
+    'step': step_plan,
+    'target-tracking': target_tracking_plan,
+}
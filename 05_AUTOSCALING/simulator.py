@@ -0,0 +1,417 @@
+import argparse
+import csv
+import heapq
+import math
+import random
+from datetime import datetime, timedelta, timezone
+
+import asg_config
+import scaling
+
+# Offline replay of a scaling plan (see scaling.py) against a load trace. Events are
+# processed in time order: load samples, CloudWatch datapoints, alarm evaluations and
+# scheduled actions. Instances take launch_seconds to come into service and then warm
+# up for the policy's EstimatedInstanceWarmup. The result counts billed instance-minutes
+# and the minutes in which the fleet missed the CPU SLO.
+#
+# A trace is a list of demand samples, one every `resolution` seconds, in percent of one
+# instance: 250 means two and a half instances' worth of CPU.
+#
+# Group size and the original policies and alarms come from asg_config, the same request
+# parameters lab5.py deploys.
+
+DAY = 24 * 3600
+PRICE_PER_HOUR = 0.0116  # t2.micro on-demand, us-east-1
+DEFAULT_SLO_CPU = 80.0
+# Seconds from launch until an instance passes its health check and serves traffic
+DEFAULT_LAUNCH_SECONDS = 90
+
+OPERATORS = {
+    'GreaterThanThreshold': lambda value, threshold: value > threshold,
+    'GreaterThanOrEqualToThreshold': lambda value, threshold: value >= threshold,
+    'LessThanThreshold': lambda value, threshold: value < threshold,
+    'LessThanOrEqualToThreshold': lambda value, threshold: value <= threshold,
+}
+STATISTICS = {
+    'Average': lambda values: sum(values) / len(values),
+    'Maximum': max,
+    'Minimum': min,
+    'Sum': sum,
+    'SampleCount': len,
+}
+
+# Event kinds, in the order they run when they share a timestamp
+SCHEDULED, SAMPLE, METRIC, EVALUATE = range(4)
+
+
+class Alarm:
+    def __init__(self, spec, policy):
+        self.name = spec['AlarmName']
+        self.policy = policy
+        self.period = spec['Period']
+        self.evaluation_periods = spec['EvaluationPeriods']
+        self.threshold = spec['Threshold']
+        self.compare = OPERATORS[spec['ComparisonOperator']]
+        self.statistic = STATISTICS[spec['Statistic']]
+        self.history = []
+        self.value = None
+
+    def evaluate(self, datapoints):
+        """Add one period's datapoints; True while the alarm is in ALARM.
+
+        Periods without datapoints are skipped (TreatMissingData 'missing').
+        """
+        if datapoints:
+            self.value = self.statistic(datapoints)
+            self.history.append(self.compare(self.value, self.threshold))
+            del self.history[:-self.evaluation_periods]
+        return len(self.history) == self.evaluation_periods and all(self.history)
+
+
+def target_tracking_alarms(policy):
+    """The alarm pair AWS creates for a target tracking policy"""
+    target = policy['TargetTrackingConfiguration']['TargetValue']
+    name = policy['PolicyName']
+    return [
+        {'AlarmName': f"TargetTracking-{name}-AlarmHigh", 'Policy': name, 'Direction': 'out',
+         'ComparisonOperator': 'GreaterThanThreshold', 'Threshold': target,
+         'EvaluationPeriods': 3, 'Period': 60, 'Statistic': 'Average'},
+        {'AlarmName': f"TargetTracking-{name}-AlarmLow", 'Policy': name, 'Direction': 'in',
+         'ComparisonOperator': 'LessThanThreshold', 'Threshold': target * 0.9,
+         'EvaluationPeriods': 15, 'Period': 60, 'Statistic': 'Average'},
+    ]
+
+
+def daily_seconds(recurrence):
+    """Seconds after midnight for a 'M H * * *' recurrence"""
+    fields = recurrence.split()
+    if len(fields) != 5 or fields[2:] != ['*', '*', '*']:
+        raise ValueError(f"Only daily 'M H * * *' recurrences are simulated, got {recurrence!r}")
+    return int(fields[1]) * 3600 + int(fields[0]) * 60
+
+
+class Simulation:
+    def __init__(self, plan, trace, group=None, resolution=60, launch_seconds=DEFAULT_LAUNCH_SECONDS,
+                 warmup=None, metric_interval=None, slo_cpu=DEFAULT_SLO_CPU,
+                 price_per_hour=PRICE_PER_HOUR, start=0):
+        """group takes create_auto_scaling_group parameters (MinSize, MaxSize, DesiredCapacity,
+        DefaultCooldown, DefaultInstanceWarmup) and defaults to asg_config.GROUP_SIZE.
+        """
+        group = group if group is not None else asg_config.GROUP_SIZE
+        self.plan = plan
+        self.trace = trace
+        self.resolution = resolution
+        self.min_size = group['MinSize']
+        self.max_size = group['MaxSize']
+        self.desired = group.get('DesiredCapacity', self.min_size)
+        self.default_cooldown = group.get('DefaultCooldown', 300)
+        self.launch_seconds = launch_seconds
+        if metric_interval is None:
+            metric_interval = 60 if asg_config.DETAILED_MONITORING else 300
+        self.metric_interval = metric_interval
+        self.slo_cpu = slo_cpu
+        self.price_per_hour = price_per_hour
+        self.start = start  # seconds after midnight UTC of the first sample
+        self.end = len(trace) * resolution
+
+        self.policies = {policy['PolicyName']: policy for policy in plan['policies']}
+        alarm_specs = list(plan['alarms'])
+        for policy in plan['policies']:
+            if policy['PolicyType'] == 'TargetTrackingScaling':
+                alarm_specs += target_tracking_alarms(policy)
+        self.alarms = [Alarm(spec, spec['Policy']) for spec in alarm_specs]
+        self.directions = {spec['AlarmName']: spec.get('Direction') for spec in alarm_specs}
+        if warmup is None:
+            warmup = max([policy.get('EstimatedInstanceWarmup', group.get('DefaultInstanceWarmup', 0))
+                          for policy in plan['policies']] or [0])
+        self.warmup = warmup
+
+        self.instances = []  # [launched, in service at, warm at, terminated or None]
+        self.cooldown_until = 0
+        self.pending_cpu = []
+        self.datapoints = []
+        self.activities = []
+        self.violation_samples = 0
+        self.cpu_total = 0.0
+        self.cpu_samples = 0
+        self.peak = 0
+
+    # --- fleet ---
+
+    def _alive(self):
+        return [instance for instance in self.instances if instance[3] is None]
+
+    def in_service(self, now):
+        return [instance for instance in self._alive() if instance[1] <= now]
+
+    def settled(self, now):
+        return [instance for instance in self._alive() if instance[2] <= now]
+
+    def warming(self, now):
+        return any(instance[2] > now for instance in self._alive())
+
+    def set_desired(self, now, desired, reason):
+        desired = max(self.min_size, min(self.max_size, desired))
+        if desired == self.desired and len(self._alive()) == desired:
+            return
+        if desired != self.desired:
+            self.activities.append((now, self.desired, desired, reason))
+        self.desired = desired
+        alive = self._alive()
+        for _ in range(desired - len(alive)):
+            ready = now + self.launch_seconds
+            self.instances.append([now, ready, ready + self.warmup, None])
+        # Scale in removes instances still launching first, then the newest ones
+        for instance in sorted(alive, key=lambda instance: instance[0], reverse=True)[:max(0, len(alive) - desired)]:
+            instance[3] = now
+        self.peak = max(self.peak, len(self._alive()))
+
+    # --- policies ---
+
+    def invoke(self, alarm, now):
+        policy = self.policies[alarm.policy]
+        kind = policy['PolicyType']
+        if kind == 'SimpleScaling':
+            if now < self.cooldown_until:
+                return
+            desired = self.adjusted(policy, policy['ScalingAdjustment'], self.desired)
+            if desired != self.desired:
+                launch = self.launch_seconds if desired > self.desired else 0
+                self.set_desired(now, desired, alarm.name)
+                self.cooldown_until = now + launch + policy.get('Cooldown', self.default_cooldown)
+        elif kind == 'StepScaling':
+            step = self.step_for(policy, alarm.value - alarm.threshold)
+            if step is None:
+                return
+            adjustment = step['ScalingAdjustment']
+            if adjustment > 0:
+                # Instances still warming up already count towards this breach
+                base = max(len(self.settled(now)), 1)
+                desired = max(self.desired, self.adjusted(policy, adjustment, base))
+            elif self.warming(now):
+                return
+            else:
+                desired = self.adjusted(policy, adjustment, self.desired)
+            self.set_desired(now, desired, alarm.name)
+        elif kind == 'TargetTrackingScaling':
+            target = policy['TargetTrackingConfiguration']['TargetValue']
+            if self.directions[alarm.name] == 'out':
+                base = max(len(self.settled(now)), 1)
+                self.set_desired(now, max(self.desired, math.ceil(base * alarm.value / target)), alarm.name)
+            elif not self.warming(now):
+                base = len(self.in_service(now))
+                self.set_desired(now, min(self.desired, math.ceil(base * alarm.value / target)), alarm.name)
+
+    @staticmethod
+    def adjusted(policy, adjustment, capacity):
+        kind = policy.get('AdjustmentType', 'ChangeInCapacity')
+        if kind == 'ExactCapacity':
+            return adjustment
+        if kind == 'PercentChangeInCapacity':
+            change = capacity * adjustment / 100
+            return capacity + (math.ceil(change) if change > 0 else math.floor(change))
+        return capacity + adjustment
+
+    @staticmethod
+    def step_for(policy, difference):
+        for step in policy['StepAdjustments']:
+            lower = step.get('MetricIntervalLowerBound', -math.inf)
+            upper = step.get('MetricIntervalUpperBound', math.inf)
+            if lower <= difference < upper or (upper == 0 and difference == 0):
+                return step
+        return None
+
+    # --- events ---
+
+    def _events(self):
+        events = []
+        for index in range(len(self.trace)):
+            events.append((index * self.resolution, SAMPLE, index))
+        for t in range(self.metric_interval, self.end + 1, self.metric_interval):
+            events.append((t, METRIC, None))
+        for number, alarm in enumerate(self.alarms):
+            for t in range(alarm.period, self.end + 1, alarm.period):
+                events.append((t, EVALUATE, number))
+        for number, action in enumerate(self.plan['scheduled']):
+            offset = (daily_seconds(action['Recurrence']) - self.start) % DAY
+            for t in range(offset, self.end, DAY):
+                events.append((t, SCHEDULED, number))
+        heapq.heapify(events)
+        return events
+
+    def run(self):
+        self.set_desired(0, self.desired, 'initial')
+        # The initial instances are already in service when the replay starts
+        for instance in self.instances:
+            instance[1] = instance[2] = 0
+        events = self._events()
+        while events:
+            now, kind, item = heapq.heappop(events)
+            if kind == SAMPLE:
+                self.sample(now, self.trace[item])
+            elif kind == METRIC:
+                if self.pending_cpu:
+                    self.datapoints.append((now, sum(self.pending_cpu) / len(self.pending_cpu)))
+                    self.pending_cpu = []
+            elif kind == EVALUATE:
+                alarm = self.alarms[item]
+                values = [value for t, value in self.datapoints if now - alarm.period < t <= now]
+                if alarm.evaluate(values):
+                    # Auto Scaling actions repeat every period while the alarm stays in ALARM
+                    self.invoke(alarm, now)
+                longest = max(a.period for a in self.alarms)
+                self.datapoints = [(t, value) for t, value in self.datapoints if t > now - longest]
+            elif kind == SCHEDULED:
+                action = self.plan['scheduled'][item]
+                self.min_size = action.get('MinSize', self.min_size)
+                self.max_size = action.get('MaxSize', self.max_size)
+                desired = action.get('DesiredCapacity', self.desired)
+                self.set_desired(now, max(self.min_size, desired), action['ScheduledActionName'])
+        return self.report()
+
+    def sample(self, now, demand):
+        serving = len(self.in_service(now))
+        if serving == 0:
+            self.violation_samples += 1
+            return
+        cpu = min(100.0, demand / serving)
+        self.pending_cpu.append(cpu)
+        self.cpu_total += cpu
+        self.cpu_samples += 1
+        if cpu > self.slo_cpu:
+            self.violation_samples += 1
+
+    def report(self):
+        # Per-second billing with a one-minute minimum per instance
+        billed = sum(max(60, (instance[3] if instance[3] is not None else self.end) - instance[0])
+                     for instance in self.instances)
+        return {
+            'plan': self.plan['name'],
+            'instance_minutes': billed / 60,
+            'cost': billed / 3600 * self.price_per_hour,
+            'slo_violation_minutes': self.violation_samples * self.resolution / 60,
+            'slo_violation_pct': 100.0 * self.violation_samples / max(1, len(self.trace)),
+            'average_cpu': self.cpu_total / max(1, self.cpu_samples),
+            'peak_instances': self.peak,
+            'scaling_activities': len(self.activities),
+        }
+
+
+def simulate(plan, trace, **kwargs):
+    return Simulation(plan, trace, **kwargs).run()
+
+
+def synthetic_trace(days=2, resolution=60, base=30.0, peak=220.0, noise=0.1, spikes_per_day=3, seed=1):
+    """Diurnal demand peaking mid-afternoon UTC, with noise and short spikes"""
+    rng = random.Random(seed)
+    samples_per_day = DAY // resolution
+    trace = []
+    for index in range(days * samples_per_day):
+        hour = (index * resolution % DAY) / 3600
+        level = base + (peak - base) * max(0.0, math.sin(math.pi * (hour - 6) / 14)) ** 2
+        trace.append(max(0.0, level * rng.gauss(1.0, noise)))
+    for _ in range(days * spikes_per_day):
+        start = rng.randrange(len(trace))
+        for index in range(start, min(len(trace), start + rng.randint(5, 20))):
+            trace[index] += rng.uniform(60, 150)
+    return trace
+
+
+def history_from_trace(trace, resolution=60, start=datetime(2024, 1, 1, tzinfo=timezone.utc)):
+    """Turn a demand trace into fetch_cpu_history-style samples, as if one instance served it"""
+    return [(start + timedelta(seconds=index * resolution), demand, 1.0) for index, demand in enumerate(trace)]
+
+
+def trace_from_history(samples, resolution=60):
+    """Resample (timestamp, average CPU, instances) samples, e.g. from fetch_cpu_history, to a trace.
+
+    Each sample's demand holds until the next sample. Returns (trace, start) where start
+    is the first sample's offset from midnight UTC, for Simulation(start=...).
+    """
+    samples = sorted(samples)
+    if not samples:
+        return [], 0
+    first = samples[0][0]
+    trace = []
+    for (timestamp, cpu, instances), following in zip(samples, samples[1:] + [None]):
+        until = following[0] if following else timestamp + timedelta(seconds=resolution)
+        offset = int((timestamp - first).total_seconds()) // resolution
+        count = max(1, int((until - timestamp).total_seconds()) // resolution)
+        trace[len(trace):] = [trace[-1] if trace else 0.0] * max(0, offset - len(trace))
+        trace.extend([cpu * instances] * count)
+    start = first.hour * 3600 + first.minute * 60 + first.second
+    return trace, start
+
+
+def load_trace(path, resolution=60):
+    """Read a CSV trace with a 'timestamp' (ISO 8601) column and either a 'demand' column or
+    'cpu' and 'instances' columns, as exported from CloudWatch. Returns (trace, start).
+    """
+    samples = []
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            timestamp = datetime.fromisoformat(row['timestamp'].replace('Z', '+00:00'))
+            if timestamp.tzinfo is None:
+                timestamp = timestamp.replace(tzinfo=timezone.utc)
+            if row.get('demand') not in (None, ''):
+                samples.append((timestamp, float(row['demand']), 1.0))
+            else:
+                samples.append((timestamp, float(row['cpu']), float(row.get('instances') or 1)))
+    return trace_from_history(samples, resolution)
+
+
+def print_reports(reports):
+    print(f"{'plan':24} {'inst-min':>9} {'cost $':>8} {'SLO miss min':>13} {'miss %':>7} "
+          f"{'avg cpu':>8} {'peak':>5} {'actions':>8}")
+    for r in reports:
+        print(f"{r['plan']:24} {r['instance_minutes']:9.0f} {r['cost']:8.3f} {r['slo_violation_minutes']:13.0f} "
+              f"{r['slo_violation_pct']:7.2f} {r['average_cpu']:8.1f} {r['peak_instances']:5} "
+              f"{r['scaling_activities']:8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay scaling plans for WebServerASG against a load trace')
+    parser.add_argument('--trace', help='CSV trace (timestamp + demand, or timestamp + cpu + instances)')
+    parser.add_argument('--days', type=int, default=3, help='days of synthetic load when no trace is given')
+    parser.add_argument('--plans', default='simple,step,target-tracking,predictive',
+                        help='comma-separated plans to compare')
+    parser.add_argument('--max-sizes', help='comma-separated MaxSize values to sweep, e.g. 2,3,4,6')
+    parser.add_argument('--launch-seconds', type=int, default=DEFAULT_LAUNCH_SECONDS)
+    parser.add_argument('--detailed-monitoring', action='store_true', help='1-minute instead of 5-minute CPU metrics')
+    parser.add_argument('--slo-cpu', type=float, default=DEFAULT_SLO_CPU)
+    args = parser.parse_args()
+
+    if args.trace:
+        trace, start = load_trace(args.trace)
+    else:
+        trace, start = synthetic_trace(days=args.days), 0
+    # The first day is the history the predictive plan learns from; all plans replay the rest
+    samples_per_day = DAY // 60
+    history, replay = trace[:samples_per_day], trace[samples_per_day:]
+    if not replay:
+        raise SystemExit('The trace needs more than one day of samples')
+    replay_start = start  # whole days were removed, so the time of day is unchanged
+
+    max_sizes = [int(size) for size in args.max_sizes.split(',')] if args.max_sizes else [asg_config.GROUP_SIZE['MaxSize']]
+    reports = []
+    for max_size in max_sizes:
+        group = dict(asg_config.GROUP_SIZE, MaxSize=max_size)
+        for name in args.plans.split(','):
+            if name == 'predictive':
+                # Timestamp the history at the trace's real time of day so the schedule lines up
+                first_sample = datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=start)
+                plan = scaling.predictive_plan(history_from_trace(history, start=first_sample), max_size=max_size)
+            else:
+                plan = scaling.PLANS[name]()
+            report = simulate(
+                plan, replay, group=group, launch_seconds=args.launch_seconds, start=replay_start,
+                metric_interval=60 if args.detailed_monitoring else None, slo_cpu=args.slo_cpu
+            )
+            if len(max_sizes) > 1:
+                report['plan'] = f"{report['plan']} (max {max_size})"
+            reports.append(report)
+    print_reports(reports)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+import argparse
+import base64
+import hashlib
+import os
+import statistics
+import sys
+import time
+import urllib.error
+import urllib.request
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from aws_common import clients, registry, waiting
+from asg_config import ASG_NAME
+
+# Faster scale-out for WebServerASG. Three pieces:
+#  - bake_image() builds an AMI with httpd already installed, so the launch template's
+#    user data no longer runs yum on every scale-out. Images are named after a hash of
+#    the base AMI and install script and are reused until either changes. Baking takes
+#    several minutes, so it only runs on request (python lab5.py bake); baked_image_id()
+#    finds the image when it exists.
+#  - configure_warm_pool() keeps stopped, already-initialised instances next to the group
+#    and adds a launch lifecycle hook that holds each instance until httpd answers. The
+#    instances release the hook themselves, which needs the instance profile from
+#    lab5.create_instance_profile() in the launch template.
+#  - measure_scale_out() and activity_latencies() measure launch-to-healthy time, so the
+#    effect of each piece can be compared before and after.
+
+INSTALL_SCRIPT = """yum update -y
+yum install -y httpd
+systemctl enable httpd
+"""
+LAUNCH_HOOK = 'WebServerLaunchHook'
+HOOK_TIMEOUT = 300
+# Runs on every boot, including a warm-pool instance's first boot as part of the group
+COMPLETE_HOOK_SCRIPT = """#!/bin/bash
+until curl -sf http://localhost/ > /dev/null; do sleep 1; done
+TOKEN=$(curl -sX PUT http://169.254.169.254/latest/api/token -H 'X-aws-ec2-metadata-token-ttl-seconds: 60')
+META=http://169.254.169.254/latest/meta-data
+ID=$(curl -s -H "X-aws-ec2-metadata-token: $TOKEN" $META/instance-id)
+REGION=$(curl -s -H "X-aws-ec2-metadata-token: $TOKEN" $META/placement/region)
+# Needs autoscaling:CompleteLifecycleAction on the instance role. Retried while a new
+# instance profile propagates; if it still fails the hook holds the instance for its
+# whole heartbeat timeout, so say so on the console and in the cloud-init log
+for attempt in 1 2 3 4 5 6; do
+    aws autoscaling complete-lifecycle-action --region "$REGION" --instance-id "$ID" \\
+        --auto-scaling-group-name {asg_name} --lifecycle-hook-name {hook_name} \\
+        --lifecycle-action-result CONTINUE && exit 0
+    sleep 5
+done
+echo "complete-lifecycle-action failed for $ID; check the instance profile" | tee /dev/console >&2
+exit 1
+"""
+
+
+def user_data(site_script, baked, asg_name=ASG_NAME, hook_name=LAUNCH_HOOK):
+    """Base64 user data: install httpd unless baked, write the site, release the lifecycle hook"""
+    hook_script = COMPLETE_HOOK_SCRIPT.format(asg_name=asg_name, hook_name=hook_name)
+    script = "#!/bin/bash\n"
+    if not baked:
+        script += INSTALL_SCRIPT
+    script += site_script
+    script += "systemctl start httpd\n"
+    script += "cat > /var/lib/cloud/scripts/per-boot/complete-lifecycle.sh <<'HOOK'\n"
+    script += hook_script
+    script += "HOOK\n"
+    script += "chmod +x /var/lib/cloud/scripts/per-boot/complete-lifecycle.sh\n"
+    script += "/var/lib/cloud/scripts/per-boot/complete-lifecycle.sh\n"
+    return base64.b64encode(script.encode('utf-8')).decode('utf-8')
+
+
+def image_name(base_ami, script=INSTALL_SCRIPT):
+    digest = hashlib.sha256(f"{base_ami}\n{script}".encode('utf-8')).hexdigest()
+    return f"webserver-baked-{digest[:16]}"
+
+
+def bake_image(ec2, base_ami, instance_type, security_group_id, script=INSTALL_SCRIPT, **wait_kwargs):
+    """AMI of base_ami with script applied, built once and then reused"""
+    name = image_name(base_ami, script)
+
+    def create():
+        # The builder powers itself off when the script is done, which also gives a
+        # consistent filesystem for the image without a reboot
+        builder = ec2.run_instances(
+            ImageId=base_ami,
+            InstanceType=instance_type,
+            MinCount=1,
+            MaxCount=1,
+            SecurityGroupIds=[security_group_id],
+            UserData=f"#!/bin/bash\n{script}shutdown -h now\n",
+            InstanceInitiatedShutdownBehavior='stop',
+            TagSpecifications=[{'ResourceType': 'instance', 'Tags': [{'Key': 'Name', 'Value': f"{name}-builder"}]}]
+        )['Instances'][0]['InstanceId']
+        print(f"Baking {name} on builder instance {builder}...")
+        try:
+            def stopped():
+                state = ec2.describe_instances(InstanceIds=[builder])['Reservations'][0]['Instances'][0]['State']
+                if state['Name'] in ('terminated', 'shutting-down'):
+                    raise RuntimeError(f"Builder {builder} is {state['Name']}")
+                return state['Name'] == 'stopped'
+
+            waiting.wait_until(stopped, timeout=1200, initial=10, maximum=30, description=f"builder {builder}",
+                               retry_codes=('InvalidInstanceID.NotFound',), **wait_kwargs)
+            image = ec2.create_image(InstanceId=builder, Name=name,
+                                     Description=f"{base_ami} with httpd preinstalled")['ImageId']
+            waiting.wait_until(
+                lambda: ec2.describe_images(ImageIds=[image])['Images'][0]['State'] == 'available',
+                timeout=1800, initial=15, maximum=60, description=f"image {image}",
+                retry_codes=('InvalidAMIID.NotFound',), **wait_kwargs
+            )
+        finally:
+            ec2.terminate_instances(InstanceIds=[builder])
+        print(f"Baked image {image}")
+        return image
+
+    return registry.image_id(ec2, name, create=create)
+
+
+def baked_image_id(ec2, base_ami, script=INSTALL_SCRIPT):
+    """The image bake_image() built for base_ami and script, or None if it has not been baked"""
+    return registry.image_id(ec2, image_name(base_ami, script))
+
+
+def use_launch_data(ec2, template_id, launch_data):
+    """Add a launch template version with launch_data unless $Latest already has it"""
+    latest = ec2.describe_launch_template_versions(
+        LaunchTemplateId=template_id, Versions=['$Latest']
+    )['LaunchTemplateVersions'][0]
+    if all(latest['LaunchTemplateData'].get(key) == value for key, value in launch_data.items()):
+        return latest['VersionNumber']
+    version = ec2.create_launch_template_version(
+        LaunchTemplateId=template_id,
+        SourceVersion=str(latest['VersionNumber']),
+        VersionDescription='Web Server Template',
+        LaunchTemplateData=launch_data
+    )['LaunchTemplateVersion']['VersionNumber']
+    print(f"Created launch template version {version}")
+    return version
+
+
+def configure_warm_pool(autoscaling, asg_name=ASG_NAME, min_size=1, pool_state='Stopped'):
+    """Keep min_size initialised instances ready and hold launches until httpd answers.
+
+    Stopped warm instances cost only their EBS volumes. The group's launch template
+    must carry an instance profile allowed to call CompleteLifecycleAction, or every
+    launch waits out HOOK_TIMEOUT.
+    """
+    autoscaling.put_lifecycle_hook(
+        AutoScalingGroupName=asg_name,
+        LifecycleHookName=LAUNCH_HOOK,
+        LifecycleTransition='autoscaling:EC2_INSTANCE_LAUNCHING',
+        HeartbeatTimeout=HOOK_TIMEOUT,
+        DefaultResult='CONTINUE'
+    )
+    autoscaling.put_warm_pool(
+        AutoScalingGroupName=asg_name,
+        MinSize=min_size,
+        PoolState=pool_state,
+        InstanceReusePolicy={'ReuseOnScaleIn': True}
+    )
+    print(f"Warm pool of {min_size} {pool_state.lower()} instances configured for {asg_name}")
+
+
+def activity_latencies(autoscaling, asg_name=ASG_NAME, limit=100):
+    """Launch durations of recent successful launches, split into 'cold' and 'warm' (from the warm pool)"""
+    latencies = {'cold': [], 'warm': []}
+    paginator = autoscaling.get_paginator('describe_scaling_activities')
+    seen = 0
+    for page in paginator.paginate(AutoScalingGroupName=asg_name):
+        for activity in page['Activities']:
+            seen += 1
+            if activity['StatusCode'] != 'Successful' or 'EndTime' not in activity:
+                continue
+            description = activity['Description']
+            if not description.startswith('Launching a new EC2 instance'):
+                continue
+            source = 'warm' if 'warm pool' in description.lower() else 'cold'
+            latencies[source].append((activity['EndTime'] - activity['StartTime']).total_seconds())
+        if seen >= limit:
+            break
+    return latencies
+
+
+def http_ok(url, timeout=3):
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return response.status == 200
+    except (urllib.error.URLError, OSError):
+        return False
+
+
+def _group(autoscaling, asg_name):
+    return autoscaling.describe_auto_scaling_groups(AutoScalingGroupNames=[asg_name])['AutoScalingGroups'][0]
+
+
+def measure_scale_out(autoscaling, ec2, asg_name=ASG_NAME, probe=http_ok, timeout=900,
+                      clock=time.monotonic, **wait_kwargs):
+    """Add one instance and time it until InService and until its website answers.
+
+    Restores the previous desired capacity afterwards. probe(url) decides health, and
+    clock plus wait_until's sleep can be replaced to run against stubbed clients.
+    """
+    group = _group(autoscaling, asg_name)
+    desired = group['DesiredCapacity']
+    if desired >= group['MaxSize']:
+        raise ValueError(f"{asg_name} is already at MaxSize {group['MaxSize']}")
+    before = {instance['InstanceId'] for instance in group['Instances']}
+
+    start = clock()
+    autoscaling.set_desired_capacity(AutoScalingGroupName=asg_name, DesiredCapacity=desired + 1,
+                                     HonorCooldown=False)
+    try:
+        def new_in_service():
+            for instance in _group(autoscaling, asg_name)['Instances']:
+                if instance['InstanceId'] not in before and instance['LifecycleState'] == 'InService':
+                    return instance['InstanceId']
+            return None
+
+        instance_id = waiting.wait_until(new_in_service, timeout=timeout, initial=2, maximum=10,
+                                         description='new InService instance', clock=clock, **wait_kwargs)
+        in_service = clock() - start
+        dns = ec2.describe_instances(InstanceIds=[instance_id])['Reservations'][0]['Instances'][0]['PublicDnsName']
+        waiting.wait_until(lambda: probe(f"http://{dns}/"), timeout=timeout, initial=1, maximum=5,
+                           description=f"http://{dns}/", clock=clock, **wait_kwargs)
+        healthy = clock() - start
+    finally:
+        autoscaling.set_desired_capacity(AutoScalingGroupName=asg_name, DesiredCapacity=desired,
+                                         HonorCooldown=False)
+    return {'instance_id': instance_id, 'in_service_seconds': in_service, 'healthy_seconds': healthy}
+
+
+def summarize(label, values):
+    if not values:
+        print(f"{label:28} no samples")
+        return
+    values = sorted(values)
+    p90 = values[min(len(values) - 1, int(0.9 * len(values)))]
+    print(f"{label:28} n={len(values):3}  median {statistics.median(values):7.1f}s  p90 {p90:7.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pre-baked images, warm pool and launch latency for WebServerASG')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('history', help='launch durations from recent scaling activities')
+    measure = commands.add_parser('measure', help='scale out by one instance and time it, repeatedly')
+    measure.add_argument('--samples', type=int, default=3)
+    warm_pool = commands.add_parser('warm-pool', help='configure the warm pool and launch lifecycle hook')
+    warm_pool.add_argument('--min-size', type=int, default=1)
+    args = parser.parse_args()
+
+    autoscaling = clients.client('autoscaling')
+    if args.command == 'history':
+        latencies = activity_latencies(autoscaling)
+        summarize('launch (cold)', latencies['cold'])
+        summarize('launch (from warm pool)', latencies['warm'])
+    elif args.command == 'measure':
+        ec2 = clients.client('ec2')
+        results = []
+        for number in range(args.samples):
+            result = measure_scale_out(autoscaling, ec2)
+            print(f"{result['instance_id']}: InService after {result['in_service_seconds']:.0f}s, "
+                  f"serving after {result['healthy_seconds']:.0f}s")
+            results.append(result)
+            # Let the scale-in finish so the next sample starts from the same state
+            if number + 1 < args.samples:
+                time.sleep(60)
+        summarize('launch to InService', [r['in_service_seconds'] for r in results])
+        summarize('launch to serving', [r['healthy_seconds'] for r in results])
+    elif args.command == 'warm-pool':
+        configure_warm_pool(autoscaling, min_size=args.min_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,30 +1,53 @@
-import boto3
 from botocore.exceptions import ClientError
+import os
+import sys
 import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 
-ec2_client = boto3.client('ec2', region_name='ap-south-1')
-rds_client = boto3.client('rds', region_name='ap-south-1')
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from aws_common import clients, db_profiles, registry, waiting
 
 # Define EC2 and RDS configurations
-ec2_instance_type = 't2.micro' 
+# Pick with aws_common/instance_bench.py; Graviton (arm64) types need an arm64 AMI
+ec2_instance_type = os.environ.get('INSTANCE_TYPE', 't2.micro')
 ami_id = 'ami-0dee22c13ea7a9a67'
-key_name = 'test1'  
+key_name = 'test1'
 security_group_name = 'ec2_rds_'
 db_instance_identifier = 'feedback'
-db_instance_class = 'db.t4g.micro' 
-db_engine = 'mysql'
+# Instance class, storage, Performance Insights and MySQL parameters (DB_PROFILE=dev|throughput|latency)
+db_profile = os.environ.get('DB_PROFILE', 'dev')
 db_name = 'feedback'
 db_master_username = 'admin'
 db_master_password = 'password'
 
+# The EC2 instance only needs the database endpoint once its packages are installed, so
+# it is launched right after the RDS create call instead of after the RDS waiter. Its
+# user data waits for a DbEndpoint tag on the instance, read from instance metadata
+# (no IAM role or AWS CLI needed), and this script adds that tag as soon as RDS is
+# available. Both resources are tracked concurrently until the web app answers.
+ENDPOINT_TAG = 'DbEndpoint'
+# Endpoint baked into userdata_d.txt, replaced by the one discovered at boot
+TEMPLATE_ENDPOINT = 'feedback.cniuq0gcmxho.ap-south-1.rds.amazonaws.com'
+DISCOVER_ENDPOINT = f"""# Wait for the provisioner to tag this instance with the RDS endpoint
+IMDS=http://169.254.169.254/latest
+until DB_HOST=$(curl -sf -H "X-aws-ec2-metadata-token: $(curl -sf -X PUT $IMDS/api/token \\
+        -H 'X-aws-ec2-metadata-token-ttl-seconds: 60')" $IMDS/meta-data/tags/instance/{ENDPOINT_TAG}); do
+    echo "Waiting for the RDS endpoint..."
+    sleep 5
+done
+
+"""
+
 # Create or retrieve security group
-try:
+def create_security_group(ec2_client):
     response = ec2_client.create_security_group(
         GroupName=security_group_name,
         Description='Security group for EC2 and RDS communication'
     )
     security_group_id = response['GroupId']
-    
+
     # Add ingress rules for MySQL (port 3306) and HTTP (port 80)
     ec2_client.authorize_security_group_ingress(
         GroupId=security_group_id,
@@ -50,59 +73,44 @@ try:
         ]
     )
     print(f"Created security group: {security_group_id}")
-except ClientError as e:
-    if e.response['Error']['Code'] == 'InvalidGroup.Duplicate':
-        response = ec2_client.describe_security_groups(GroupNames=[security_group_name])
-        security_group_id = response['SecurityGroups'][0]['GroupId']
-        print(f"Using existing security group: {security_group_id}")
-    else:
-        print(f"Error creating security group: {e}")
-        raise
+    return security_group_id
 
-try:
-    rds_instance = rds_client.create_db_instance(
-        DBInstanceIdentifier=db_instance_identifier,
-        AllocatedStorage=20,
-        DBInstanceClass=db_instance_class,
-        Engine=db_engine,
-        MasterUsername=db_master_username,
-        MasterUserPassword=db_master_password,
-        DBName=db_name,
-        VpcSecurityGroupIds=[security_group_id],
-        PubliclyAccessible=True, 
-        BackupRetentionPeriod=7  
-    )
-    print(f"RDS instance {db_instance_identifier} is being created...")
-    
-    # Wait for the RDS instance to be available
-    waiter = rds_client.get_waiter('db_instance_available')
-    waiter.wait(DBInstanceIdentifier=db_instance_identifier)
-    print(f"RDS instance {db_instance_identifier} is available.")
-except ClientError as e:
-    if e.response['Error']['Code'] == 'DBInstanceAlreadyExists':
-        print(f"RDS instance {db_instance_identifier} already exists.")
-    else:
-        print(f"Error creating RDS instance: {e}")
-        raise
+def request_rds_instance(rds_client, security_group_id):
+    """Start creating the RDS instance without waiting for it"""
+    db_settings = db_profiles.prepare(rds_client, db_profile)
+    try:
+        rds_client.create_db_instance(
+            DBInstanceIdentifier=db_instance_identifier,
+            **db_settings,
+            MasterUsername=db_master_username,
+            MasterUserPassword=db_master_password,
+            DBName=db_name,
+            VpcSecurityGroupIds=[security_group_id],
+            PubliclyAccessible=True,
+            BackupRetentionPeriod=7
+        )
+        print(f"RDS instance {db_instance_identifier} is being created...")
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'DBInstanceAlreadyExists':
+            print(f"RDS instance {db_instance_identifier} already exists.")
+        else:
+            print(f"Error creating RDS instance: {e}")
+            raise
+
+def boot_user_data(template):
+    """userdata_d.txt with the endpoint discovered at boot instead of hard-coded"""
+    marker = '# Create the Flask app'
+    if TEMPLATE_ENDPOINT not in template or marker not in template:
+        raise ValueError('User data template does not match userdata_d.txt')
+    # Packages install while RDS is still being created; only the app needs the endpoint
+    template = template.replace(marker, DISCOVER_ENDPOINT + marker, 1)
+    return template.replace(TEMPLATE_ENDPOINT, '${DB_HOST}')
 
-try:
-    rds_info = rds_client.describe_db_instances(DBInstanceIdentifier=db_instance_identifier)
-    rds_endpoint = rds_info['DBInstances'][0]['Endpoint']['Address']
-    print(f"RDS endpoint: {rds_endpoint}")
-except ClientError as e:
-    print(f"Error retrieving RDS endpoint: {e}")
-    raise
-
-# Read and update the user data script
-try:
-    with open('userdata_d.txt', 'r') as file:
-        user_data = file.read()
-    user_data = user_data.replace('feedback.cniuq0gcmxho.ap-south-1.rds.amazonaws.com', rds_endpoint)
-except IOError as e:
-    print(f"Error reading userdata.txt: {e}")
-    raise
-
-try:
+def launch_instance(ec2_client, security_group_id, user_data, endpoint=None):
+    """Launch the web server; endpoint, when already known, is tagged at launch"""
+    tags = [{'Key': 'Name', 'Value': 'feedback-web'}]
+    if endpoint:
+        tags.append({'Key': ENDPOINT_TAG, 'Value': endpoint})
     ec2_instance = ec2_client.run_instances(
         ImageId=ami_id,
         InstanceType=ec2_instance_type,
@@ -110,22 +118,121 @@ try:
         MinCount=1,
         MaxCount=1,
         SecurityGroupIds=[security_group_id],
-        UserData=user_data
+        UserData=user_data,
+        # Lets the boot script read the endpoint tag from instance metadata
+        MetadataOptions={'HttpTokens': 'required', 'HttpEndpoint': 'enabled', 'InstanceMetadataTags': 'enabled'},
+        TagSpecifications=[{'ResourceType': 'instance', 'Tags': tags}]
     )
     ec2_instance_id = ec2_instance['Instances'][0]['InstanceId']
     print(f"EC2 Instance created with ID: {ec2_instance_id}")
+    return ec2_instance_id
+
+def wait_for_rds_endpoint(rds_client, **wait_kwargs):
+    def available():
+        instance = rds_client.describe_db_instances(DBInstanceIdentifier=db_instance_identifier)['DBInstances'][0]
+        if instance['DBInstanceStatus'] == 'available':
+            return instance['Endpoint']['Address']
+        return None
+
+    return waiting.wait_until(available, timeout=1800, initial=10, maximum=30,
+                              description=f"RDS instance {db_instance_identifier}",
+                              retry_codes=('DBInstanceNotFound',), **wait_kwargs)
+
+def wait_for_public_ip(ec2_client, ec2_instance_id, **wait_kwargs):
+    def running():
+        instance = ec2_client.describe_instances(InstanceIds=[ec2_instance_id])['Reservations'][0]['Instances'][0]
+        if instance['State']['Name'] == 'running':
+            return instance.get('PublicIpAddress')
+        return None
+
+    return waiting.wait_until(running, timeout=600, initial=2, maximum=10,
+                              description=f"EC2 instance {ec2_instance_id}",
+                              retry_codes=('InvalidInstanceID.NotFound',), **wait_kwargs)
+
+def http_ok(url, timeout=3):
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return response.status == 200
+    except (urllib.error.URLError, OSError):
+        return False
+
+def provision(ec2_client, rds_client, security_group_id, user_data_template, probe=http_ok,
+              clock=time.monotonic, **wait_kwargs):
+    """Bring up RDS and the web server concurrently and time each milestone.
 
-    ec2_waiter = ec2_client.get_waiter('instance_running')
-    ec2_waiter.wait(InstanceIds=[ec2_instance_id])
-    print(f"EC2 instance {ec2_instance_id} is running.")
+    Returns the endpoint, instance ID, public IP and {milestone: seconds from start}.
+    probe(url) decides when the web app is reachable; probe, clock and wait_until's
+    sleep can be replaced to run against stubbed clients.
+    """
+    start = clock()
+    timings = {}
 
-    ec2_info = ec2_client.describe_instances(InstanceIds=[ec2_instance_id])
-    public_ip = ec2_info['Reservations'][0]['Instances'][0]['PublicIpAddress']
-    print(f"EC2 public IP: {public_ip}")
+    def mark(milestone):
+        timings[milestone] = clock() - start
+        print(f"[{timings[milestone]:7.1f}s] {milestone}")
+
+    # A cached endpoint means the instance is already up and can be tagged at launch
+    endpoint = registry.db_endpoint(rds_client, db_instance_identifier)
+    if endpoint is None:
+        request_rds_instance(rds_client, security_group_id)
+        mark('RDS create requested')
+    ec2_instance_id = launch_instance(ec2_client, security_group_id, boot_user_data(user_data_template), endpoint)
+    mark('EC2 launch requested')
+
+    def track_rds():
+        address = endpoint
+        if address is None:
+            address = wait_for_rds_endpoint(rds_client, clock=clock, **wait_kwargs)
+            ec2_client.create_tags(Resources=[ec2_instance_id], Tags=[{'Key': ENDPOINT_TAG, 'Value': address}])
+            registry.db_endpoint(rds_client, db_instance_identifier)
+        mark('RDS available, endpoint published')
+        return address
+
+    def track_ec2():
+        public_ip = wait_for_public_ip(ec2_client, ec2_instance_id, clock=clock, **wait_kwargs)
+        mark('EC2 running')
+        return public_ip
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        rds_future = pool.submit(track_rds)
+        ec2_future = pool.submit(track_ec2)
+        public_ip = ec2_future.result()
+        endpoint = rds_future.result()
+
+    # Boot finishes installing packages, reads the tag, creates the database and starts Flask
+    waiting.wait_until(lambda: probe(f"http://{public_ip}/"), timeout=1800, initial=5, maximum=15,
+                       description=f"web app on {public_ip}", clock=clock, **wait_kwargs)
+    mark('web app reachable')
+    return {'endpoint': endpoint, 'instance_id': ec2_instance_id, 'public_ip': public_ip, 'timings': timings}
+
+def main():
+    ec2_client = clients.client('ec2', region_name='ap-south-1')
+    rds_client = clients.client('rds', region_name='ap-south-1')
+
+    security_group_id = registry.security_group_id(
+        ec2_client, security_group_name, create=lambda: create_security_group(ec2_client)
+    )
+    print(f"Using security group: {security_group_id}")
+
+    try:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'userdata_d.txt'), 'r') as file:
+            user_data_template = file.read()
+    except IOError as e:
+        print(f"Error reading userdata_d.txt: {e}")
+        raise
+
+    try:
+        # A group or instance deleted since it was cached is looked up or recreated on the next run
+        with registry.forget_on_not_found(registry.security_group_key(ec2_client, security_group_name),
+                                          registry.db_endpoint_key(rds_client, db_instance_identifier)):
+            result = provision(ec2_client, rds_client, security_group_id, user_data_template)
+    except ClientError as e:
+        print(f"Error provisioning: {e}")
+        raise
+    print(f"RDS endpoint: {result['endpoint']}")
+    print(f"EC2 public IP: {result['public_ip']}")
+    print(f"\nWeb app reachable after {result['timings']['web app reachable']:.0f}s at:")
+    print(f"http://{result['public_ip']}")
 
-    print("\nSetup complete. You can access the web application at:")
-    print(f"http://{public_ip}")
-    print("\nNote: It may take a few minutes for the application to be fully operational.")
-except ClientError as e:
-    print(f"Error launching EC2 instance: {e}")
-    raise
\ No newline at end of file
+if __name__ == '__main__':
+    main()
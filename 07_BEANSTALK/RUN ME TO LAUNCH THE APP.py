@@ -1,15 +1,35 @@
-import boto3
 from botocore.exceptions import ClientError
 import os
 import re
 import subprocess
 import sys
 
+import bluegreen
+import bundle
+import proxy
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from aws_common import clients
+
 region='ap-south-1'
-rds_client = boto3.client('rds', region_name=region)
+rds_client = clients.lazy_client('rds', region)
+eb_client = clients.lazy_client('elasticbeanstalk', region)
+s3_client = clients.lazy_client('s3', region)
 environment_name = 'feedback-env2'
 db_instance_identifier = 'feedback-db'
 
+# Run with --blue-green to release through a warm standby instead of create-and-terminate
+blue_green = '--blue-green' in sys.argv
+blue_green_environments = ['feedback-blue', 'feedback-green']
+blue_green_cname = 'feedback-app'
+
+# Run with --nginx-cache to ship the micro-caching nginx configuration from proxy.py,
+# --no-nginx-cache to go back to the platform's default one
+if '--nginx-cache' in sys.argv:
+    proxy.write_platform_files('.')
+elif '--no-nginx-cache' in sys.argv:
+    proxy.remove_platform_files('.')
+
 def create_rds_instance():
     """Create RDS instance"""
     try:
@@ -76,6 +96,40 @@ new_file_contents = re.sub(
 with open(application_file_path, 'w') as file:
     file.write(new_file_contents)
 
+# REUSING THE RUNNING ENVIRONMENT--------------------------------------------------
+with open('.elasticbeanstalk/config.yml', 'r') as file:
+    config_contents = file.read()
+application_name = re.search(r'application_name:\s*(\S+)', config_contents).group(1)
+current_environment = re.search(r'branch-defaults:\s+default:\s+environment:\s+(\S+)', config_contents).group(1)
+
+def environment_running(name):
+    environments = eb_client.describe_environments(
+        ApplicationName=application_name, EnvironmentNames=[name], IncludeDeleted=False
+    )['Environments']
+    return any(env['Status'] not in ['Terminated', 'Terminating'] for env in environments)
+
+if blue_green:
+    if not any(environment_running(name) for name in blue_green_environments):
+        # First release: the live half of the pair is created once with the public CNAME
+        subprocess.run(['eb', 'create', blue_green_environments[0], '--cname', blue_green_cname], check=True)
+    else:
+        try:
+            bluegreen.blue_green_deploy(
+                eb_client, s3_client, application_name, blue_green_environments, blue_green_cname, '.'
+            )
+        except bluegreen.DeploymentFailed as e:
+            print(f"Release aborted: {e}")
+            sys.exit(1)
+    print(f"Live at http://{blue_green_cname}.{region}.elasticbeanstalk.com")
+    sys.exit(0)
+
+if environment_running(current_environment):
+    # Content-addressed bundle: unchanged sources skip the upload and the update entirely
+    print(f"Deploying to existing environment {current_environment}...")
+    bundle.deploy_bundle(eb_client, s3_client, application_name, current_environment, '.')
+    subprocess.run(['eb', 'open'])
+    sys.exit(0)
+
 # VERSIONING-----------------------------------------------------------------------
 version_file_path = 'version.txt'
 if os.path.exists(version_file_path):
@@ -96,8 +150,6 @@ with open(version_file_path, 'w') as file:
 
 print(f"Updated version: {new_version}")
 
-with open('.elasticbeanstalk/config.yml', 'r') as file:
-    config_contents = file.read()
 new_config_contents = re.sub(
     r'(branch-defaults:\s+default:\s+environment:\s+)(\S+)',
     rf'\1{new_version}',
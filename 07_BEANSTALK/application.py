@@ -1,11 +1,20 @@
+import csv
+import io
+import json
 import os
-from flask import Flask, render_template, request, redirect, url_for, flash
-import mysql.connector
+from datetime import datetime
+from flask import Flask, Response, abort, render_template, request, redirect, url_for, flash, stream_with_context
 from mysql.connector import Error
+import db
+import metrics
+import migrate
+import ratelimit
+import search
 
 application = Flask(__name__)
 app = application
 app.secret_key = os.environ.get('FLASK_SECRET_KEY', os.urandom(24))
+metrics.init_app(app)
 
 # MySQL Configuration from environment variables
 db_config = {
@@ -15,34 +24,36 @@ db_config = {
     'database': os.environ.get('RDS_DB_NAME', 'feedback'),
     'port': int(os.environ.get('RDS_PORT', 3306))
 }
+# Reads go to the replicas in RDS_READER_HOSTNAMES, writes to RDS_HOSTNAME
+router = db.from_environment(db_config)
 
-def create_connection():
+# Rows pulled from the server per round trip while streaming an export
+EXPORT_BATCH_SIZE = 1000
+EXPORT_COLUMNS = ['id', 'name', 'email', 'message', 'created_at']
+SEARCH_PAGE_SIZE = 20
+
+def create_connection(read_only=False):
     try:
-        connection = mysql.connector.connect(**db_config)
-        return connection
+        with metrics.time_connect():
+            if read_only:
+                connection = router.reader(sticky=db.wrote_recently(request))
+            else:
+                connection = router.writer()
+        return metrics.InstrumentedConnection(connection)
     except Error as e:
         print(f"Error connecting to MySQL: {e}")
         return None
 
 def create_table():
+    """Bring the schema up to date; Elastic Beanstalk deployments do this via migrate.py"""
+    connection = None
     try:
-        connection = create_connection()
-        cursor = connection.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS feedback (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                name VARCHAR(100) NOT NULL,
-                email VARCHAR(100) NOT NULL,
-                message TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        connection.commit()
+        connection = router.writer()
+        migrate.upgrade(connection)
     except Error as e:
-        print(f"Error creating table: {e}")
+        print(f"Error migrating schema: {e}")
     finally:
-        if connection and connection.is_connected():
-            cursor.close()
+        if connection:
             connection.close()
 
 @app.route('/')
@@ -56,28 +67,43 @@ def submit_feedback():
         email = request.form['email']
         message = request.form['message']
 
+        # Turn away bursts and resubmissions before touching the database
+        status, retry_after = ratelimit.check_submission(request, name, email, message)
+        if status == 'limited':
+            return ('Too many submissions, please try again shortly.', 429,
+                    {'Retry-After': str(int(retry_after) + 1), 'Content-Type': 'text/plain'})
+        if status == 'duplicate':
+            flash('Feedback submitted successfully!', 'success')
+            return redirect(url_for('index'))
+
+        response = redirect(url_for('index'))
+
         try:
             connection = create_connection()
             cursor = connection.cursor()
             query = "INSERT INTO feedback (name, email, message) VALUES (%s, %s, %s)"
             values = (name, email, message)
             cursor.execute(query, values)
+            search.index_feedback(cursor, cursor.lastrowid, name, message)
             connection.commit()
             flash('Feedback submitted successfully!', 'success')
+            db.remember_write(response)
         except Error as e:
             print(f"Error inserting feedback: {e}")
+            ratelimit.forget_submission(name, email, message)
             flash('An error occurred. Please try again.', 'error')
         finally:
             if connection and connection.is_connected():
                 cursor.close()
                 connection.close()
+        return response
 
     return redirect(url_for('index'))
 
 @app.route('/all_feedbacks')
 def all_feedbacks():
     try:
-        connection = create_connection()
+        connection = create_connection(read_only=True)
         cursor = connection.cursor(dictionary=True)
         cursor.execute("SELECT * FROM feedback ORDER BY created_at DESC")
         feedbacks = cursor.fetchall()
@@ -91,6 +117,104 @@ def all_feedbacks():
             cursor.close()
             connection.close()
 
+@app.route('/search')
+def search_feedbacks():
+    query = request.args.get('q', '').strip()
+    page = max(1, request.args.get('page', 1, type=int))
+    if not query:
+        return render_template('search.html', query=query, results=[], total=0, page=1, pages=0)
+    connection = create_connection(read_only=True)
+    if connection is None:
+        abort(503, "Database unavailable")
+    try:
+        total, results = search.search_feedbacks(connection, query, page, SEARCH_PAGE_SIZE)
+        pages = (total + SEARCH_PAGE_SIZE - 1) // SEARCH_PAGE_SIZE
+        return render_template('search.html', query=query, results=results, total=total, page=page, pages=pages)
+    except Error as e:
+        print(f"Error searching feedbacks: {e}")
+        flash('An error occurred while searching feedbacks.', 'error')
+        return redirect(url_for('index'))
+    finally:
+        if connection and connection.is_connected():
+            connection.close()
+
+def parse_time_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        abort(400, f"Invalid '{name}' timestamp, expected ISO 8601: {value}")
+
+def format_csv(rows, header=False):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+def format_ndjson(rows, header=False):
+    return ''.join(
+        json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=str) + '\n'
+        for row in rows
+    )
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', format_csv),
+    'ndjson': ('application/x-ndjson', format_ndjson),
+}
+
+def stream_feedbacks(connection, query, params, formatter):
+    """Yield formatted chunks from an unbuffered cursor, one fetchmany batch at a time"""
+    try:
+        cursor = connection.cursor(buffered=False)
+        cursor.execute(query, params)
+        yield formatter([], header=True)
+        while True:
+            rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+            if not rows:
+                break
+            yield formatter(rows)
+    finally:
+        # close() also works when the client went away mid-stream with rows still unread
+        connection.close()
+
+@app.route('/export')
+def export_feedbacks():
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        abort(400, f"Unsupported format: {export_format}")
+    mimetype, formatter = EXPORT_FORMATS[export_format]
+
+    # Range conditions on created_at so the scan is served by idx_feedback_created_at
+    conditions = []
+    params = []
+    since = parse_time_arg('since')
+    until = parse_time_arg('until')
+    if since:
+        conditions.append("created_at >= %s")
+        params.append(since)
+    if until:
+        conditions.append("created_at < %s")
+        params.append(until)
+    query = f"SELECT {', '.join(EXPORT_COLUMNS)} FROM feedback"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY created_at"
+
+    connection = create_connection(read_only=True)
+    if connection is None:
+        abort(503, "Database unavailable")
+
+    filename = f"feedback.{export_format}"
+    return Response(
+        stream_with_context(stream_feedbacks(connection, query, tuple(params), formatter)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
 if __name__ == '__main__':
     create_table()
     application.debug = True
@@ -0,0 +1,121 @@
+import http.client
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import proxy
+from bench_serving import CLIENTS, DURATION, HOST, run_load, wait_for_port
+
+# Runs gunicorn with gunicorn.conf.py and the nginx configuration from proxy.py on this
+# machine, without containers, and load-tests the same pages directly against gunicorn
+# and through nginx. Before the load test it checks the cache rules: a repeated GET is a
+# HIT, a request with a session or recent-write cookie is a BYPASS and a POST is never
+# cached.
+#
+# Needs nginx on PATH (or NGINX=/path/to/nginx). /all_feedbacks also needs a MySQL or
+# MariaDB database reachable through the RDS_* variables, with the table created by
+# `python application.py`; without one only / and /static are measured.
+
+NGINX = os.environ.get('NGINX') or shutil.which('nginx')
+APP_PORT = int(os.environ.get('BENCH_APP_PORT', 8083))
+PROXY_PORT = int(os.environ.get('BENCH_PROXY_PORT', 8084))
+STATIC_FILE = 'bench.css'
+STATIC_SIZE = 32 * 1024
+
+
+def fetch(port, path, method='GET', headers=None):
+    conn = http.client.HTTPConnection(HOST, port, timeout=10)
+    try:
+        conn.request(method, path, headers=headers or {})
+        response = conn.getresponse()
+        response.read()
+        return response.status, response.getheader('X-Cache-Status', '-')
+    finally:
+        conn.close()
+
+
+def check_cache_rules(port):
+    """(description, expected, actual) for each cache rule"""
+    fetch(port, '/')
+    checks = [
+        ('repeated GET /', 'HIT', fetch(port, '/')[1]),
+        ('GET / ignores the query string', 'HIT', fetch(port, '/?utm_source=bench')[1]),
+        ('GET / with a session cookie', 'BYPASS', fetch(port, '/', headers={'Cookie': 'session=abc'})[1]),
+        ('GET / right after a submit', 'BYPASS', fetch(port, '/', headers={'Cookie': 'a=1; recent_write=1'})[1]),
+        ('POST /submit_feedback', '-', fetch(port, '/submit_feedback', 'POST',
+                                             {'Content-Type': 'application/x-www-form-urlencoded'})[1]),
+    ]
+    return checks
+
+
+def start_nginx(prefix):
+    static_dir = os.path.join(prefix, 'static')
+    os.makedirs(static_dir)
+    os.makedirs(os.path.join(prefix, 'tmp'))
+    with open(os.path.join(static_dir, STATIC_FILE), 'w') as f:
+        f.write('body { color: #333; }\n' * (STATIC_SIZE // 22))
+    config = os.path.join(prefix, 'nginx.conf')
+    with open(config, 'w') as f:
+        f.write(proxy.standalone_config(PROXY_PORT, APP_PORT, {'/static': static_dir}))
+    return subprocess.Popen([NGINX, '-p', prefix + os.sep, '-c', config, '-g', 'daemon off;'],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+
+def report(label, result):
+    print(f"{label:36} {result['rps']:8.1f} req/s  p50 {result['p50_ms']:6.1f} ms  "
+          f"p99 {result['p99_ms']:6.1f} ms  errors {result['errors']}")
+
+
+def main():
+    if not NGINX:
+        sys.exit('nginx not found; install it or set NGINX=/path/to/nginx')
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    prefix = tempfile.mkdtemp(prefix='bench-proxy-')
+    app = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', 'application:application'],
+        env=dict(os.environ, PORT=str(APP_PORT)), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    nginx = None
+    try:
+        wait_for_port(APP_PORT)
+        nginx = start_nginx(prefix)
+        try:
+            wait_for_port(PROXY_PORT)
+        except RuntimeError:
+            nginx.terminate()
+            sys.exit(f"nginx did not start:\n{nginx.communicate()[1].decode()}")
+
+        failed = False
+        for description, expected, actual in check_cache_rules(PROXY_PORT):
+            failed |= expected != actual
+            print(f"{'ok  ' if expected == actual else 'FAIL'} {description}: X-Cache-Status {actual}")
+        if failed:
+            sys.exit(1)
+
+        paths = ['/']
+        if fetch(APP_PORT, '/all_feedbacks')[0] == 200:
+            paths.append('/all_feedbacks')
+        else:
+            print("Skipping /all_feedbacks: no database reachable through RDS_HOSTNAME")
+
+        print(f"\n{CLIENTS} clients for {DURATION:.0f}s each\n")
+        for path in paths:
+            report(f"{path} gunicorn", run_load(APP_PORT, path))
+            report(f"{path} nginx micro-cache", run_load(PROXY_PORT, path))
+        report(f"/static/{STATIC_FILE} nginx", run_load(PROXY_PORT, f"/static/{STATIC_FILE}"))
+    finally:
+        if nginx:
+            nginx.terminate()
+            nginx.wait()
+        app.terminate()
+        app.wait()
+        # Give nginx's cache manager a moment to let go of the cache directory
+        time.sleep(0.5)
+        shutil.rmtree(prefix, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+import search
+
+# Builds a feedback table of BENCH_ROWS synthetic rows in SQLite, indexes it with
+# search.py and compares ranked index lookups against a LIKE '%term%' scan.
+
+ROWS = int(os.environ.get('BENCH_ROWS', 1_000_000))
+WORDS_PER_MESSAGE = 12
+VOCABULARY = [f"word{i}" for i in range(20000)]
+QUERIES = ['word5', 'word150 word900', 'word4000', 'word19999 word7']
+
+
+def build_database(path):
+    connection = sqlite3.connect(path)
+    cursor = connection.cursor()
+    cursor.execute("""
+        CREATE TABLE feedback (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name VARCHAR(100) NOT NULL,
+            email VARCHAR(100) NOT NULL,
+            message TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    search.create_search_table(cursor)
+
+    rng = random.Random(42)
+    # Zipf-like word frequencies, like real text
+    cum_weights = []
+    total = 0.0
+    for rank in range(len(VOCABULARY)):
+        total += 1 / (rank + 1)
+        cum_weights.append(total)
+    start = time.perf_counter()
+    batch = []
+    for i in range(1, ROWS + 1):
+        message = ' '.join(rng.choices(VOCABULARY, cum_weights=cum_weights, k=WORDS_PER_MESSAGE))
+        batch.append((i, f"user{i}", f"user{i}@example.com", message))
+        if len(batch) == 10000 or i == ROWS:
+            cursor.executemany("INSERT INTO feedback (id, name, email, message) VALUES (?, ?, ?, ?)", batch)
+            for feedback_id, name, _, message in batch:
+                search.index_feedback(cursor, feedback_id, name, message)
+            connection.commit()
+            batch = []
+    print(f"Loaded and indexed {ROWS} rows in {time.perf_counter() - start:.1f}s")
+    return connection
+
+
+def timed(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        connection = build_database(os.path.join(tmp, 'feedback.db'))
+        print(f"\n{'query':22} {'LIKE scan':>12} {'index':>12} {'matches':>9}")
+        for query in QUERIES:
+            first_term = query.split()[0]
+            # A paginated LIKE search needs the match count too, which always scans the table
+            like_ms, _ = timed(lambda: (
+                connection.execute(
+                    "SELECT COUNT(*) FROM feedback WHERE message LIKE ?", (f"%{first_term}%",)
+                ).fetchone(),
+                connection.execute(
+                    "SELECT id FROM feedback WHERE message LIKE ? ORDER BY id DESC LIMIT 20",
+                    (f"%{first_term}%",)
+                ).fetchall()
+            ), repeat=1)
+            index_ms, (total, _) = timed(lambda: search.search_feedbacks(connection, query))
+            print(f"{query:22} {like_ms:10.1f}ms {index_ms:10.1f}ms {total:9}")
+        connection.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+import http.client
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+import time
+
+# Compares the Flask development server with the gunicorn profile from gunicorn.conf.py
+# by hammering / (no database needed) from a pool of keep-alive clients. The clients are
+# spread over one process per core so the load generator is not held back by the GIL;
+# run it on a machine with at least as many cores as the target instance type.
+
+HOST = '127.0.0.1'
+CLIENTS = int(os.environ.get('BENCH_CLIENTS', 32))
+DURATION = float(os.environ.get('BENCH_SECONDS', 10))
+
+SERVERS = {
+    'werkzeug dev server': (
+        [sys.executable, '-c', "from application import application; application.run(port=8081)"],
+        8081
+    ),
+    'gunicorn profile': (
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', 'application:application'],
+        8082
+    ),
+}
+
+
+def wait_for_port(port, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(HOST, port, timeout=1)
+            conn.request('GET', '/')
+            conn.getresponse().read()
+            conn.close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not come up")
+
+
+def client_process(port, clients, stop_at, path='/'):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def client():
+        conn = http.client.HTTPConnection(HOST, port, timeout=10)
+        local = []
+        while time.time() < stop_at:
+            start = time.perf_counter()
+            try:
+                conn.request('GET', path)
+                conn.getresponse().read()
+                local.append(time.perf_counter() - start)
+            except (OSError, http.client.HTTPException):
+                with lock:
+                    errors[0] += 1
+                conn.close()
+                conn = http.client.HTTPConnection(HOST, port, timeout=10)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, errors[0]
+
+
+def run_load(port, path='/'):
+    processes = os.cpu_count() or 1
+    stop_at = time.time() + DURATION
+    args = [(port, max(1, CLIENTS // processes), stop_at, path) for _ in range(processes)]
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.starmap(client_process, args)
+
+    latencies = sorted(latency for result, _ in results for latency in result)
+    errors = sum(error for _, error in results)
+    count = len(latencies)
+    return {
+        'requests': count,
+        'errors': errors,
+        'rps': count / DURATION,
+        'p50_ms': latencies[count // 2] * 1000 if count else 0,
+        'p99_ms': latencies[int(count * 0.99)] * 1000 if count else 0,
+    }
+
+
+def main():
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    print(f"{CLIENTS} clients for {DURATION:.0f}s each\n")
+    for name, (command, port) in SERVERS.items():
+        env = dict(os.environ, PORT=str(port))
+        process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_port(port)
+            result = run_load(port)
+        finally:
+            process.terminate()
+            process.wait()
+        print(f"{name:20} {result['rps']:8.1f} req/s  p50 {result['p50_ms']:6.1f} ms  "
+              f"p99 {result['p99_ms']:6.1f} ms  errors {result['errors']}")
+
+
+if __name__ == '__main__':
+    main()
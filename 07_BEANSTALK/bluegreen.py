@@ -0,0 +1,161 @@
+import os
+import sys
+
+from botocore.exceptions import ClientError
+
+import bundle
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from aws_common import waiting
+
+# Blue/green releases over a pair of long-lived environments. The new version goes to
+# the idle (standby) environment, which must turn Green before its CNAME is swapped with
+# the live one. If the new live environment degrades right after the swap, the CNAMEs
+# are swapped back; the previous version is still running on the other environment.
+
+HEALTHY = 'Green'
+FAILED_HEALTH = ('Red',)
+# How long the new live environment has to stay healthy before the release is final
+POST_SWAP_WATCH_SECONDS = 120
+
+
+class DeploymentFailed(Exception):
+    pass
+
+
+def describe(eb_client, application_name, environment_names):
+    environments = eb_client.describe_environments(
+        ApplicationName=application_name, EnvironmentNames=list(environment_names), IncludeDeleted=False
+    )['Environments']
+    return {
+        env['EnvironmentName']: env for env in environments
+        if env['Status'] not in ('Terminated', 'Terminating')
+    }
+
+
+def split_live_standby(environments, pair, cname_prefix):
+    """Return (live, standby) names; standby is None if it does not exist yet"""
+    existing = [name for name in pair if name in environments]
+    if not existing:
+        raise DeploymentFailed(f"Neither of {pair} exists; create the first environment with eb create")
+    live = next(
+        (name for name in existing if environments[name].get('CNAME', '').startswith(f"{cname_prefix}.")),
+        existing[0]
+    )
+    standby = next((name for name in pair if name != live), None)
+    return live, standby if standby in environments else None
+
+
+def create_standby(eb_client, application_name, live, standby, version_label):
+    """Clone the live environment's configuration into a new standby environment"""
+    template = f"{standby}-config"
+    print(f"Creating standby environment {standby} from {live['EnvironmentName']}'s configuration...")
+    try:
+        eb_client.create_configuration_template(
+            ApplicationName=application_name,
+            TemplateName=template,
+            EnvironmentId=live['EnvironmentId']
+        )
+    except ClientError as e:
+        # Left over from an earlier attempt
+        if 'already exists' not in e.response['Error']['Message']:
+            raise
+    eb_client.create_environment(
+        ApplicationName=application_name,
+        EnvironmentName=standby,
+        TemplateName=template,
+        VersionLabel=version_label
+    )
+
+
+def wait_for_health(eb_client, application_name, name, label=None, timeout=1800, **wait_kwargs):
+    """Wait until name is Ready and Green on version label; raise DeploymentFailed if it goes Red.
+
+    Right after update_environment the previous version can still report Ready/Green,
+    so with a label only that version counts.
+    """
+    def check():
+        env = describe(eb_client, application_name, [name]).get(name)
+        if env is None:
+            raise DeploymentFailed(f"{name} disappeared")
+        print(f"{name}: status {env['Status']}, health {env['Health']}, version {env.get('VersionLabel')}")
+        if label is not None and env.get('VersionLabel') != label:
+            return False
+        if env['Status'] == 'Ready' and env['Health'] in FAILED_HEALTH:
+            raise DeploymentFailed(f"{name} is {env['Health']}")
+        return env['Status'] == 'Ready' and env['Health'] == HEALTHY and env
+
+    return waiting.wait_until(check, timeout=timeout, initial=5, maximum=30,
+                              description=f"{name} to turn {HEALTHY}", **wait_kwargs)
+
+
+def stays_healthy(eb_client, application_name, name, watch_seconds=POST_SWAP_WATCH_SECONDS, **wait_kwargs):
+    """True if name never reports failed health during the watch window"""
+    def degraded():
+        env = describe(eb_client, application_name, [name]).get(name)
+        return env is None or env['Health'] in FAILED_HEALTH
+
+    try:
+        waiting.wait_until(degraded, timeout=watch_seconds, initial=5, maximum=15,
+                           description=f"{name} health watch", **wait_kwargs)
+        return False
+    except TimeoutError:
+        return True
+
+
+def swap(eb_client, source, destination):
+    print(f"Swapping CNAMEs of {source} and {destination}...")
+    eb_client.swap_environment_cnames(
+        SourceEnvironmentName=source,
+        DestinationEnvironmentName=destination
+    )
+
+
+def wait_for_swap(eb_client, application_name, names, **wait_kwargs):
+    """Wait until both environments of a CNAME swap are Ready again"""
+    def check():
+        environments = describe(eb_client, application_name, names)
+        return all(environments.get(name, {}).get('Status') == 'Ready' for name in names)
+
+    waiting.wait_until(check, timeout=600, initial=5, maximum=15, description='CNAME swap', **wait_kwargs)
+
+
+def blue_green_deploy(eb_client, s3_client, application_name, pair, cname_prefix, root, **wait_kwargs):
+    """Release root to the standby environment of pair and swap it live.
+
+    Returns the name of the environment that is live afterwards.
+    """
+    label, path = bundle.build_bundle(root)
+    bundle.ensure_application_version(eb_client, s3_client, application_name, label, path)
+
+    environments = describe(eb_client, application_name, pair)
+    live, standby = split_live_standby(environments, pair, cname_prefix)
+    if environments[live].get('VersionLabel') == label:
+        print(f"{live} already serves {label}, nothing to release.")
+        return live
+
+    if standby is None:
+        standby = next(name for name in pair if name != live)
+        create_standby(eb_client, application_name, environments[live], standby, label)
+    elif environments[standby].get('VersionLabel') != label:
+        print(f"Deploying {label} to standby {standby}...")
+        eb_client.update_environment(
+            ApplicationName=application_name, EnvironmentName=standby, VersionLabel=label
+        )
+
+    try:
+        wait_for_health(eb_client, application_name, standby, label, **wait_kwargs)
+    except (DeploymentFailed, TimeoutError) as e:
+        # Traffic never left the live environment, so there is nothing to undo
+        raise DeploymentFailed(f"Standby {standby} did not become healthy, {live} stays live: {e}")
+
+    swap(eb_client, standby, live)
+    wait_for_swap(eb_client, application_name, [standby, live], **wait_kwargs)
+
+    if not stays_healthy(eb_client, application_name, standby, **wait_kwargs):
+        swap(eb_client, live, standby)
+        wait_for_swap(eb_client, application_name, [live, standby], **wait_kwargs)
+        raise DeploymentFailed(f"{standby} degraded after the swap; rolled traffic back to {live}")
+
+    print(f"{standby} is live with {label}; {live} is the warm standby.")
+    return standby
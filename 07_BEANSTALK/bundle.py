@@ -0,0 +1,144 @@
+import fnmatch
+import hashlib
+import os
+import zipfile
+
+from botocore.exceptions import ClientError
+
+# Content-addressed application bundles. The version label is derived from a hash of
+# the source files, the zip is byte-for-byte reproducible, and every step (zip, S3
+# upload, application version, environment update) is skipped when its result for
+# that hash already exists, so an unchanged redeploy costs a few API calls.
+
+ALWAYS_IGNORED = ['.git/', '.elasticbeanstalk/', '.bundles/', '__pycache__/', '*.pyc']
+KEEP_CACHED_BUNDLES = 5
+# Fixed timestamp and permissions so identical sources give identical zips
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+ZIP_FILE_MODE = 0o644 << 16
+
+
+def read_ignore_patterns(root):
+    patterns = list(ALWAYS_IGNORED)
+    path = os.path.join(root, '.ebignore')
+    if os.path.exists(path):
+        with open(path) as f:
+            patterns += [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    return patterns
+
+
+def _ignored(relative_path, patterns):
+    parts = relative_path.split('/')
+    for pattern in patterns:
+        if pattern.endswith('/'):
+            if any(fnmatch.fnmatch(part, pattern.rstrip('/')) for part in parts[:-1]):
+                return True
+        elif fnmatch.fnmatch(relative_path, pattern) or fnmatch.fnmatch(parts[-1], pattern):
+            return True
+        elif any(fnmatch.fnmatch(part, pattern) for part in parts[:-1]):
+            return True  # a bare name like 'virt' also excludes the directory
+    return False
+
+
+def collect_sources(root):
+    """Sorted relative paths of the files that go into the bundle"""
+    patterns = read_ignore_patterns(root)
+    files = []
+    for directory, subdirs, names in os.walk(root):
+        subdirs.sort()
+        for name in names:
+            relative = os.path.relpath(os.path.join(directory, name), root).replace(os.sep, '/')
+            if not _ignored(relative, patterns):
+                files.append(relative)
+    return sorted(files)
+
+
+def source_digest(root, files):
+    digest = hashlib.sha256()
+    for relative in files:
+        digest.update(relative.encode('utf-8') + b'\0')
+        with open(os.path.join(root, relative), 'rb') as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def build_bundle(root, cache_dir=None):
+    """Return (version_label, zip_path), reusing a cached zip for unchanged sources"""
+    cache_dir = cache_dir or os.path.join(root, '.bundles')
+    files = collect_sources(root)
+    digest = source_digest(root, files)
+    label = f"app-{digest[:16]}"
+    path = os.path.join(cache_dir, f"{label}.zip")
+    if os.path.exists(path):
+        os.utime(path)  # mark as recently used for pruning
+        return label, path
+
+    os.makedirs(cache_dir, exist_ok=True)
+    temporary = f"{path}.tmp"
+    with zipfile.ZipFile(temporary, 'w', zipfile.ZIP_DEFLATED) as bundle:
+        for relative in files:
+            info = zipfile.ZipInfo(relative, ZIP_DATE_TIME)
+            info.external_attr = ZIP_FILE_MODE
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with open(os.path.join(root, relative), 'rb') as f:
+                bundle.writestr(info, f.read())
+    os.replace(temporary, path)
+    _prune_cache(cache_dir)
+    return label, path
+
+
+def _prune_cache(cache_dir):
+    bundles = sorted(
+        (os.path.join(cache_dir, name) for name in os.listdir(cache_dir) if name.endswith('.zip')),
+        key=os.path.getmtime, reverse=True
+    )
+    for stale in bundles[KEEP_CACHED_BUNDLES:]:
+        os.remove(stale)
+
+
+def ensure_application_version(eb_client, s3_client, application_name, label, path):
+    """Upload the bundle and register it unless the version already exists"""
+    existing = eb_client.describe_application_versions(
+        ApplicationName=application_name, VersionLabels=[label]
+    )['ApplicationVersions']
+    if existing:
+        print(f"Application version {label} already exists, skipping upload.")
+        return False
+
+    bucket = eb_client.create_storage_location()['S3Bucket']
+    key = f"{application_name}/{label}.zip"
+    print(f"Uploading {os.path.basename(path)} to s3://{bucket}/{key}...")
+    with open(path, 'rb') as f:
+        s3_client.put_object(Bucket=bucket, Key=key, Body=f)
+    try:
+        eb_client.create_application_version(
+            ApplicationName=application_name,
+            VersionLabel=label,
+            SourceBundle={'S3Bucket': bucket, 'S3Key': key},
+            Process=False
+        )
+    except ClientError as e:
+        # Another deploy registered the same content in the meantime
+        if 'already exists' not in e.response['Error']['Message']:
+            raise
+    return True
+
+
+def deploy_bundle(eb_client, s3_client, application_name, environment_name, root):
+    """Build, upload and roll out root to an existing environment; returns the version label"""
+    label, path = build_bundle(root)
+    ensure_application_version(eb_client, s3_client, application_name, label, path)
+
+    environments = eb_client.describe_environments(
+        ApplicationName=application_name, EnvironmentNames=[environment_name], IncludeDeleted=False
+    )['Environments']
+    if environments and environments[0].get('VersionLabel') == label:
+        print(f"{environment_name} already runs {label}, nothing to deploy.")
+        return label
+
+    print(f"Updating {environment_name} to {label}...")
+    eb_client.update_environment(
+        ApplicationName=application_name,
+        EnvironmentName=environment_name,
+        VersionLabel=label
+    )
+    return label
@@ -0,0 +1,85 @@
+import os
+import threading
+import time
+
+import mysql.connector
+
+# Writer/reader routing for the feedback database. Writes and schema changes go to the
+# primary (RDS_HOSTNAME); reads are spread round-robin over the read replicas listed in
+# RDS_READER_HOSTNAMES. A replica that refuses connections is skipped for a while, and
+# with no healthy replica reads fall back to the primary.
+#
+# Replicas lag the primary by up to a few seconds, so a client that just submitted
+# feedback could open /all_feedbacks and not find it. After a write the app sets a
+# short-lived cookie, and while it is present that client's reads go to the primary.
+
+READER_HOSTNAMES = [host.strip() for host in os.environ.get('RDS_READER_HOSTNAMES', '').split(',') if host.strip()]
+READ_YOUR_WRITES_SECONDS = float(os.environ.get('READ_YOUR_WRITES_SECONDS', 5))
+# How long a replica that failed to connect is left out of the rotation
+REPLICA_RETRY_SECONDS = float(os.environ.get('REPLICA_RETRY_SECONDS', 30))
+RECENT_WRITE_COOKIE = 'recent_write'
+
+
+class Router:
+    """Hands out writer connections and load-balanced reader connections.
+
+    writer and readers are keyword arguments for connect(), which defaults to
+    mysql.connector.connect and can be any DB-API connect function.
+    """
+
+    def __init__(self, writer, readers=(), connect=mysql.connector.connect, errors=(mysql.connector.Error,),
+                 retry_seconds=REPLICA_RETRY_SECONDS, clock=time.monotonic):
+        self.writer_config = writer
+        self.reader_configs = list(readers)
+        self.connect = connect
+        self.errors = errors
+        self.retry_seconds = retry_seconds
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._turn = 0
+        self._down_until = {}  # reader index -> time it may be tried again
+
+    def writer(self):
+        return self.connect(**self.writer_config)
+
+    def _candidates(self):
+        """Reader indexes in round-robin order, starting at the next one, healthy ones only"""
+        with self._lock:
+            now = self.clock()
+            count = len(self.reader_configs)
+            order = [(self._turn + offset) % count for offset in range(count)]
+            self._turn += 1
+            return [index for index in order if self._down_until.get(index, 0) <= now]
+
+    def reader(self, sticky=False):
+        """A connection for reads: the primary when sticky or no replica answers, else the next replica"""
+        if not sticky:
+            for index in self._candidates():
+                try:
+                    return self.connect(**self.reader_configs[index])
+                except self.errors as e:
+                    with self._lock:
+                        self._down_until[index] = self.clock() + self.retry_seconds
+                    print(f"Read replica {self.reader_configs[index].get('host', index)} unavailable: {e}")
+        return self.writer()
+
+
+def from_environment(db_config, reader_hostnames=READER_HOSTNAMES):
+    """Router for the app's db_config, with replicas sharing its credentials and database"""
+    readers = [dict(db_config, host=host) for host in reader_hostnames]
+    return Router(db_config, readers)
+
+
+def wrote_recently(request):
+    try:
+        return float(request.cookies.get(RECENT_WRITE_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def remember_write(response, seconds=READ_YOUR_WRITES_SECONDS):
+    """Route this client's reads to the primary for the next few seconds"""
+    if seconds > 0:
+        response.set_cookie(RECENT_WRITE_COOKIE, f"{time.time() + seconds:.3f}", max_age=int(seconds) + 1,
+                            httponly=True, samesite='Lax')
+    return response
@@ -0,0 +1,10 @@
+import os
+
+bind = ':' + os.environ.get('PORT', '8000')
+worker_class = 'gthread'
+workers = int(os.environ.get('GUNICORN_WORKERS', 3))
+threads = int(os.environ.get('GUNICORN_THREADS', 2))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 65))
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
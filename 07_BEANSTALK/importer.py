@@ -0,0 +1,273 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from itertools import islice
+
+import migrate
+import search
+
+# Bulk import of historical feedback from CSV (with a header row) or NDJSON, e.g. the
+# files /export produces. Rows are streamed from the file and written in batches, one
+# transaction per batch, either as multi-row INSERTs (executemany, which
+# mysql.connector sends as a single INSERT ... VALUES (...), (...) statement) or, on
+# MySQL, with LOAD DATA LOCAL INFILE from a temporary file per batch.
+#
+# Each batch commits together with its row in import_checkpoints, so an interrupted
+# import rerun with the same arguments continues after the last committed batch. After
+# the rows, deferred indexes are rebuilt and the new rows are added to the search index.
+#
+#   python importer.py feedback.csv --method load-data --defer-indexes
+
+DEFAULT_BATCH_SIZE = 5000
+COLUMN_LIMITS = {'name': 100, 'email': 100, 'message': None}
+# Secondary indexes a load may drop and build once at the end instead of row by row
+DEFERRABLE_INDEXES = {'idx_feedback_created_at': ['created_at']}
+FORMATS = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}
+
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f"Cannot tell the format of {path}; pass --format csv or --format ndjson")
+    return FORMATS[extension]
+
+
+def read_records(path, input_format):
+    """Yield one dict per feedback record, reading the file as a stream"""
+    with open(path, newline='', encoding='utf-8') as f:
+        if input_format == 'csv':
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def to_row(record, number):
+    """(name, email, message, created_at) for one record; created_at is None when absent"""
+    row = []
+    for column, limit in COLUMN_LIMITS.items():
+        value = record.get(column)
+        if value is None or str(value) == '':
+            raise ValueError(f"Record {number}: missing {column}")
+        value = str(value)
+        if limit and len(value) > limit:
+            raise ValueError(f"Record {number}: {column} is longer than {limit} characters")
+        row.append(value)
+    created_at = record.get('created_at')
+    if created_at:
+        try:
+            moment = datetime.fromisoformat(str(created_at))
+        except ValueError:
+            raise ValueError(f"Record {number}: invalid created_at {created_at!r}")
+        if moment.tzinfo:
+            moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+        created_at = moment.strftime('%Y-%m-%d %H:%M:%S')
+    row.append(created_at or None)
+    return tuple(row)
+
+
+def insert_batch(schema, cursor, rows):
+    ph = schema.placeholder
+    cursor.executemany(
+        f"INSERT INTO feedback (name, email, message, created_at) "
+        f"VALUES ({ph}, {ph}, {ph}, COALESCE({ph}, CURRENT_TIMESTAMP))",
+        rows
+    )
+
+
+def _tsv_field(value):
+    if value is None:
+        return '\\N'
+    return (value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+            .replace('\r', '\\r').replace('\0', '\\0'))
+
+
+def load_data_batch(schema, cursor, rows):
+    """LOAD DATA LOCAL INFILE from a temporary tab-separated file; MySQL only"""
+    with tempfile.NamedTemporaryFile('w', suffix='.tsv', encoding='utf-8', newline='', delete=False) as f:
+        for row in rows:
+            f.write('\t'.join(_tsv_field(value) for value in row) + '\n')
+    try:
+        cursor.execute(
+            "LOAD DATA LOCAL INFILE %s INTO TABLE feedback CHARACTER SET utf8mb4 "
+            "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' "
+            "(name, email, message, @created_at) "
+            "SET created_at = COALESCE(@created_at, CURRENT_TIMESTAMP)",
+            (f.name,)
+        )
+    finally:
+        os.unlink(f.name)
+
+
+WRITERS = {'insert': insert_batch, 'load-data': load_data_batch}
+CHECKPOINT_COLUMNS = ('source_size', 'phase', 'rows_loaded', 'start_id', 'indexed_id', 'deferred_indexes')
+
+
+def read_checkpoint(schema, source):
+    rows = schema.execute(
+        f"SELECT {', '.join(CHECKPOINT_COLUMNS)} FROM import_checkpoints WHERE source = {schema.placeholder}",
+        (source,)
+    )
+    return dict(zip(CHECKPOINT_COLUMNS, rows[0])) if rows else None
+
+
+def save_checkpoint(schema, source, state):
+    """Record progress; the caller commits it together with the work it describes"""
+    ph = schema.placeholder
+    schema.execute(f"DELETE FROM import_checkpoints WHERE source = {ph}", (source,))
+    schema.execute(
+        f"INSERT INTO import_checkpoints (source, {', '.join(CHECKPOINT_COLUMNS)}, updated_at) "
+        f"VALUES ({', '.join([ph] * (len(CHECKPOINT_COLUMNS) + 2))})",
+        (source,) + tuple(state[column] for column in CHECKPOINT_COLUMNS)
+        + (datetime.now(timezone.utc).isoformat(timespec='seconds'),)
+    )
+
+
+def _start(schema, source, size, defer_indexes, unfinished=None):
+    max_id = schema.execute("SELECT MAX(id) FROM feedback")[0][0] or 0
+    indexed_id = max_id
+    deferred = set()
+    if unfinished:
+        # Restarting over a run that stopped early: its dropped indexes still need
+        # rebuilding and its rows still need search terms
+        indexed_id = min(indexed_id, unfinished['indexed_id'])
+        deferred.update(filter(None, unfinished['deferred_indexes'].split(',')))
+    if defer_indexes:
+        deferred.update(name for name in DEFERRABLE_INDEXES if schema.index_exists('feedback', name))
+    state = {'source_size': size, 'phase': 'load', 'rows_loaded': 0, 'start_id': max_id,
+             'indexed_id': indexed_id, 'deferred_indexes': ','.join(sorted(deferred))}
+    # Recorded before the indexes go, so a resumed import still knows to rebuild them
+    save_checkpoint(schema, source, state)
+    schema.connection.commit()
+    for name in sorted(deferred):
+        schema.drop_index('feedback', name)
+        print(f"Dropped {name} until the load finishes")
+    return state
+
+
+def _load(schema, path, input_format, method, batch_size, source, state):
+    connection = schema.connection
+    records = read_records(path, input_format or detect_format(path))
+    rows = islice((to_row(record, number) for number, record in enumerate(records, 1)), state['rows_loaded'], None)
+    write = WRITERS[method]
+    loaded = 0
+    started = time.monotonic()
+    cursor = connection.cursor()
+    try:
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            write(schema, cursor, batch)
+            state['rows_loaded'] += len(batch)
+            save_checkpoint(schema, source, state)
+            connection.commit()
+            loaded += len(batch)
+            elapsed = time.monotonic() - started
+            print(f"{state['rows_loaded']:>12,} rows loaded  {loaded / elapsed if elapsed else 0:>10,.0f} rows/s")
+    except BaseException:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+    return loaded, time.monotonic() - started
+
+
+def import_file(connection, path, input_format=None, method='insert', batch_size=DEFAULT_BATCH_SIZE,
+                defer_indexes=False, index_search=True, restart=False, source=None):
+    """Import path into feedback, resuming a previous run of the same source.
+
+    Returns {'rows': rows loaded by this run, 'seconds': load time, 'rows_per_second': ...}.
+    """
+    schema = migrate.Schema(connection)
+    if method == 'load-data' and schema.dialect != 'mysql':
+        raise ValueError('LOAD DATA needs MySQL; use --method insert')
+    if not schema.table_exists('import_checkpoints'):
+        raise RuntimeError('import_checkpoints is missing; run migrate.py upgrade first')
+    source = source or os.path.basename(path)
+    size = os.path.getsize(path)
+
+    state = read_checkpoint(schema, source)
+    if state and restart:
+        state = _start(schema, source, size, defer_indexes, state if state['phase'] != 'done' else None)
+    elif state:
+        if state['source_size'] != size:
+            raise RuntimeError(f"{path} changed since {source} was imported; use --restart to import it again")
+        if state['phase'] == 'done':
+            print(f"{source} was already imported ({state['rows_loaded']} rows); use --restart to import it again")
+            return {'rows': 0, 'seconds': 0.0, 'rows_per_second': 0.0}
+        print(f"Resuming {source} after {state['rows_loaded']} rows ({state['phase']} phase)")
+    else:
+        state = _start(schema, source, size, defer_indexes)
+
+    loaded, seconds = 0, 0.0
+    if state['phase'] == 'load':
+        loaded, seconds = _load(schema, path, input_format, method, batch_size, source, state)
+        state['phase'] = 'index'
+        save_checkpoint(schema, source, state)
+        connection.commit()
+        print(f"Loaded {loaded:,} rows in {seconds:.1f}s ({loaded / seconds if seconds else 0:,.0f} rows/s)")
+
+    for name in filter(None, state['deferred_indexes'].split(',')):
+        started = time.monotonic()
+        schema.create_index('feedback', name, DEFERRABLE_INDEXES[name])
+        print(f"Rebuilt {name} in {time.monotonic() - started:.1f}s")
+    state['deferred_indexes'] = ''
+    save_checkpoint(schema, source, state)
+    connection.commit()
+
+    if index_search:
+        started = time.monotonic()
+
+        def record_progress(last_id):
+            state['indexed_id'] = last_id
+            save_checkpoint(schema, source, state)
+
+        # Rows the app inserted meanwhile are already indexed; their terms are kept
+        search.index_after(connection, state['indexed_id'], ignore_existing=True, on_batch=record_progress)
+        print(f"Indexed the new rows for search in {time.monotonic() - started:.1f}s")
+    else:
+        print("Skipped the search index; run search.rebuild_index() before relying on /search")
+
+    state['phase'] = 'done'
+    save_checkpoint(schema, source, state)
+    connection.commit()
+    return {'rows': loaded, 'seconds': seconds, 'rows_per_second': loaded / seconds if seconds else 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk import feedback from CSV or NDJSON')
+    parser.add_argument('path', help='CSV file with a header row, or NDJSON with one object per line')
+    parser.add_argument('--sqlite', metavar='PATH', help='import into a local SQLite file instead of RDS_HOSTNAME')
+    parser.add_argument('--format', choices=['csv', 'ndjson'], help='input format (default: from the extension)')
+    parser.add_argument('--method', choices=sorted(WRITERS), default='insert',
+                        help='multi-row INSERT batches, or LOAD DATA LOCAL INFILE (MySQL only)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='rows per transaction')
+    parser.add_argument('--defer-indexes', action='store_true',
+                        help='drop secondary indexes during the load and rebuild them afterwards')
+    parser.add_argument('--no-search-index', action='store_true', help='leave the new rows out of /search')
+    parser.add_argument('--source', help='checkpoint name (default: the file name)')
+    parser.add_argument('--restart', action='store_true', help='ignore the checkpoint and import the whole file')
+    args = parser.parse_args()
+
+    # LOAD DATA LOCAL may only read the temporary batch files
+    options = {'allow_local_infile_in_path': tempfile.gettempdir()} if args.method == 'load-data' else {}
+    connection = migrate.connect(args.sqlite, **options)
+    try:
+        import_file(connection, args.path, args.format, args.method, args.batch_size,
+                    args.defer_indexes, not args.no_search_index, args.restart, args.source)
+    except KeyboardInterrupt:
+        print("\nInterrupted; run the same command again to resume after the last committed batch")
+        return 130
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,17 +1,92 @@
-import boto3
 import os
-import time
 import shutil
 import subprocess
 from botocore.exceptions import ClientError
 import json
+import sys
+
+import bundle
+import provisioning
+import proxy
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from aws_common import clients, db_profiles, registry, replicas, waiting
+
+# vCPUs and memory (MiB) of the instance types we deploy to, used to size gunicorn
+INSTANCE_SPECS = {
+    't2.micro': (1, 1024),
+    't2.small': (1, 2048),
+    't2.medium': (2, 4096),
+    't3.micro': (2, 1024),
+    't3.small': (2, 2048),
+    't3.medium': (2, 4096),
+    't3.large': (2, 8192),
+    'm5.large': (2, 8192),
+    'c5.large': (2, 4096),
+    't4g.micro': (2, 1024),
+    't4g.small': (2, 2048),
+    't4g.medium': (2, 4096),
+    'm6g.large': (2, 8192),
+    'c6g.large': (2, 4096),
+}
+
+# Rough resident size of one gunicorn worker running the feedback app
+WORKER_MEMORY_MB = 200
+
+# This directory: the feedback app the deployer copies into its bundle, with its read
+# replica routing, metrics, rate limiting, search and migrations (which
+# .ebextensions/02_migrate.config runs on the leader on every deploy)
+APP_SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Written per deployment from the serving profile instead of copied
+GENERATED_SOURCES = ['gunicorn.conf.py', 'Procfile', '.ebextensions/01_flask.config']
+# The deployer's environment keeps Elastic Beanstalk's default security group
+EXCLUDED_SOURCES = ['.ebextensions/security-group.config']
+
+
+def serving_profile(instance_type, overrides=None):
+    """Derive gunicorn workers/threads/keep-alive/max-requests from the instance type"""
+    vcpus, memory_mb = INSTANCE_SPECS.get(instance_type, (1, 1024))
+    # 2 * cores + 1 workers, capped so the workers fit in memory next to the OS and nginx
+    workers = max(1, min(2 * vcpus + 1, (memory_mb - 256) // WORKER_MEMORY_MB))
+    profile = {
+        'workers': workers,
+        # Requests mostly wait on MySQL, so a few threads per worker keep the CPU busy
+        'threads': 2 if vcpus == 1 else 4,
+        # Slightly above nginx's upstream keepalive_timeout so nginx closes idle connections first
+        'keepalive': 65,
+        'max_requests': 1000,
+        'max_requests_jitter': 100,
+        'timeout': 30,
+    }
+    if overrides:
+        profile.update(overrides)
+    return profile
+
+
+def gunicorn_config(profile):
+    """Render gunicorn.conf.py, with the profile as defaults that environment properties can override"""
+    return f'''import os
+
+bind = ':' + os.environ.get('PORT', '8000')
+worker_class = 'gthread'
+workers = int(os.environ.get('GUNICORN_WORKERS', {profile['workers']}))
+threads = int(os.environ.get('GUNICORN_THREADS', {profile['threads']}))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', {profile['keepalive']}))
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', {profile['max_requests']}))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', {profile['max_requests_jitter']}))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', {profile['timeout']}))
+'''
+
 
 class ElasticBeanstalkDeployer:
-    def __init__(self, region='ap-south-1'):
+    def __init__(self, region='ap-south-1', instance_type='t2.micro', serving_overrides=None, proxy_cache=False,
+                 read_replicas=0, db_profile=db_profiles.DEFAULT_PROFILE):
         self.region = region
-        self.eb_client = boto3.client('elasticbeanstalk', region_name=region)
-        self.rds_client = boto3.client('rds', region_name=region)
-        self.iam_client = boto3.client('iam', region_name=region)
+        # Shared clients, built on first use; the provisioning steps call them from several threads
+        self.eb_client = clients.lazy_client('elasticbeanstalk', region)
+        self.rds_client = clients.lazy_client('rds', region)
+        self.iam_client = clients.lazy_client('iam', region)
+        self.s3_client = clients.lazy_client('s3', region)
         
         # Configuration
         self.application_name = 'feedback-app2'
@@ -20,9 +95,33 @@ class ElasticBeanstalkDeployer:
         self.instance_profile_name = 'aws-elasticbeanstalk-ec2-role'
         self.service_role_name = 'aws-elasticbeanstalk-service-role'
         self.solution_stack_name = '64bit Amazon Linux 2023 v4.2.0 running Python 3.12'
+        self.app_dir = os.path.abspath('feedback-app')
+        self.instance_type = instance_type
+        self.serving_profile = serving_profile(instance_type, serving_overrides)
+        # Replace the platform's nginx site with the micro-caching one from proxy.py
+        self.proxy_cache = proxy_cache
+        # Read replicas for the app's reads; application.py finds them in RDS_READER_HOSTNAMES
+        self.read_replicas = read_replicas
+        # Instance class, storage and MySQL parameters from aws_common/db_profiles.json
+        self.db_profile = db_profile
+
+    def serving_option_settings(self):
+        """Expose the serving profile as environment properties so it can be tuned without a redeploy"""
+        return [
+            {
+                'Namespace': 'aws:elasticbeanstalk:application:environment',
+                'OptionName': f'GUNICORN_{key.upper()}',
+                'Value': str(value)
+            }
+            for key, value in self.serving_profile.items()
+        ]
 
     def create_service_role(self):
         """Create the Elastic Beanstalk service role"""
+        existing_arn = registry.role_arn(self.iam_client, self.service_role_name)
+        if existing_arn:
+            print(f"Service role {self.service_role_name} already exists.")
+            return existing_arn
         try:
             service_role_policy = {
                 "Version": "2012-10-17",
@@ -49,9 +148,8 @@ class ElasticBeanstalkDeployer:
                 PolicyArn='arn:aws:iam::aws:policy/service-role/AWSElasticBeanstalkService'
             )
 
-            # Wait for role to be available
-            time.sleep(10)
-            return self.iam_client.get_role(RoleName=self.service_role_name)['Role']['Arn']
+            # Wait for role to be visible
+            return waiting.wait_for_role(self.iam_client, self.service_role_name)
 
         except ClientError as e:
             if e.response['Error']['Code'] == 'EntityAlreadyExists':
@@ -107,9 +205,10 @@ class ElasticBeanstalkDeployer:
                 RoleName=self.instance_profile_name
             )
 
-            # Wait for instance profile to be available
-            time.sleep(10)
-            return self.instance_profile_name
+            # Wait for instance profile to carry the role
+            return waiting.wait_for_instance_profile(
+                self.iam_client, self.instance_profile_name, self.instance_profile_name
+            )
 
         except ClientError as e:
             if e.response['Error']['Code'] == 'EntityAlreadyExists':
@@ -119,125 +218,15 @@ class ElasticBeanstalkDeployer:
                 raise
 
     def create_application_files(self):
-        """Create necessary application files and directories"""
-        # Create base directory
-        os.makedirs('feedback-app', exist_ok=True)
-        os.chdir('feedback-app')
-        
-        # Create required directories
-        directories = ['.ebextensions', 'templates', 'static']
-        for directory in directories:
-            os.makedirs(directory, exist_ok=True)
-
-        # Create application.py
-        with open('application.py', 'w') as f:
-            f.write('''import os
-from flask import Flask, render_template, request, redirect, url_for, flash
-import mysql.connector
-from mysql.connector import Error
-
-application = Flask(__name__)
-app = application
-app.secret_key = os.environ.get('FLASK_SECRET_KEY', os.urandom(24))
-
-# MySQL Configuration from environment variables
-db_config = {
-    'host': os.environ.get('RDS_HOSTNAME', 'localhost'),
-    'user': os.environ.get('RDS_USERNAME', 'admin'),
-    'password': os.environ.get('RDS_PASSWORD', 'password'),
-    'database': os.environ.get('RDS_DB_NAME', 'feedback'),
-    'port': int(os.environ.get('RDS_PORT', 3306))
-}
-
-def create_connection():
-    try:
-        connection = mysql.connector.connect(**db_config)
-        return connection
-    except Error as e:
-        print(f"Error connecting to MySQL: {e}")
-        return None
-
-def create_table():
-    try:
-        connection = create_connection()
-        cursor = connection.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS feedback (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                name VARCHAR(100) NOT NULL,
-                email VARCHAR(100) NOT NULL,
-                message TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        connection.commit()
-    except Error as e:
-        print(f"Error creating table: {e}")
-    finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
-
-@app.route('/')
-def index():
-    return render_template('index.html')
-
-@app.route('/submit_feedback', methods=['POST'])
-def submit_feedback():
-    if request.method == 'POST':
-        name = request.form['name']
-        email = request.form['email']
-        message = request.form['message']
+        """Copy the feedback app into app_dir and write the files that depend on this deployment"""
+        # Paths under app_dir rather than os.chdir: other deploy steps run concurrently
+        os.makedirs(self.app_dir, exist_ok=True)
 
-        try:
-            connection = create_connection()
-            cursor = connection.cursor()
-            query = "INSERT INTO feedback (name, email, message) VALUES (%s, %s, %s)"
-            values = (name, email, message)
-            cursor.execute(query, values)
-            connection.commit()
-            flash('Feedback submitted successfully!', 'success')
-        except Error as e:
-            print(f"Error inserting feedback: {e}")
-            flash('An error occurred. Please try again.', 'error')
-        finally:
-            if connection and connection.is_connected():
-                cursor.close()
-                connection.close()
-
-    return redirect(url_for('index'))
-
-@app.route('/all_feedbacks')
-def all_feedbacks():
-    try:
-        connection = create_connection()
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM feedback ORDER BY created_at DESC")
-        feedbacks = cursor.fetchall()
-        return render_template('all_feedbacks.html', feedbacks=feedbacks)
-    except Error as e:
-        print(f"Error fetching feedbacks: {e}")
-        flash('An error occurred while fetching feedbacks.', 'error')
-        return redirect(url_for('index'))
-    finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
-
-if __name__ == '__main__':
-    create_table()
-    application.run(host='0.0.0.0', port=8080)
-''')
-
-        # Create requirements.txt
-        with open('requirements.txt', 'w') as f:
-            f.write('''Flask==2.0.1
-mysql-connector-python==8.0.26
-Werkzeug==2.0.1
-''')
+        self._copy_sources(exclude=GENERATED_SOURCES + EXCLUDED_SOURCES)
 
         # Create .ebextensions configuration
-        with open('.ebextensions/01_flask.config', 'w') as f:
+        os.makedirs(os.path.join(self.app_dir, '.ebextensions'), exist_ok=True)
+        with open(os.path.join(self.app_dir, '.ebextensions/01_flask.config'), 'w') as f:
             f.write('''option_settings:
   aws:elasticbeanstalk:container:python:
     WSGIPath: application:application
@@ -245,141 +234,43 @@ Werkzeug==2.0.1
     /static: static
 ''')
 
-        # Create Procfile
-        with open('Procfile', 'w') as f:
-            f.write('web: python application.py')
-
-        # Create templates
-        self._create_templates()
-
-    def _create_templates(self):
-        """Create HTML templates"""
-        # Create index.html
-        with open('templates/index.html', 'w') as f:
-            f.write('''<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Feedback Form</title>
-    <style>
-        body {
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            max-width: 600px;
-            margin: 0 auto;
-            padding: 20px;
-            background-color: #f0f4f8;
-        }
-        form {
-            background-color: white;
-            padding: 20px;
-            border-radius: 8px;
-            box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        }
-        input, textarea {
-            width: 100%;
-            padding: 8px;
-            margin: 8px 0;
-            border: 1px solid #ddd;
-            border-radius: 4px;
-        }
-        button {
-            background-color: #4CAF50;
-            color: white;
-            padding: 10px 15px;
-            border: none;
-            border-radius: 4px;
-            cursor: pointer;
-        }
-    </style>
-</head>
-<body>
-    <h1>Feedback Form</h1>
-    {% with messages = get_flashed_messages(with_categories=true) %}
-        {% if messages %}
-            {% for category, message in messages %}
-                <div class="flash-{{ category }}">{{ message }}</div>
-            {% endfor %}
-        {% endif %}
-    {% endwith %}
-    <form action="{{ url_for('submit_feedback') }}" method="POST">
-        <input type="text" name="name" placeholder="Your Name" required>
-        <input type="email" name="email" placeholder="Your Email" required>
-        <textarea name="message" placeholder="Your Feedback" rows="5" required></textarea>
-        <button type="submit">Submit Feedback</button>
-    </form>
-    <a href="{{ url_for('all_feedbacks') }}">View All Feedbacks</a>
-</body>
-</html>''')
-
-        # Create all_feedbacks.html
-        with open('templates/all_feedbacks.html', 'w') as f:
-            f.write('''<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>All Feedbacks</title>
-    <style>
-        body {
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            max-width: 800px;
-            margin: 0 auto;
-            padding: 20px;
-            background-color: #f0f4f8;
-        }
-        table {
-            width: 100%;
-            border-collapse: collapse;
-            background-color: white;
-            box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        }
-        th, td {
-            padding: 12px;
-            text-align: left;
-            border-bottom: 1px solid #ddd;
-        }
-        th {
-            background-color: #4CAF50;
-            color: white;
-        }
-    </style>
-</head>
-<body>
-    <h1>All Feedbacks</h1>
-    <table>
-        <thead>
-            <tr>
-                <th>Name</th>
-                <th>Email</th>
-                <th>Message</th>
-                <th>Created At</th>
-            </tr>
-        </thead>
-        <tbody>
-            {% for feedback in feedbacks %}
-            <tr>
-                <td>{{ feedback.name }}</td>
-                <td>{{ feedback.email }}</td>
-                <td>{{ feedback.message }}</td>
-                <td>{{ feedback.created_at }}</td>
-            </tr>
-            {% endfor %}
-        </tbody>
-    </table>
-    <a href="{{ url_for('index') }}">Back to Feedback Form</a>
-</body>
-</html>''')
+        # Create gunicorn config and Procfile
+        with open(os.path.join(self.app_dir, 'gunicorn.conf.py'), 'w') as f:
+            f.write(gunicorn_config(self.serving_profile))
+
+        with open(os.path.join(self.app_dir, 'Procfile'), 'w') as f:
+            f.write('web: gunicorn --config gunicorn.conf.py application:application')
+
+        # nginx overrides shipped in the bundle under .platform/
+        if self.proxy_cache:
+            proxy.write_platform_files(self.app_dir, profile=self.serving_profile)
+        else:
+            proxy.remove_platform_files(self.app_dir)
+
+    def _copy_sources(self, exclude=()):
+        """Copy the files a bundle of APP_SOURCE_DIR would include, except the excluded paths"""
+        for relative in bundle.collect_sources(APP_SOURCE_DIR):
+            if relative in exclude:
+                continue
+            # app_dir itself when the deployer runs from this directory
+            if os.path.join(APP_SOURCE_DIR, relative).startswith(os.path.join(self.app_dir, '')):
+                continue
+            target = os.path.join(self.app_dir, relative)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(os.path.join(APP_SOURCE_DIR, relative), target)
 
     def create_rds_instance(self):
         """Create RDS instance"""
+        endpoint = registry.db_endpoint(self.rds_client, self.db_instance_identifier)
+        if endpoint:
+            print(f"RDS instance {self.db_instance_identifier} already exists.")
+            return endpoint
         try:
+            db_settings = db_profiles.prepare(self.rds_client, self.db_profile)
             print("Creating RDS instance...")
             response = self.rds_client.create_db_instance(
                 DBInstanceIdentifier=self.db_instance_identifier,
-                AllocatedStorage=20,
-                DBInstanceClass='db.t4g.micro',
-                Engine='mysql',
+                **db_settings,
                 MasterUsername='admin',
                 MasterUserPassword='password',  # Change this in production
                 DBName='feedback',
@@ -408,14 +299,21 @@ Werkzeug==2.0.1
             else:
                 raise
 
-    def deploy_to_elastic_beanstalk(self, rds_endpoint):
-        """Deploy application to Elastic Beanstalk"""
+    def create_read_replicas(self, rds_endpoint=None):
+        """Endpoints of the read replicas of the RDS instance (none unless read_replicas is set)"""
+        if not self.read_replicas:
+            return []
+        profile = db_profiles.get_profile(self.db_profile)
+        # Same MySQL parameters as the primary; security groups are copied from it
+        return replicas.create_read_replicas(
+            self.rds_client, self.db_instance_identifier, self.read_replicas,
+            instance_class=profile['instance_class'],
+            parameter_group_name=db_profiles.parameter_group_name(self.db_profile, profile)
+        )
+
+    def create_application(self):
+        """Create the Elastic Beanstalk application"""
         try:
-            # Create necessary IAM roles first
-            service_role_arn = self.create_service_role()
-            instance_profile = self.create_instance_profile()
-
-            # Create Elastic Beanstalk application
             print("Creating Elastic Beanstalk application...")
             self.eb_client.create_application(
                 ApplicationName=self.application_name,
@@ -426,14 +324,52 @@ Werkzeug==2.0.1
                 print(f"Application {self.application_name} already exists.")
             else:
                 raise
+        return self.application_name
+
+    def create_application_version(self):
+        """Bundle the application files and register them, skipping unchanged content"""
+        label, path = bundle.build_bundle(self.app_dir)
+        bundle.ensure_application_version(self.eb_client, self.s3_client, self.application_name, label, path)
+        return label
+
+    def environment_exists(self):
+        environments = self.eb_client.describe_environments(
+            ApplicationName=self.application_name,
+            EnvironmentNames=[self.environment_name],
+            IncludeDeleted=False
+        )['Environments']
+        return any(env['Status'] not in ['Terminated', 'Terminating'] for env in environments)
+
+    def redeploy(self):
+        """Roll the current application files out to the existing environment"""
+        label = bundle.deploy_bundle(
+            self.eb_client, self.s3_client, self.application_name, self.environment_name, self.app_dir
+        )
+        self.wait_for_environment()
+        return label
 
+    def deploy_to_elastic_beanstalk(self, rds_endpoint):
+        """Deploy application to Elastic Beanstalk"""
+        # Create necessary IAM roles first
+        service_role_arn = self.create_service_role()
+        instance_profile = self.create_instance_profile()
+        self.create_application()
+        version_label = self.create_application_version()
+        self.create_environment(rds_endpoint, service_role_arn, instance_profile, version_label)
+        return self.wait_for_environment()
+
+    def create_environment(self, rds_endpoint, service_role_arn, instance_profile, version_label=None,
+                           reader_endpoints=()):
+        """Create the Elastic Beanstalk environment"""
         try:
             # Create Elastic Beanstalk environment
             print("Creating Elastic Beanstalk environment...")
+            version = {'VersionLabel': version_label} if version_label else {}
             response = self.eb_client.create_environment(
                 ApplicationName=self.application_name,
                 EnvironmentName=self.environment_name,
                 SolutionStackName=self.solution_stack_name,
+                **version,
                 OptionSettings=[
                     {
                         'Namespace': 'aws:autoscaling:launchconfiguration',
@@ -448,13 +384,18 @@ Werkzeug==2.0.1
                     {
                         'Namespace': 'aws:autoscaling:launchconfiguration',
                         'OptionName': 'InstanceType',
-                        'Value': 't2.micro'
+                        'Value': self.instance_type
                     },
                     {
                         'Namespace': 'aws:elasticbeanstalk:application:environment',
                         'OptionName': 'RDS_HOSTNAME',
                         'Value': rds_endpoint
                     },
+                    {
+                        'Namespace': 'aws:elasticbeanstalk:application:environment',
+                        'OptionName': 'RDS_READER_HOSTNAMES',
+                        'Value': ','.join(reader_endpoints)
+                    },
                     {
                         'Namespace': 'aws:elasticbeanstalk:application:environment',
                         'OptionName': 'RDS_PORT',
@@ -475,58 +416,90 @@ Werkzeug==2.0.1
                         'OptionName': 'RDS_PASSWORD',
                         'Value': 'password'  # Change this in production
                     }
-                ]
+                ] + self.serving_option_settings()
             )
-            
-            # Wait for environment to be ready using describe_environments instead of waiter
-            print("Waiting for environment to be ready...")
-            while True:
-                env_response = self.eb_client.describe_environments(
-                    ApplicationName=self.application_name,
-                    EnvironmentNames=[self.environment_name]
-                )
-                
-                if not env_response['Environments']:
-                    print("Environment not found. Waiting...")
-                    time.sleep(10)
-                    continue
-                
-                status = env_response['Environments'][0]['Status']
-                health = env_response['Environments'][0]['Health']
-                
-                print(f"Environment status: {status}, health: {health}")
-                
-                if status == 'Ready' and health in ['Green', 'Yellow']:
-                    break
-                elif status in ['Terminated', 'Terminating']:
-                    raise Exception(f"Environment failed to deploy. Status: {status}")
-                
-                time.sleep(10)
-            
-            return response['EndpointURL']
-            
+            return response['EnvironmentId']
+
         except ClientError as e:
             print(f"Error creating environment: {e}")
             raise
 
+    def wait_for_environment(self, timeout=1800, **wait_kwargs):
+        """Wait for the environment to be Ready and return its endpoint URL"""
+        print("Waiting for environment to be ready...")
+        events = waiting.EnvironmentEvents(self.eb_client, self.application_name, self.environment_name)
+
+        def check():
+            waiting.print_events(events.poll())
+            env_response = self.eb_client.describe_environments(
+                ApplicationName=self.application_name,
+                EnvironmentNames=[self.environment_name]
+            )
+            if not env_response['Environments']:
+                print("Environment not found. Waiting...")
+                return None
+
+            status = env_response['Environments'][0]['Status']
+            health = env_response['Environments'][0]['Health']
+            print(f"Environment status: {status}, health: {health}")
+
+            if status == 'Ready' and health in ['Green', 'Yellow']:
+                return env_response['Environments'][0]['EndpointURL']
+            elif status in ['Terminated', 'Terminating']:
+                raise Exception(f"Environment failed to deploy. Status: {status}")
+            return None
+
+        # Environment creation takes minutes, so back off to one check every 30 s
+        return waiting.wait_until(check, timeout=timeout, initial=5, maximum=30,
+                                  description=f"environment {self.environment_name}", **wait_kwargs)
+
+    def provisioning_steps(self):
+        """Deploy steps and the outputs each one needs, for provisioning.run_dag"""
+        return {
+            'files': (self.create_application_files, []),
+            'rds_endpoint': (self.create_rds_instance, []),
+            'reader_endpoints': (self.create_read_replicas, ['rds_endpoint']),
+            'service_role_arn': (self.create_service_role, []),
+            'instance_profile': (self.create_instance_profile, []),
+            'application': (self.create_application, []),
+            'version_label': (lambda **_: self.create_application_version(), ['files', 'application']),
+            'environment': (
+                lambda rds_endpoint, reader_endpoints, service_role_arn, instance_profile, version_label:
+                    self.create_environment(rds_endpoint, service_role_arn, instance_profile, version_label,
+                                            reader_endpoints),
+                ['rds_endpoint', 'reader_endpoints', 'service_role_arn', 'instance_profile', 'version_label']
+            ),
+            'endpoint_url': (lambda environment: self.wait_for_environment(), ['environment']),
+        }
+
 def main():
-    deployer = ElasticBeanstalkDeployer()
-    
-    # Create application files
-    print("Creating application files...")
-    deployer.create_application_files()
-    
-    # Create RDS instance
-    print("Setting up RDS...")
-    rds_endpoint = deployer.create_rds_instance()
-    print(f"RDS endpoint: {rds_endpoint}")
-    
-    # Deploy to Elastic Beanstalk
-    print("Deploying to Elastic Beanstalk...")
-    endpoint_url = deployer.deploy_to_elastic_beanstalk(rds_endpoint)
-    
+    # NGINX_MICROCACHE=1 puts the caching nginx configuration from proxy.py in front of gunicorn
+    # READ_REPLICAS=n adds n RDS read replicas that serve the app's reads
+    # INSTANCE_TYPE picks the environment's instance type, e.g. from aws_common/instance_bench.py
+    deployer = ElasticBeanstalkDeployer(instance_type=os.environ.get('INSTANCE_TYPE', 't2.micro'),
+                                        proxy_cache=os.environ.get('NGINX_MICROCACHE', '0') == '1',
+                                        read_replicas=int(os.environ.get('READ_REPLICAS', 0)))
+
+    # Repeat deploys only ship changed sources to the running environment
+    if deployer.environment_exists():
+        print("Environment exists, deploying the current application files...")
+        deployer.create_application_files()
+        label = deployer.redeploy()
+        print(f"\n{deployer.environment_name} is running {label}")
+        return
+
+    # IAM roles, the application and the files don't need RDS, so they run while it comes up;
+    # only the environment waits for the RDS endpoint
+    print("Provisioning RDS, IAM roles and the Elastic Beanstalk application...")
+    steps = deployer.provisioning_steps()
+    results, timings = provisioning.run_dag(steps)
+    print(f"RDS endpoint: {results['rds_endpoint']}")
+    if results['reader_endpoints']:
+        print(f"Read replicas: {', '.join(results['reader_endpoints'])}")
+    provisioning.print_report(steps, timings)
+
     print("\nDeployment completed!")
-    print(f"Your application is available at: http://{endpoint_url}")
+    print(f"Your application is available at: http://{results['endpoint_url']}")
     print("\nNote: It may take a few minutes for the application to be fully operational.")
 
 if __name__ == "__main__":
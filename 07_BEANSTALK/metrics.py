@@ -0,0 +1,190 @@
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, request, before_render_template, template_rendered
+
+# In-process latency histograms for the feedback app, exposed in the Prometheus text
+# format on /metrics. Each gunicorn worker keeps its own registry, so a scrape shows
+# the worker that answered it; scrape through the load balancer and sum per pid.
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_SECONDS = float(os.environ.get('SLOW_QUERY_SECONDS', 0.5))
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in pairs) + '}'
+
+
+class Histogram:
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._lock = threading.Lock()
+        # labels -> [bucket counts..., sum, count]
+        self._series = {}
+
+    def observe(self, seconds, *labels):
+        index = bisect.bisect_left(BUCKETS, seconds)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(BUCKETS) + 2)
+            if index < len(BUCKETS):
+                series[index] += 1
+            series[-2] += seconds
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for labels, series in sorted(snapshot.items()):
+            pairs = list(zip(self.label_names, labels))
+            cumulative = 0
+            for bound, count in zip(BUCKETS, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(pairs + [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(pairs + [('le', '+Inf')])} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(pairs)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(pairs)} {series[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self):
+        with self._lock:
+            self.value += 1
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter",
+                f"{self.name} {self.value}"]
+
+
+REQUEST_LATENCY = Histogram('http_request_duration_seconds', 'Request latency by route',
+                            ('route', 'method', 'status'))
+DB_CONNECT_LATENCY = Histogram('db_connect_duration_seconds', 'Time to acquire a MySQL connection')
+DB_QUERY_LATENCY = Histogram('db_query_duration_seconds', 'Time spent in cursor calls by statement type',
+                             ('route', 'operation'))
+RENDER_LATENCY = Histogram('template_render_duration_seconds', 'Template render time', ('template',))
+SLOW_QUERIES = Counter('db_slow_queries_total', 'Statements slower than SLOW_QUERY_SECONDS')
+REGISTRY = [REQUEST_LATENCY, DB_CONNECT_LATENCY, DB_QUERY_LATENCY, RENDER_LATENCY, SLOW_QUERIES]
+
+
+def _route():
+    try:
+        return request.endpoint or 'unmatched'
+    except RuntimeError:
+        return 'none'  # outside a request, e.g. create_table at startup
+
+
+@contextmanager
+def time_connect():
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        DB_CONNECT_LATENCY.observe(time.perf_counter() - start)
+
+
+class InstrumentedCursor:
+    """Cursor proxy that times execute/fetch calls and logs slow statements"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def _timed(self, operation, statement, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            DB_QUERY_LATENCY.observe(elapsed, _route(), operation)
+            if elapsed >= SLOW_QUERY_SECONDS:
+                SLOW_QUERIES.inc()
+                logger.warning("Slow %s (%.3fs) on %s: %s", operation, elapsed, _route(), ' '.join(statement.split()))
+
+    def execute(self, statement, params=None):
+        operation = statement.split(None, 1)[0].upper()
+        return self._timed(operation, statement, self._cursor.execute, statement, params)
+
+    def executemany(self, statement, seq_params):
+        operation = statement.split(None, 1)[0].upper()
+        return self._timed(operation, statement, self._cursor.executemany, statement, seq_params)
+
+    def fetchone(self):
+        return self._timed('FETCH', 'fetchone', self._cursor.fetchone)
+
+    def fetchmany(self, size=1):
+        return self._timed('FETCH', 'fetchmany', self._cursor.fetchmany, size)
+
+    def fetchall(self):
+        return self._timed('FETCH', 'fetchall', self._cursor.fetchall)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedConnection:
+    """Connection proxy whose cursors are InstrumentedCursors"""
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._connection.cursor(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+def _before_render(sender, template, context, **extra):
+    g.render_started = time.perf_counter()
+
+
+def _rendered(sender, template, context, **extra):
+    started = g.pop('render_started', None)
+    if started is not None:
+        RENDER_LATENCY.observe(time.perf_counter() - started, template.name)
+
+
+def init_app(app):
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_latency(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            REQUEST_LATENCY.observe(time.perf_counter() - started, _route(), request.method,
+                                    str(response.status_code))
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        lines = []
+        for metric in REGISTRY:
+            lines.extend(metric.render())
+        lines.append(f"process_pid {os.getpid()}")
+        return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
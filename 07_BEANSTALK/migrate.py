@@ -0,0 +1,250 @@
+import argparse
+import hashlib
+import importlib.util
+import os
+import re
+import sqlite3
+import sys
+from datetime import datetime, timezone
+
+# Versioned schema migrations for the feedback database. Each file in migrations/ is
+# named NNNN_description.py and defines upgrade(schema) and downgrade(schema); the
+# versions applied so far are recorded in schema_migrations. Elastic Beanstalk runs
+# `python migrate.py upgrade` once per deployment on the leader instance
+# (.ebextensions/02_migrate.config), and `python application.py` runs it locally.
+#
+# The same migrations run on MySQL/MariaDB and on SQLite for local tests; Schema hides
+# the differences. MySQL cannot roll back DDL, so every migration is recorded as soon as
+# it succeeds and a failed one can be fixed and re-run from where it stopped.
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+MIGRATION_FILE = re.compile(r'^(\d{4})_(\w+)\.py$')
+# Serialises deployments that reach the database at the same time
+LOCK_NAME = 'feedback_schema_migrations'
+LOCK_TIMEOUT_SECONDS = 300
+
+
+class Schema:
+    """What a migration gets: the connection, the dialect and DDL helpers that suit it"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.dialect = 'sqlite' if isinstance(connection, sqlite3.Connection) else 'mysql'
+        self.placeholder = '?' if self.dialect == 'sqlite' else '%s'
+
+    def execute(self, statement, params=()):
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(statement, params)
+            return cursor.fetchall() if cursor.description else []
+        finally:
+            cursor.close()
+
+    def index_exists(self, table, name):
+        if self.dialect == 'sqlite':
+            rows = self.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND name = ?",
+                                (table, name))
+        else:
+            rows = self.execute(
+                "SELECT 1 FROM information_schema.statistics "
+                "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s LIMIT 1",
+                (table, name)
+            )
+        return bool(rows)
+
+    def create_index(self, table, name, columns):
+        """Add an index without blocking writes; a no-op when it already exists.
+
+        On MySQL/MariaDB the statement demands in-place, lock-free DDL, so it fails
+        outright instead of silently falling back to a table copy that blocks inserts.
+        """
+        if self.index_exists(table, name):
+            return
+        statement = f"CREATE INDEX {name} ON {table} ({', '.join(columns)})"
+        if self.dialect == 'mysql':
+            statement += " ALGORITHM=INPLACE LOCK=NONE"
+        self.execute(statement)
+
+    def drop_index(self, table, name):
+        if not self.index_exists(table, name):
+            return
+        if self.dialect == 'sqlite':
+            self.execute(f"DROP INDEX {name}")
+        else:
+            self.execute(f"DROP INDEX {name} ON {table} ALGORITHM=INPLACE LOCK=NONE")
+
+    def table_exists(self, table):
+        if self.dialect == 'sqlite':
+            rows = self.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+        else:
+            rows = self.execute(
+                "SELECT 1 FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s",
+                (table,)
+            )
+        return bool(rows)
+
+
+def discover(directory=MIGRATIONS_DIR):
+    """[(version, name, path)] of the migration files, in version order"""
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    versions = [version for version, _, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Duplicate migration versions in {directory}")
+    return migrations
+
+
+def _load(path):
+    spec = importlib.util.spec_from_file_location(f"migration_{os.path.basename(path)[:-3]}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _checksum(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _ensure_table(schema):
+    schema.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT NOT NULL PRIMARY KEY,
+            name VARCHAR(200) NOT NULL,
+            checksum CHAR(64) NOT NULL,
+            applied_at VARCHAR(32) NOT NULL
+        )
+    """)
+    schema.connection.commit()
+
+
+def applied(schema):
+    """{version: (name, checksum)} of the migrations recorded as applied"""
+    _ensure_table(schema)
+    rows = schema.execute("SELECT version, name, checksum FROM schema_migrations")
+    return {version: (name, checksum) for version, name, checksum in rows}
+
+
+def _lock(schema):
+    if schema.dialect == 'mysql':
+        if schema.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, LOCK_TIMEOUT_SECONDS))[0][0] != 1:
+            raise RuntimeError(f"Another deployment holds the {LOCK_NAME} lock")
+
+
+def _unlock(schema):
+    if schema.dialect == 'mysql':
+        schema.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+
+
+def _run(schema, version, name, path, direction):
+    module = _load(path)
+    print(f"{'Applying' if direction == 'upgrade' else 'Rolling back'} {version:04d}_{name}...")
+    try:
+        getattr(module, direction)(schema)
+        if direction == 'upgrade':
+            schema.execute(
+                f"INSERT INTO schema_migrations (version, name, checksum, applied_at) "
+                f"VALUES ({schema.placeholder}, {schema.placeholder}, {schema.placeholder}, {schema.placeholder})",
+                (version, name, _checksum(path), datetime.now(timezone.utc).isoformat(timespec='seconds'))
+            )
+        else:
+            schema.execute(f"DELETE FROM schema_migrations WHERE version = {schema.placeholder}", (version,))
+        schema.connection.commit()
+    except Exception:
+        # Only undoes uncommitted DML; MySQL commits each DDL statement as it runs
+        schema.connection.rollback()
+        raise
+
+
+def upgrade(connection, target=None, directory=MIGRATIONS_DIR):
+    """Apply pending migrations up to target (default: all) and return their versions"""
+    schema = Schema(connection)
+    _lock(schema)
+    try:
+        done = applied(schema)
+        for version, name, path in discover(directory):
+            if version in done and done[version][1] != _checksum(path):
+                print(f"Warning: {version:04d}_{name} changed after it was applied")
+        pending = [
+            (version, name, path) for version, name, path in discover(directory)
+            if version not in done and (target is None or version <= target)
+        ]
+        for version, name, path in pending:
+            _run(schema, version, name, path, 'upgrade')
+        return [version for version, _, _ in pending]
+    finally:
+        _unlock(schema)
+
+
+def downgrade(connection, target, directory=MIGRATIONS_DIR):
+    """Roll back applied migrations newer than target, newest first, and return their versions"""
+    schema = Schema(connection)
+    _lock(schema)
+    try:
+        done = applied(schema)
+        rollback = [
+            (version, name, path) for version, name, path in reversed(discover(directory))
+            if version in done and version > target
+        ]
+        for version, name, path in rollback:
+            _run(schema, version, name, path, 'downgrade')
+        return [version for version, _, _ in rollback]
+    finally:
+        _unlock(schema)
+
+
+def status(connection, directory=MIGRATIONS_DIR):
+    """[(version, name, applied?)] for every migration file"""
+    done = applied(Schema(connection))
+    return [(version, name, version in done) for version, name, _ in discover(directory)]
+
+
+def connect(database=None, **options):
+    """SQLite when a file path is given, else the app's MySQL writer from the RDS_* variables.
+
+    options are extra mysql.connector.connect arguments and are ignored for SQLite.
+    """
+    if database:
+        return sqlite3.connect(database)
+    import mysql.connector
+    return mysql.connector.connect(
+        host=os.environ.get('RDS_HOSTNAME', 'localhost'),
+        user=os.environ.get('RDS_USERNAME', 'admin'),
+        password=os.environ.get('RDS_PASSWORD', 'password'),
+        database=os.environ.get('RDS_DB_NAME', 'feedback'),
+        port=int(os.environ.get('RDS_PORT', 3306)),
+        **options
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Feedback database schema migrations')
+    parser.add_argument('--sqlite', metavar='PATH', help='migrate a local SQLite file instead of RDS_HOSTNAME')
+    commands = parser.add_subparsers(dest='command', required=True)
+    up = commands.add_parser('upgrade', help='apply pending migrations')
+    up.add_argument('--to', type=int, help='stop after this version')
+    down = commands.add_parser('downgrade', help='roll back migrations newer than a version')
+    down.add_argument('to', type=int, help='version to go back to (0 for an empty schema)')
+    commands.add_parser('status', help='list migrations and whether they are applied')
+    args = parser.parse_args()
+
+    connection = connect(args.sqlite)
+    try:
+        if args.command == 'upgrade':
+            versions = upgrade(connection, args.to)
+            print(f"Applied {len(versions)} migration(s)" if versions else "Schema is up to date")
+        elif args.command == 'downgrade':
+            versions = downgrade(connection, args.to)
+            print(f"Rolled back {len(versions)} migration(s)")
+        else:
+            for version, name, is_applied in status(connection):
+                print(f"{version:04d}  {'applied' if is_applied else 'pending':8} {name}")
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,22 @@
+# The feedback table as create_table() used to make it. IF NOT EXISTS adopts databases
+# that already have it.
+
+
+def upgrade(schema):
+    if schema.dialect == 'sqlite':
+        id_column = 'id INTEGER PRIMARY KEY AUTOINCREMENT'
+    else:
+        id_column = 'id INT AUTO_INCREMENT PRIMARY KEY'
+    schema.execute(f"""
+        CREATE TABLE IF NOT EXISTS feedback (
+            {id_column},
+            name VARCHAR(100) NOT NULL,
+            email VARCHAR(100) NOT NULL,
+            message TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def downgrade(schema):
+    schema.execute("DROP TABLE IF EXISTS feedback")
@@ -0,0 +1,9 @@
+# Serves ORDER BY created_at on /all_feedbacks and the range scans of /export.
+
+
+def upgrade(schema):
+    schema.create_index('feedback', 'idx_feedback_created_at', ['created_at'])
+
+
+def downgrade(schema):
+    schema.drop_index('feedback', 'idx_feedback_created_at')
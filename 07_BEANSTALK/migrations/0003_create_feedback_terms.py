@@ -0,0 +1,17 @@
+# Inverted index for /search (see search.py). Tables that predate it are filled with
+# search.rebuild_index().
+
+
+def upgrade(schema):
+    schema.execute("""
+        CREATE TABLE IF NOT EXISTS feedback_terms (
+            term VARCHAR(64) NOT NULL,
+            feedback_id INT NOT NULL,
+            tf INT NOT NULL,
+            PRIMARY KEY (term, feedback_id)
+        )
+    """)
+
+
+def downgrade(schema):
+    schema.execute("DROP TABLE IF EXISTS feedback_terms")
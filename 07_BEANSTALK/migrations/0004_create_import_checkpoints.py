@@ -0,0 +1,21 @@
+# Progress of bulk imports (see importer.py). A batch and its checkpoint commit in the
+# same transaction, so a resumed import neither repeats nor skips rows.
+
+
+def upgrade(schema):
+    schema.execute("""
+        CREATE TABLE IF NOT EXISTS import_checkpoints (
+            source VARCHAR(255) NOT NULL PRIMARY KEY,
+            source_size BIGINT NOT NULL,
+            phase VARCHAR(16) NOT NULL,
+            rows_loaded BIGINT NOT NULL,
+            start_id BIGINT NOT NULL,
+            indexed_id BIGINT NOT NULL,
+            deferred_indexes VARCHAR(255) NOT NULL,
+            updated_at VARCHAR(32) NOT NULL
+        )
+    """)
+
+
+def downgrade(schema):
+    schema.execute("DROP TABLE IF EXISTS import_checkpoints")
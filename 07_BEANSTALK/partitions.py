@@ -0,0 +1,168 @@
+import argparse
+from datetime import datetime, timezone
+
+import migrate
+
+# Monthly RANGE partitions of feedback on created_at, so retention is a metadata-only
+# DROP PARTITION instead of a DELETE that scans and locks the rows it removes. Each
+# partition pYYYYMM holds one month; pmax catches rows past the last month and is split
+# by ensure_future() ahead of time. Bounds are UTC epoch seconds computed here, so they
+# do not depend on the session time zone of whoever ran the DDL.
+#
+# Partitioning is opt-in (`python partitions.py --enable`), not a migration: it copies
+# the whole table under a shared lock, so inserts wait until it finishes, and a deploy
+# must not do that unasked. MySQL requires the partitioning column in every unique key,
+# so the same single ALTER also makes the primary key (id, created_at); id stays
+# AUTO_INCREMENT and unique in practice. Until then, and on SQLite, which has no
+# partitioning, ensure_future() does nothing and drop_before() falls back to DELETE.
+
+MAX_PARTITION = 'pmax'
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def month_start(moment):
+    return datetime(moment.year, moment.month, 1, tzinfo=timezone.utc)
+
+
+def partition_name(month):
+    return f"p{month:%Y%m}"
+
+
+def definitions(first_month, last_month):
+    """PARTITION clauses for every month from first_month to last_month, then pmax"""
+    clauses = []
+    month = first_month
+    while month <= last_month:
+        bound = int(add_months(month, 1).timestamp())
+        clauses.append(f"PARTITION {partition_name(month)} VALUES LESS THAN ({bound})")
+        month = add_months(month, 1)
+    clauses.append(f"PARTITION {MAX_PARTITION} VALUES LESS THAN MAXVALUE")
+    return ', '.join(clauses)
+
+
+def list_partitions(schema):
+    """[(name, upper bound in epoch seconds or None for pmax)] in order"""
+    rows = schema.execute(
+        "SELECT partition_name, partition_description FROM information_schema.partitions "
+        "WHERE table_schema = DATABASE() AND table_name = 'feedback' AND partition_name IS NOT NULL "
+        "ORDER BY partition_ordinal_position"
+    )
+    return [(name, None if bound == 'MAXVALUE' else int(bound)) for name, bound in rows]
+
+
+def is_partitioned(schema):
+    return schema.dialect == 'mysql' and bool(list_partitions(schema))
+
+
+def enable(connection, months_ahead=3, now=None):
+    """Partition feedback by month, from its oldest row to months_ahead from now"""
+    schema = migrate.Schema(connection)
+    if schema.dialect != 'mysql':
+        raise RuntimeError('Partitioning needs MySQL/MariaDB')
+    if is_partitioned(schema):
+        return False
+    now = now or datetime.now(timezone.utc)
+    oldest = schema.execute("SELECT MIN(created_at) FROM feedback")[0][0]
+    first = month_start(oldest.replace(tzinfo=timezone.utc) if oldest else now)
+    last = add_months(month_start(now), months_ahead)
+    # One statement, so the table is copied (and inserts blocked) once, not per clause
+    schema.execute(f"""
+        ALTER TABLE feedback
+            MODIFY created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            DROP PRIMARY KEY,
+            ADD PRIMARY KEY (id, created_at)
+        PARTITION BY RANGE (UNIX_TIMESTAMP(created_at)) ({definitions(first, last)})
+    """)
+    return True
+
+
+def disable(connection):
+    """Undo enable(): one plain table with the primary key (id) again"""
+    schema = migrate.Schema(connection)
+    if not is_partitioned(schema):
+        return False
+    schema.execute("ALTER TABLE feedback DROP PRIMARY KEY, ADD PRIMARY KEY (id) REMOVE PARTITIONING")
+    return True
+
+
+def ensure_future(connection, months_ahead=3, now=None):
+    """Split pmax so there is a partition for every month up to months_ahead from now"""
+    schema = migrate.Schema(connection)
+    partitions = list_partitions(schema) if schema.dialect == 'mysql' else []
+    if not partitions:
+        return []
+    last_bound = max(bound for _, bound in partitions if bound is not None)
+    first_month = month_start(datetime.fromtimestamp(last_bound, timezone.utc))
+    last_month = add_months(month_start(now or datetime.now(timezone.utc)), months_ahead)
+    if first_month > last_month:
+        return []
+    # Cheap while pmax is empty, which ensure_future running ahead of time keeps it
+    schema.execute(f"ALTER TABLE feedback REORGANIZE PARTITION {MAX_PARTITION} INTO "
+                   f"({definitions(first_month, last_month)})")
+    added = []
+    month = first_month
+    while month <= last_month:
+        added.append(partition_name(month))
+        month = add_months(month, 1)
+    return added
+
+
+def drop_before(connection, cutoff):
+    """Remove feedback (and its search terms) created before the month of cutoff"""
+    schema = migrate.Schema(connection)
+    cutoff = month_start(cutoff)
+    if not is_partitioned(schema):
+        ph = schema.placeholder
+        bound = cutoff.strftime('%Y-%m-%d %H:%M:%S')
+        schema.execute(f"DELETE FROM feedback_terms WHERE feedback_id IN "
+                       f"(SELECT id FROM feedback WHERE created_at < {ph})", (bound,))
+        schema.execute(f"DELETE FROM feedback WHERE created_at < {ph}", (bound,))
+        connection.commit()
+        return []
+    expired = [name for name, bound in list_partitions(schema)
+               if bound is not None and bound <= int(cutoff.timestamp())]
+    for name in expired:
+        schema.execute(f"DELETE t FROM feedback_terms t JOIN feedback PARTITION ({name}) f ON f.id = t.feedback_id")
+        connection.commit()
+        schema.execute(f"ALTER TABLE feedback DROP PARTITION {name}")
+    return expired
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Add upcoming and drop expired feedback partitions')
+    parser.add_argument('--sqlite', metavar='PATH', help='use a local SQLite file instead of RDS_HOSTNAME')
+    parser.add_argument('--ahead', type=int, default=3, help='months of empty partitions to keep ready')
+    parser.add_argument('--keep-months', type=int, help='drop feedback older than this many months')
+    switch = parser.add_mutually_exclusive_group()
+    switch.add_argument('--enable', action='store_true',
+                        help='partition feedback now (copies the table; inserts wait until it finishes)')
+    switch.add_argument('--disable', action='store_true', help='turn feedback back into a plain table')
+    args = parser.parse_args()
+
+    connection = migrate.connect(args.sqlite)
+    try:
+        if args.enable:
+            print("Partitioned feedback" if enable(connection, args.ahead) else "feedback is already partitioned")
+        elif args.disable:
+            print("Removed feedback partitioning" if disable(connection) else "feedback is not partitioned")
+            return
+        elif not is_partitioned(migrate.Schema(connection)):
+            print("feedback is not partitioned (run with --enable to opt in); retention uses DELETE")
+        added = ensure_future(connection, args.ahead)
+        if added:
+            print(f"Added partitions {', '.join(added)}")
+        if args.keep_months:
+            cutoff = add_months(month_start(datetime.now(timezone.utc)), -args.keep_months)
+            dropped = drop_before(connection, cutoff)
+            print(f"Removed feedback from before {cutoff:%Y-%m}"
+                  + (f" (partitions {', '.join(dropped)})" if dropped else ''))
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
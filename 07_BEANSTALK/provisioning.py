@@ -0,0 +1,79 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Minimal dependency-graph runner for deploy steps. A step starts as soon as every step
+# it depends on has finished, and receives their results as keyword arguments, so the
+# graph only joins where an output is really consumed. boto3 clients are thread-safe,
+# so steps can share the deployer's clients.
+
+
+def run_dag(steps, max_workers=8):
+    """Run {name: (fn, [dependency names])} concurrently.
+
+    Returns (results, timings) where timings maps each step to its (start, end)
+    offsets in seconds from the start of the run.
+    """
+    for name, (_, deps) in steps.items():
+        for dep in deps:
+            if dep not in steps:
+                raise ValueError(f"Step {name} depends on unknown step {dep}")
+
+    results = {}
+    timings = {}
+    pending = dict(steps)
+    running = {}
+    started = time.perf_counter()
+
+    def call(name, fn, kwargs):
+        begin = time.perf_counter() - started
+        try:
+            return fn(**kwargs)
+        finally:
+            timings[name] = (begin, time.perf_counter() - started)
+
+    # Not a with block: its exit would wait for every running step (an RDS waiter can
+    # take 10+ minutes) before a failure elsewhere could be reported
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        while pending or running:
+            for name, (fn, deps) in list(pending.items()):
+                if all(dep in results for dep in deps):
+                    kwargs = {dep: results[dep] for dep in deps}
+                    running[pool.submit(call, name, fn, kwargs)] = name
+                    del pending[name]
+            if not running:
+                raise ValueError(f"Dependency cycle between steps: {sorted(pending)}")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                error = future.exception()
+                if error is not None:
+                    raise error
+                results[name] = future.result()
+    except BaseException:
+        # Fail now; steps already running cannot be interrupted and finish in the background
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+    return results, timings
+
+
+def critical_path(steps, timings):
+    """Chain of steps, in run order, that determined the total run time"""
+    name = max(timings, key=lambda step: timings[step][1])
+    path = [name]
+    while steps[name][1]:
+        name = max(steps[name][1], key=lambda dep: timings[dep][1])
+        path.append(name)
+    return list(reversed(path))
+
+
+def print_report(steps, timings):
+    print("\nStep timings:")
+    for name, (begin, end) in sorted(timings.items(), key=lambda item: item[1][0]):
+        print(f"  {name:20} {begin:8.1f}s -> {end:8.1f}s ({end - begin:.1f}s)")
+    path = critical_path(steps, timings)
+    total = max(end for _, end in timings.values())
+    serial = sum(end - begin for begin, end in timings.values())
+    print(f"Critical path: {' -> '.join(path)} ({total:.1f}s, {serial:.1f}s if run one after another)")
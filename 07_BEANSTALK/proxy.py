@@ -0,0 +1,241 @@
+import argparse
+import os
+import re
+
+# Nginx in front of gunicorn with a micro-cache. The listing page runs a full table scan
+# on every view, yet a second of staleness is invisible to readers: caching GET / and
+# GET /all_feedbacks for a few seconds turns a burst of identical page views into one
+# Flask request per interval, with proxy_cache_lock collapsing concurrent misses and
+# stale entries served while one request refreshes them. Requests carrying the Flask
+# session cookie (a pending flash message) or db.py's recent-write cookie, and anything
+# that is not GET/HEAD, bypass the cache. /static is served from disk, and the upstream keeps idle HTTP/1.1
+# connections to gunicorn open instead of reconnecting for every request.
+#
+# The same two pieces are used on Elastic Beanstalk (write_platform_files) and by the
+# local harness in bench_proxy.py (standalone_config):
+#   http_config()       cache zone, upstream pool and cache bypass rules, http{} level
+#   server_locations()  location blocks, server{} level
+
+CACHE_ZONE = 'feedback_cache'
+UPSTREAM = 'feedback_app'
+# Flask's session cookie and db.RECENT_WRITE_COOKIE
+BYPASS_COOKIES = ('session', 'recent_write')
+# Cached routes: exact path -> (lifetime, whether the query string is part of the key).
+# Flask ignores query arguments on /, so they are left out of its key and cannot be
+# used to force misses.
+CACHED_ROUTES = {
+    '/': ('10s', False),
+    '/all_feedbacks': ('1s', True),
+}
+STATIC_EXPIRES = '7d'
+EB_APP_ROOT = '/var/app/current'
+EB_CACHE_DIR = '/var/cache/nginx/feedback'
+# nginx's keepalive_timeout towards gunicorn; gunicorn's own keep-alive is longer, so
+# nginx is always the side that closes an idle connection
+UPSTREAM_KEEPALIVE_TIMEOUT = 60
+# Where Elastic Beanstalk picks up nginx configuration from the source bundle
+PLATFORM_HTTP_CONF = '.platform/nginx/conf.d/feedback_proxy.conf'
+PLATFORM_SERVER_CONF = '.platform/nginx/conf.d/elasticbeanstalk/00_application.conf'
+
+
+def static_mappings(flask_config):
+    """{url path: directory} from the staticfiles namespace of an .ebextensions config"""
+    mappings = {}
+    in_staticfiles = False
+    for line in flask_config.splitlines():
+        if not line.strip():
+            continue
+        indent = len(line) - len(line.lstrip())
+        if line.strip() == 'aws:elasticbeanstalk:environment:proxy:staticfiles:':
+            in_staticfiles, namespace_indent = True, indent
+            continue
+        if in_staticfiles:
+            if indent <= namespace_indent:
+                in_staticfiles = False
+                continue
+            match = re.match(r'\s*(/\S*):\s*(\S+)\s*$', line)
+            if match:
+                mappings[match.group(1)] = match.group(2)
+    return mappings
+
+
+def upstream_pool_size(profile):
+    # One idle connection per gunicorn thread is enough to never reconnect under load
+    return max(8, profile['workers'] * profile['threads'])
+
+
+def http_config(app_port=8000, pool_size=16, cache_dir=EB_CACHE_DIR):
+    """Cache zone, upstream pool and bypass rules for the http{} block"""
+    return f'''proxy_cache_path {cache_dir} levels=1:2 keys_zone={CACHE_ZONE}:10m max_size=256m
+                 inactive=10m use_temp_path=off;
+
+upstream {UPSTREAM} {{
+    server 127.0.0.1:{app_port};
+    keepalive {pool_size};
+    keepalive_requests 10000;
+    keepalive_timeout {UPSTREAM_KEEPALIVE_TIMEOUT}s;
+}}
+
+# A flash message or a just-submitted feedback makes the page specific to this client
+map $http_cookie $feedback_skip_cache {{
+    default 0;
+    "~(^|;)\\s*({'|'.join(BYPASS_COOKIES)})=" 1;
+}}
+'''
+
+
+def _proxy_directives(indent):
+    lines = [
+        f'proxy_pass http://{UPSTREAM};',
+        # HTTP/1.1 without "Connection: close" keeps the upstream connection reusable
+        'proxy_http_version 1.1;',
+        'proxy_set_header Connection "";',
+        'proxy_set_header Host $host;',
+        'proxy_set_header X-Real-IP $remote_addr;',
+        'proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;',
+        'proxy_set_header X-Forwarded-Proto $scheme;',
+    ]
+    return ''.join(f"{indent}{line}\n" for line in lines)
+
+
+def _cached_location(path, lifetime, key_args):
+    key = '$scheme$request_method$host$request_uri' if key_args else '$scheme$request_method$host$uri'
+    return f'''location = {path} {{
+{_proxy_directives('    ')}    proxy_cache {CACHE_ZONE};
+    proxy_cache_key "{key}";
+    proxy_cache_valid 200 {lifetime};
+    proxy_cache_bypass $feedback_skip_cache;
+    proxy_no_cache $feedback_skip_cache;
+    # Flask sends "Vary: Cookie" once a template touches the session; honouring it would
+    # keep a separate copy per load balancer stickiness cookie. The cookies that do change
+    # the page already bypass the cache.
+    proxy_ignore_headers Vary;
+    proxy_cache_lock on;
+    proxy_cache_lock_timeout 5s;
+    proxy_cache_use_stale updating error timeout http_500 http_502 http_503 http_504;
+    proxy_cache_background_update on;
+    add_header X-Cache-Status $upstream_cache_status always;
+}}
+'''
+
+
+def server_locations(static=None, app_root=EB_APP_ROOT, routes=CACHED_ROUTES):
+    """Location blocks for the server{} block: static files, cached pages, everything else"""
+    blocks = []
+    for url, directory in (static or {}).items():
+        root = directory if os.path.isabs(directory) else os.path.join(app_root, directory)
+        # ^~ with a trailing slash is a distinct, longer prefix than the "location /static"
+        # Elastic Beanstalk generates from the same mapping, so both can coexist and this
+        # one wins
+        blocks.append(f'''location ^~ {url.rstrip('/')}/ {{
+    alias {root.rstrip('/')}/;
+    expires {STATIC_EXPIRES};
+    access_log off;
+}}
+''')
+    for path, (lifetime, key_args) in routes.items():
+        blocks.append(_cached_location(path, lifetime, key_args))
+    blocks.append(f'''location / {{
+{_proxy_directives('    ')}}}
+''')
+    return '\n'.join(blocks)
+
+
+def standalone_config(listen_port, app_port, static=None, app_root='.', cache_dir='cache', pool_size=16):
+    """A complete nginx.conf for running the proxy locally with nginx -p <prefix> -c <file>"""
+    return f'''worker_processes auto;
+pid nginx.pid;
+error_log error.log warn;
+
+events {{
+    worker_connections 4096;
+}}
+
+http {{
+    {_mime_types()}
+    default_type application/octet-stream;
+    access_log off;
+    sendfile on;
+    keepalive_timeout 65;
+    client_body_temp_path tmp/client;
+    proxy_temp_path tmp/proxy;
+    fastcgi_temp_path tmp/fastcgi;
+    uwsgi_temp_path tmp/uwsgi;
+    scgi_temp_path tmp/scgi;
+
+{_indent(http_config(app_port, pool_size, cache_dir), 4)}
+    server {{
+        listen 127.0.0.1:{listen_port};
+
+{_indent(server_locations(static, app_root), 8)}    }}
+}}
+'''
+
+
+def _indent(text, spaces):
+    return ''.join(f"{' ' * spaces}{line}\n" if line else '\n' for line in text.splitlines())
+
+
+def _mime_types():
+    for path in ('/etc/nginx/mime.types', '/usr/local/etc/nginx/mime.types', '/opt/homebrew/etc/nginx/mime.types'):
+        if os.path.exists(path):
+            return f"include {path};"
+    return 'types { text/html html; text/css css; application/javascript js; image/png png; }'
+
+
+def write_platform_files(app_dir, flask_config_path=None, profile=None):
+    """Write the Elastic Beanstalk .platform nginx overrides into app_dir and return their paths"""
+    flask_config_path = flask_config_path or os.path.join(app_dir, '.ebextensions', '01_flask.config')
+    static = {}
+    if os.path.exists(flask_config_path):
+        with open(flask_config_path) as f:
+            static = static_mappings(f.read())
+    pool_size = upstream_pool_size(profile) if profile else 16
+
+    files = {
+        PLATFORM_HTTP_CONF: http_config(pool_size=pool_size),
+        PLATFORM_SERVER_CONF: server_locations(static),
+    }
+    written = []
+    for relative, content in files.items():
+        path = os.path.join(app_dir, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(content)
+        written.append(path)
+    return written
+
+
+def remove_platform_files(app_dir):
+    """Go back to the platform's default nginx configuration"""
+    for relative in (PLATFORM_HTTP_CONF, PLATFORM_SERVER_CONF):
+        path = os.path.join(app_dir, relative)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Nginx micro-cache in front of the feedback app')
+    commands = parser.add_subparsers(dest='command', required=True)
+    platform = commands.add_parser('platform', help='write .platform/nginx overrides for Elastic Beanstalk')
+    platform.add_argument('app_dir', nargs='?', default='.')
+    platform.add_argument('--remove', action='store_true', help='delete the overrides instead')
+    standalone = commands.add_parser('standalone', help='print a complete nginx.conf for local use')
+    standalone.add_argument('--listen', type=int, default=8080)
+    standalone.add_argument('--app-port', type=int, default=8000)
+    standalone.add_argument('--static', default='static', help='directory served at /static')
+    args = parser.parse_args()
+
+    if args.command == 'platform':
+        if args.remove:
+            remove_platform_files(args.app_dir)
+            print(f"Removed nginx overrides from {args.app_dir}")
+        else:
+            for path in write_platform_files(args.app_dir):
+                print(f"Wrote {path}")
+    else:
+        print(standalone_config(args.listen, args.app_port, {'/static': os.path.abspath(args.static)}), end='')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Cheap, in-process guards for /submit_feedback: token buckets per client IP and email,
+# and a short-lived fingerprint store that drops identical resubmissions. Both stores
+# are bounded LRUs so a flood of distinct keys cannot grow memory without limit.
+# Set REDIS_URL to share the duplicate check between gunicorn workers and instances; if
+# Redis is unreachable the check falls back to this process's store.
+#
+# The token buckets always live in the worker process, so every configured rate and
+# burst is the limit per client across all gunicorn workers and is split between them.
+
+IP_RATE_PER_MINUTE = float(os.environ.get('SUBMIT_IP_RATE_PER_MINUTE', 10))
+IP_BURST = int(os.environ.get('SUBMIT_IP_BURST', 5))
+EMAIL_RATE_PER_MINUTE = float(os.environ.get('SUBMIT_EMAIL_RATE_PER_MINUTE', 5))
+EMAIL_BURST = int(os.environ.get('SUBMIT_EMAIL_BURST', 3))
+DEDUP_WINDOW_SECONDS = int(os.environ.get('SUBMIT_DEDUP_WINDOW_SECONDS', 60))
+MAX_TRACKED_KEYS = int(os.environ.get('SUBMIT_MAX_TRACKED_KEYS', 10000))
+# Proxies that append to X-Forwarded-For in front of gunicorn: the load balancer and nginx
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', 2))
+# Same default as gunicorn.conf.py; Elastic Beanstalk sets it from the serving profile
+WORKERS = max(1, int(os.environ.get('GUNICORN_WORKERS', 3)))
+
+
+class TokenBucketLimiter:
+    def __init__(self, rate_per_minute, burst, max_keys=MAX_TRACKED_KEYS, clock=time.monotonic):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()  # key -> (tokens, last refill time)
+
+    def acquire(self, key):
+        """Take a token for key; returns 0 when allowed, otherwise seconds until the next token"""
+        now = self.clock()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class MemoryDedupStore:
+    def __init__(self, window_seconds, max_keys=MAX_TRACKED_KEYS, clock=time.monotonic):
+        self.window = window_seconds
+        self.max_keys = max_keys
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._seen = OrderedDict()  # fingerprint -> expiry, oldest first
+
+    def add(self, fingerprint):
+        """Record fingerprint; returns False if it was already seen inside the window"""
+        now = self.clock()
+        with self._lock:
+            while self._seen and next(iter(self._seen.values())) <= now:
+                self._seen.popitem(last=False)
+            if fingerprint in self._seen:
+                return False
+            self._seen[fingerprint] = now + self.window
+            if len(self._seen) > self.max_keys:
+                self._seen.popitem(last=False)
+        return True
+
+    def discard(self, fingerprint):
+        with self._lock:
+            self._seen.pop(fingerprint, None)
+
+
+class RedisDedupStore:
+    def __init__(self, url, window_seconds):
+        import redis  # optional, only needed when REDIS_URL is set
+        self.client = redis.Redis.from_url(url, socket_timeout=0.2)
+        self.errors = redis.RedisError
+        self.window = window_seconds
+        # A Redis outage should weaken the duplicate check, not fail submissions
+        self.fallback = MemoryDedupStore(window_seconds)
+
+    def add(self, fingerprint):
+        try:
+            return bool(self.client.set(f"feedback:dedup:{fingerprint}", 1, nx=True, ex=self.window))
+        except self.errors as e:
+            print(f"Redis unavailable, using the local duplicate check: {e}")
+            return self.fallback.add(fingerprint)
+
+    def discard(self, fingerprint):
+        self.fallback.discard(fingerprint)
+        try:
+            self.client.delete(f"feedback:dedup:{fingerprint}")
+        except self.errors as e:
+            print(f"Redis unavailable, could not forget a submission: {e}")
+
+
+def submission_fingerprint(name, email, message):
+    normalized = '\x1f'.join((name.strip().lower(), email.strip().lower(), ' '.join(message.split())))
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def create_dedup_store():
+    url = os.environ.get('REDIS_URL')
+    if url:
+        return RedisDedupStore(url, DEDUP_WINDOW_SECONDS)
+    return MemoryDedupStore(DEDUP_WINDOW_SECONDS)
+
+
+def per_worker_limiter(rate_per_minute, burst, workers=WORKERS):
+    """This worker's share of a limit meant for all workers together"""
+    return TokenBucketLimiter(rate_per_minute / workers, max(1, round(burst / workers)))
+
+
+ip_limiter = per_worker_limiter(IP_RATE_PER_MINUTE, IP_BURST)
+email_limiter = per_worker_limiter(EMAIL_RATE_PER_MINUTE, EMAIL_BURST)
+dedup_store = create_dedup_store()
+
+
+def client_ip(request):
+    # Entries left of the ones our own proxies appended are client-supplied and can be forged
+    hops = [hop.strip() for hop in request.headers.get('X-Forwarded-For', '').split(',') if hop.strip()]
+    if hops:
+        return hops[max(0, len(hops) - TRUSTED_PROXY_HOPS)]
+    return request.remote_addr
+
+
+def check_submission(request, name, email, message):
+    """Return (status, retry_after) where status is 'ok', 'limited' or 'duplicate'"""
+    # Only charge the email bucket once the IP is allowed, so one client cannot drain another's quota
+    wait = ip_limiter.acquire(client_ip(request)) or email_limiter.acquire(email.strip().lower())
+    if wait:
+        return 'limited', wait
+    if not dedup_store.add(submission_fingerprint(name, email, message)):
+        return 'duplicate', 0
+    return 'ok', 0
+
+
+def forget_submission(name, email, message):
+    """Let a submission through again, e.g. after its INSERT failed"""
+    dedup_store.discard(submission_fingerprint(name, email, message))
@@ -0,0 +1,177 @@
+import math
+import os
+import re
+import sqlite3
+import time
+from collections import Counter
+
+# Inverted index over feedback name/message, kept in a plain table so the same
+# SQL (and therefore the same ranking) works on MySQL in production and SQLite locally.
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+MAX_TERM_LENGTH = 64
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'for', 'if', 'in', 'into',
+    'is', 'it', 'no', 'not', 'of', 'on', 'or', 'so', 'that', 'the', 'their', 'then',
+    'there', 'these', 'they', 'this', 'to', 'was', 'will', 'with', 'i', 'you', 'we',
+}
+# idf weights are scaled to integers so scores are summed exactly on every backend
+IDF_SCALE = 1000
+# COUNT(*) on InnoDB scans an index, so the document count behind idf is cached per
+# process; a count a minute old changes the weights by a rounding error
+DOCUMENT_COUNT_TTL = float(os.environ.get('SEARCH_DOCUMENT_COUNT_TTL', 60))
+_document_count = (0.0, None)
+
+
+def tokenize(text):
+    return [
+        token[:MAX_TERM_LENGTH]
+        for token in TOKEN_PATTERN.findall(text.lower())
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+
+def _placeholder(cursor):
+    return '?' if isinstance(cursor, sqlite3.Cursor) else '%s'
+
+
+def create_search_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS feedback_terms (
+            term VARCHAR(64) NOT NULL,
+            feedback_id INT NOT NULL,
+            tf INT NOT NULL,
+            PRIMARY KEY (term, feedback_id)
+        )
+    """)
+
+
+def index_feedback(cursor, feedback_id, name, message, ignore_existing=False):
+    """Add one feedback row to the index; call inside the INSERT's transaction"""
+    counts = Counter(tokenize(name) + tokenize(message))
+    if not counts:
+        return
+    ph = _placeholder(cursor)
+    if ignore_existing:
+        verb = 'INSERT OR IGNORE' if ph == '?' else 'INSERT IGNORE'
+    else:
+        verb = 'INSERT'
+    cursor.executemany(
+        f"{verb} INTO feedback_terms (term, feedback_id, tf) VALUES ({ph}, {ph}, {ph})",
+        [(term, feedback_id, tf) for term, tf in counts.items()]
+    )
+
+
+def index_after(connection, after_id=0, batch_size=1000, ignore_existing=False, on_batch=None):
+    """Index feedback rows with id > after_id, committing per batch; returns the last id indexed.
+
+    ignore_existing skips terms already present, for ranges the app may have indexed
+    itself. on_batch(last_id) runs just before each commit, in the batch's transaction.
+    """
+    cursor = connection.cursor()
+    ph = _placeholder(cursor)
+    last_id = after_id
+    try:
+        while True:
+            # Keyset pagination so each batch is fully read before the inserts run
+            cursor.execute(
+                f"SELECT id, name, message FROM feedback WHERE id > {ph} ORDER BY id LIMIT {ph}",
+                (last_id, batch_size)
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            for feedback_id, name, message in rows:
+                index_feedback(cursor, feedback_id, name, message, ignore_existing)
+            last_id = rows[-1][0]
+            if on_batch:
+                on_batch(last_id)
+            connection.commit()
+    finally:
+        cursor.close()
+    return last_id
+
+
+def rebuild_index(connection, batch_size=1000):
+    """Index every feedback row, for tables that predate the search index"""
+    cursor = connection.cursor()
+    cursor.execute("DELETE FROM feedback_terms")
+    cursor.close()
+    index_after(connection, 0, batch_size)
+
+
+def document_count(cursor, ttl=DOCUMENT_COUNT_TTL):
+    """Number of feedback rows, re-counted at most once per ttl seconds"""
+    global _document_count
+    expires, count = _document_count
+    now = time.monotonic()
+    if count is None or now >= expires:
+        cursor.execute("SELECT COUNT(*) FROM feedback")
+        count = cursor.fetchone()[0]
+        _document_count = (now + ttl, count)
+    return count
+
+
+def _term_weights(cursor, terms):
+    """Integer idf weight per query term that occurs in the index"""
+    ph = _placeholder(cursor)
+    total = document_count(cursor)
+    cursor.execute(
+        f"SELECT term, COUNT(*) FROM feedback_terms WHERE term IN ({', '.join([ph] * len(terms))}) "
+        "GROUP BY term",
+        tuple(terms)
+    )
+    return {
+        term: max(1, round(math.log(1 + total / df) * IDF_SCALE))
+        for term, df in cursor.fetchall()
+    }
+
+
+def search_feedbacks(connection, query, page=1, per_page=20):
+    """Return (total_matches, rows) for one page of tf-idf ranked results, best first"""
+    terms = sorted(set(tokenize(query)))
+    if not terms:
+        return 0, []
+    cursor = connection.cursor()
+    ph = _placeholder(cursor)
+    try:
+        weights = _term_weights(cursor, terms)
+        if not weights:
+            return 0, []
+        matched = sorted(weights)
+        in_clause = ', '.join([ph] * len(matched))
+
+        cursor.execute(
+            f"SELECT COUNT(DISTINCT feedback_id) FROM feedback_terms WHERE term IN ({in_clause})",
+            tuple(matched)
+        )
+        total = cursor.fetchone()[0]
+
+        # Ties go to the newest feedback so paging is stable across backends
+        weight_case = ' '.join(f"WHEN {ph} THEN {ph}" for _ in matched)
+        cursor.execute(
+            f"SELECT feedback_id, SUM(tf * CASE term {weight_case} END) AS score "
+            f"FROM feedback_terms WHERE term IN ({in_clause}) "
+            f"GROUP BY feedback_id ORDER BY score DESC, feedback_id DESC LIMIT {ph} OFFSET {ph}",
+            tuple(value for term in matched for value in (term, weights[term]))
+            + tuple(matched) + (per_page, (page - 1) * per_page)
+        )
+        ranked = cursor.fetchall()
+        if not ranked:
+            return total, []
+
+        ids = [feedback_id for feedback_id, _ in ranked]
+        cursor.execute(
+            f"SELECT id, name, email, message, created_at FROM feedback "
+            f"WHERE id IN ({', '.join([ph] * len(ids))})",
+            tuple(ids)
+        )
+        by_id = {row[0]: row for row in cursor.fetchall()}
+        rows = [
+            dict(zip(('id', 'name', 'email', 'message', 'created_at'), by_id[feedback_id]), score=score)
+            for feedback_id, score in ranked
+            if feedback_id in by_id
+        ]
+        return total, rows
+    finally:
+        cursor.close()
@@ -0,0 +1,166 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import boto3
+from botocore.config import Config
+
+# One place where the lab scripts get their boto3 clients. Sessions and clients are
+# created once per (service, region, ...) and shared, so every call reuses the same
+# connection pool and, in adaptive retry mode, the same client-side rate limiter that
+# slows down after throttling errors. Creating a client loads its service model, which
+# is slow and needs a region, so scripts take lazy_client() proxies at import time and
+# the real client is only built on first use.
+#
+# AsyncClient runs calls on a shared thread pool sized like the connection pool, so a
+# coroutine can have many describe/launch calls in flight with asyncio.gather.
+#
+# Offline tests hand a stubbed client to use() before the script touches AWS.
+
+MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_LAB_MAX_POOL_CONNECTIONS', 50))
+CONNECT_TIMEOUT = float(os.environ.get('AWS_LAB_CONNECT_TIMEOUT', 5))
+READ_TIMEOUT = float(os.environ.get('AWS_LAB_READ_TIMEOUT', 60))
+MAX_ATTEMPTS = int(os.environ.get('AWS_LAB_MAX_ATTEMPTS', 8))
+
+DEFAULT_CONFIG = Config(
+    max_pool_connections=MAX_POOL_CONNECTIONS,
+    connect_timeout=CONNECT_TIMEOUT,
+    read_timeout=READ_TIMEOUT,
+    retries={'mode': 'adaptive', 'max_attempts': MAX_ATTEMPTS},
+    tcp_keepalive=True,
+)
+
+# Session and client construction is not thread-safe; the clients themselves are
+_lock = threading.Lock()
+_sessions = {}
+_clients = {}
+_executor = None
+
+
+def _key(service, region_name, profile_name, config, kwargs):
+    options = sorted((config._user_provided_options if config else {}).items())
+    return (service, region_name, profile_name, repr(options), repr(sorted(kwargs.items())))
+
+
+def session(region_name=None, profile_name=None):
+    """The shared boto3 session for a region and credentials profile"""
+    with _lock:
+        key = (region_name, profile_name)
+        if key not in _sessions:
+            _sessions[key] = boto3.session.Session(region_name=region_name, profile_name=profile_name)
+        return _sessions[key]
+
+
+def client(service, region_name=None, profile_name=None, config=None, **kwargs):
+    """A shared client for service; config is merged over DEFAULT_CONFIG.
+
+    kwargs (endpoint_url, credentials) go to Session.client and are part of the cache key.
+    """
+    key = _key(service, region_name, profile_name, config, kwargs)
+    with _lock:
+        if key in _clients:
+            return _clients[key]
+    shared_session = session(region_name, profile_name)
+    merged = DEFAULT_CONFIG.merge(config) if config else DEFAULT_CONFIG
+    with _lock:
+        if key not in _clients:
+            _clients[key] = shared_session.client(service, config=merged, **kwargs)
+        return _clients[key]
+
+
+def use(service, instance, region_name=None, profile_name=None, config=None, **kwargs):
+    """Make client() return instance for these arguments, e.g. a client wrapped in a Stubber"""
+    with _lock:
+        _clients[_key(service, region_name, profile_name, config, kwargs)] = instance
+    return instance
+
+
+def reset():
+    """Forget every cached session and client"""
+    with _lock:
+        _sessions.clear()
+        _clients.clear()
+
+
+class LazyClient:
+    """Stands in for client(service, ...) and creates it on first attribute access"""
+
+    def __init__(self, service, region_name=None, **kwargs):
+        self._arguments = (service, region_name, kwargs)
+
+    def __getattr__(self, name):
+        service, region_name, kwargs = self._arguments
+        return getattr(client(service, region_name, **kwargs), name)
+
+    def __repr__(self):
+        return f"LazyClient({self._arguments[0]!r}, region_name={self._arguments[1]!r})"
+
+
+def lazy_client(service, region_name=None, **kwargs):
+    return LazyClient(service, region_name, **kwargs)
+
+
+def executor():
+    """Thread pool for AsyncClient calls, one thread per pooled connection"""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_POOL_CONNECTIONS, thread_name_prefix='aws')
+        return _executor
+
+
+class AsyncClient:
+    """Awaitable versions of a client's API calls.
+
+        ec2 = AsyncClient(clients.client('ec2'))
+        reservations = await asyncio.gather(*(ec2.describe_instances(InstanceIds=[i]) for i in ids))
+    """
+
+    # Helpers that only build objects locally stay synchronous
+    LOCAL = ('get_paginator', 'get_waiter', 'can_paginate', 'meta', 'exceptions')
+
+    def __init__(self, sync_client, pool=None):
+        self.client = sync_client
+        self._pool = pool
+
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool or executor(), partial(fn, *args, **kwargs))
+
+    def __getattr__(self, name):
+        attribute = getattr(self.client, name)
+        if name in self.LOCAL or not callable(attribute):
+            return attribute
+
+        async def call(*args, **kwargs):
+            return await self._run(attribute, *args, **kwargs)
+
+        call.__name__ = name
+        return call
+
+    async def paginate(self, operation, **kwargs):
+        """Every page of a paginated operation, as a list"""
+        paginator = self.client.get_paginator(operation)
+        return await self._run(lambda: list(paginator.paginate(**kwargs)))
+
+    async def wait(self, waiter_name, **kwargs):
+        """Run a botocore waiter without blocking the event loop"""
+        waiter = self.client.get_waiter(waiter_name)
+        return await self._run(waiter.wait, **kwargs)
+
+
+def async_client(service, region_name=None, **kwargs):
+    return AsyncClient(client(service, region_name, **kwargs))
+
+
+async def gather(awaitables, limit=MAX_POOL_CONNECTIONS):
+    """Await all of awaitables with at most limit in flight; results keep their order"""
+    semaphore = asyncio.Semaphore(limit)
+
+    async def bounded(awaitable):
+        async with semaphore:
+            return await awaitable
+
+    return await asyncio.gather(*(bounded(awaitable) for awaitable in awaitables))
@@ -0,0 +1,206 @@
+import argparse
+import json
+import os
+import sys
+
+from botocore import xform_name
+from botocore.exceptions import ClientError
+from botocore.session import get_session
+from botocore.validate import ParamValidator
+
+# Performance profiles for the feedback database. db_profiles.json declares, per
+# profile, the instance class, gp3 storage, Performance Insights and the MySQL
+# parameters that matter for the workload (buffer pool, max_connections, slow-query
+# log). Every script that creates the database turns a profile into boto3 requests with
+# the functions below, so 06_RDS and the Beanstalk deployer get identical settings.
+#
+# validate() checks the generated requests against the RDS API model shipped with
+# botocore and against RDS's storage and Performance Insights limits, without calling
+# AWS:  python -m aws_common.db_profiles validate
+
+DEFAULT_PATH = os.environ.get('DB_PROFILES', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'db_profiles.json'))
+DEFAULT_PROFILE = os.environ.get('DB_PROFILE', 'dev')
+# ModifyDBParameterGroup accepts at most 20 parameters per call
+PARAMETERS_PER_CALL = 20
+# gp3 on RDS for MySQL: below this size IOPS and throughput are fixed at 3000 and 125 MiB/s
+GP3_PROVISIONED_MIN_GB = 400
+GP3_IOPS_RANGE = (12000, 64000)
+GP3_THROUGHPUT_RANGE = (500, 4000)
+GP3_MAX_THROUGHPUT_PER_IOPS = 0.25
+# Burstable classes on which RDS for MySQL has no Performance Insights
+NO_PERFORMANCE_INSIGHTS = ('.micro', '.small')
+PERFORMANCE_INSIGHTS_RETENTION = [7] + [31 * months for months in range(1, 24)] + [731]
+
+
+def load_profiles(path=DEFAULT_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+
+def get_profile(name=DEFAULT_PROFILE, path=DEFAULT_PATH):
+    profiles = load_profiles(path)
+    if name not in profiles:
+        raise ValueError(f"Unknown DB profile {name}; choose one of {', '.join(sorted(profiles))}")
+    return profiles[name]
+
+
+def parameter_group_name(profile_name, profile):
+    return f"feedback-{profile_name}-{profile['family'].replace('.', '-')}"
+
+
+def parameter_group_requests(profile_name, profile):
+    """[(client method, kwargs)] that create the profile's parameter group and set its parameters"""
+    group = parameter_group_name(profile_name, profile)
+    requests = [('create_db_parameter_group', {
+        'DBParameterGroupName': group,
+        'DBParameterGroupFamily': profile['family'],
+        'Description': f"Feedback database, {profile_name} profile",
+    })]
+    # pending-reboot is accepted for static and dynamic parameters alike; a new instance
+    # starts with them either way
+    parameters = [
+        {'ParameterName': name, 'ParameterValue': str(value), 'ApplyMethod': 'pending-reboot'}
+        for name, value in sorted(profile['parameters'].items())
+    ]
+    for offset in range(0, len(parameters), PARAMETERS_PER_CALL):
+        requests.append(('modify_db_parameter_group', {
+            'DBParameterGroupName': group,
+            'Parameters': parameters[offset:offset + PARAMETERS_PER_CALL],
+        }))
+    return requests
+
+
+def instance_settings(profile_name, profile):
+    """create_db_instance keyword arguments that come from the profile"""
+    storage = profile['storage']
+    settings = {
+        'Engine': profile['engine'],
+        'EngineVersion': profile['engine_version'],
+        'DBInstanceClass': profile['instance_class'],
+        'DBParameterGroupName': parameter_group_name(profile_name, profile),
+        'AllocatedStorage': storage['allocated_gb'],
+        'StorageType': storage['type'],
+    }
+    if 'iops' in storage:
+        settings['Iops'] = storage['iops']
+    if 'throughput_mbps' in storage:
+        settings['StorageThroughput'] = storage['throughput_mbps']
+    insights = profile.get('performance_insights', {})
+    settings['EnablePerformanceInsights'] = insights.get('enabled', False)
+    if settings['EnablePerformanceInsights']:
+        settings['PerformanceInsightsRetentionPeriod'] = insights.get('retention_days', 7)
+    return settings
+
+
+def _check_limits(profile_name, profile):
+    errors = []
+    family = f"{profile['engine']}{'.'.join(profile['engine_version'].split('.')[:2])}"
+    if family != profile['family']:
+        errors.append(f"family {profile['family']} does not match {profile['engine']} {profile['engine_version']}")
+
+    storage = profile['storage']
+    size = storage['allocated_gb']
+    if storage['type'] == 'gp3':
+        if not 20 <= size <= 65536:
+            errors.append(f"gp3 storage must be 20-65536 GB, not {size}")
+        provisioned = 'iops' in storage or 'throughput_mbps' in storage
+        if provisioned and size < GP3_PROVISIONED_MIN_GB:
+            errors.append(f"gp3 IOPS and throughput can only be set from {GP3_PROVISIONED_MIN_GB} GB, not {size}")
+        if provisioned and size >= GP3_PROVISIONED_MIN_GB:
+            iops = storage.get('iops', GP3_IOPS_RANGE[0])
+            throughput = storage.get('throughput_mbps', GP3_THROUGHPUT_RANGE[0])
+            if not GP3_IOPS_RANGE[0] <= iops <= GP3_IOPS_RANGE[1]:
+                errors.append(f"gp3 IOPS must be {GP3_IOPS_RANGE[0]}-{GP3_IOPS_RANGE[1]}, not {iops}")
+            if not GP3_THROUGHPUT_RANGE[0] <= throughput <= GP3_THROUGHPUT_RANGE[1]:
+                errors.append(f"gp3 throughput must be {GP3_THROUGHPUT_RANGE[0]}-{GP3_THROUGHPUT_RANGE[1]} MiB/s, "
+                              f"not {throughput}")
+            if throughput / iops > GP3_MAX_THROUGHPUT_PER_IOPS:
+                errors.append(f"gp3 throughput {throughput} MiB/s is more than "
+                              f"{GP3_MAX_THROUGHPUT_PER_IOPS} MiB/s per IOPS of {iops}")
+    elif 'throughput_mbps' in storage:
+        errors.append(f"storage throughput can only be set on gp3, not {storage['type']}")
+
+    insights = profile.get('performance_insights', {})
+    if insights.get('enabled'):
+        if profile['instance_class'].endswith(NO_PERFORMANCE_INSIGHTS):
+            errors.append(f"Performance Insights is not available on {profile['instance_class']}")
+        if insights.get('retention_days', 7) not in PERFORMANCE_INSIGHTS_RETENTION:
+            errors.append(f"Performance Insights retention must be 7, a multiple of 31 or 731 days, "
+                          f"not {insights['retention_days']}")
+
+    for name, value in profile['parameters'].items():
+        if str(value) == '':
+            errors.append(f"parameter {name} has an empty value")
+    return errors
+
+
+def validate(profile_name, profile, service_model=None):
+    """Problems with the requests the profile generates, as a list of messages (empty when valid)"""
+    service_model = service_model or get_session().get_service_model('rds')
+    operations = {xform_name(name): name for name in service_model.operation_names}
+    validator = ParamValidator()
+    # Settings that come from the caller rather than the profile
+    instance_request = dict(instance_settings(profile_name, profile), DBInstanceIdentifier='validate',
+                            MasterUsername='admin', MasterUserPassword='validate-only')
+    errors = []
+    for method, kwargs in parameter_group_requests(profile_name, profile) + [('create_db_instance', instance_request)]:
+        shape = service_model.operation_model(operations[method]).input_shape
+        report = validator.validate(kwargs, shape)
+        if report.has_errors():
+            errors.append(f"{method}: {report.generate_report()}")
+    # The limit checks assume well-typed settings
+    return errors or _check_limits(profile_name, profile)
+
+
+def ensure_parameter_group(rds, profile_name, profile):
+    """Create the profile's parameter group if needed, bring its parameters up to date and return its name"""
+    requests = parameter_group_requests(profile_name, profile)
+    method, kwargs = requests[0]
+    try:
+        getattr(rds, method)(**kwargs)
+        print(f"Created DB parameter group {kwargs['DBParameterGroupName']}")
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'DBParameterGroupAlreadyExists':
+            raise
+    for method, kwargs in requests[1:]:
+        getattr(rds, method)(**kwargs)
+    return kwargs['DBParameterGroupName']
+
+
+def prepare(rds, profile_name=DEFAULT_PROFILE, path=DEFAULT_PATH):
+    """Parameter group in place, then the create_db_instance settings for the profile"""
+    profile = get_profile(profile_name, path)
+    ensure_parameter_group(rds, profile_name, profile)
+    print(f"Using DB profile {profile_name}: {profile['description']}")
+    return instance_settings(profile_name, profile)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Feedback database performance profiles')
+    parser.add_argument('command', choices=['validate', 'show'])
+    parser.add_argument('profiles', nargs='*', help='profile names (default: all)')
+    parser.add_argument('--config', default=DEFAULT_PATH)
+    args = parser.parse_args()
+
+    profiles = load_profiles(args.config)
+    failed = False
+    for name in args.profiles or sorted(profiles):
+        if name not in profiles:
+            parser.error(f"unknown profile {name}")
+        profile = profiles[name]
+        if args.command == 'show':
+            print(f"# {name}: {profile['description']}")
+            for method, kwargs in parameter_group_requests(name, profile):
+                print(f"{method}({json.dumps(kwargs, indent=2)})")
+            print(f"create_db_instance({json.dumps(instance_settings(name, profile), indent=2)})\n")
+            continue
+        errors = validate(name, profile)
+        failed |= bool(errors)
+        print(f"{name:12} {'ok' if not errors else 'INVALID'}")
+        for error in errors:
+            print(f"    {error}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
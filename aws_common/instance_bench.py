@@ -0,0 +1,391 @@
+import argparse
+import json
+import math
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from botocore.exceptions import ClientError
+
+from aws_common import clients, waiting
+
+# Picks instance types by measured cost per unit of work instead of by habit (t2.micro
+# everywhere). run launches one instance per candidate type with the same fixed
+# workload in its user data: the feedback app with a local MariaDB under a fixed
+# submit/list mix, or the 08_HADOOP word count on a fixed corpus. Each instance prints
+# its result as one line on the serial console and then stops itself, and
+# get_console_output picks it up without SSH, IAM roles or open ports; then every
+# instance is terminated. Stopping matters: Xen types (t2 and older families) only post
+# console output around state changes, and only Nitro types can read it live.
+#
+# The run is saved as JSON, and analyze turns a saved run plus the local price table
+# (instance_prices.json) into cost per request or per job and a recommendation, with no
+# AWS access:
+#   python -m aws_common.instance_bench run wordcount t3.small t4g.small c6g.large --out run.json
+#   python -m aws_common.instance_bench analyze run.json --max-p99-ms 500 --throughput 200
+#
+# The load generator shares the instance with the app, so absolute throughput is lower
+# than a dedicated client would see; the comparison between types is what counts.
+#
+# Burstable types (t2, t3, t3a, t4g) run the short benchmark on launch credits, so their
+# result overstates what they sustain, and in unlimited mode surplus credits are billed
+# on top of the on-demand price analyze uses. They are marked as such and only
+# recommended with --include-burstable.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKLOADS_DIR = os.path.join(ROOT, 'aws_common', 'workloads')
+PRICES_PATH = os.environ.get('INSTANCE_PRICES', os.path.join(ROOT, 'aws_common', 'instance_prices.json'))
+RESULT_MARKER = 'BENCH_RESULT '
+FAILURE_MARKER = 'BENCH_FAILED'
+# Amazon Linux 2023, latest build per architecture
+IMAGE_PARAMETERS = {
+    'x86_64': '/aws/service/ami-amazon-linux-latest/al2023-ami-kernel-default-x86_64',
+    'arm64': '/aws/service/ami-amazon-linux-latest/al2023-ami-kernel-default-arm64',
+}
+# Results with more failed requests than this are not recommended
+MAX_ERROR_RATE = 0.01
+# For recorded runs from before the burstable flag was saved
+BURSTABLE_FAMILIES = ('t1', 't2', 't3', 't3a', 't4g')
+
+WORKLOADS = {
+    'feedback': {
+        'description': 'feedback app (gunicorn + local MariaDB), fixed submit/list mix',
+        'unit': 'request',
+        'cost_per': 1_000_000,
+        'timeout_minutes': 45,
+        'params': {'requests': 20000, 'warmup_requests': 1000, 'clients': 16, 'write_ratio': 0.1},
+    },
+    'wordcount': {
+        'description': '08_HADOOP streaming word count, one map task per vCPU',
+        'unit': 'job',
+        'cost_per': 1,
+        'timeout_minutes': 60,
+        'params': {'corpus_mb': 32, 'runs': 3},
+    },
+}
+
+
+def _read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def _embed(name, source):
+    return f"cat > {name} <<'{name.upper().replace('.', '_')}'\n{source.rstrip()}\n{name.upper().replace('.', '_')}\n"
+
+
+def _feedback_steps(params, app_url):
+    if not app_url:
+        raise ValueError('The feedback workload needs app_url: a URL of a zip of 07_BEANSTALK')
+    setup = f"""dnf install -y -q python3-pip mariadb105-server unzip
+systemctl start mariadb
+mysql -e "CREATE DATABASE IF NOT EXISTS feedback;
+    CREATE USER IF NOT EXISTS 'admin'@'localhost' IDENTIFIED BY 'password';
+    CREATE USER IF NOT EXISTS 'admin'@'127.0.0.1' IDENTIFIED BY 'password';
+    GRANT ALL ON feedback.* TO 'admin'@'localhost'; GRANT ALL ON feedback.* TO 'admin'@'127.0.0.1';"
+curl -sf -o app.zip '{app_url}'
+unzip -q -o app.zip -d app
+python3 -m venv app/venv
+app/venv/bin/pip install -q -r app/requirements.txt
+export RDS_HOSTNAME=127.0.0.1 RDS_USERNAME=admin RDS_PASSWORD=password RDS_DB_NAME=feedback RDS_PORT=3306
+# The benchmark client is one IP submitting as fast as it can
+export SUBMIT_IP_RATE_PER_MINUTE=1e9 SUBMIT_IP_BURST=1000000000
+export SUBMIT_EMAIL_RATE_PER_MINUTE=1e9 SUBMIT_EMAIL_BURST=1000000000
+(cd app && venv/bin/python migrate.py upgrade)
+(cd app && GUNICORN_WORKERS=$((2 * $(nproc) + 1)) PORT=8000 \\
+    venv/bin/gunicorn --config gunicorn.conf.py --daemon application:application)
+for attempt in $(seq 60); do curl -sf -o /dev/null http://127.0.0.1:8000/ && break; sleep 2; done
+curl -sf -o /dev/null http://127.0.0.1:8000/
+"""
+    run = (f"python3 feedback_mix.py --port 8000 --requests {params['requests']} "
+           f"--warmup-requests {params['warmup_requests']} --clients {params['clients']} "
+           f"--write-ratio {params['write_ratio']}")
+    return _embed('feedback_mix.py', _read(os.path.join(WORKLOADS_DIR, 'feedback_mix.py'))) + setup, run
+
+
+def _wordcount_steps(params, app_url):
+    setup = ''.join([
+        _embed('wordcount.py', _read(os.path.join(WORKLOADS_DIR, 'wordcount.py'))),
+        _embed('mapper.py', _read(os.path.join(ROOT, '08_HADOOP', 'mapper.py'))),
+        _embed('reducer.py', _read(os.path.join(ROOT, '08_HADOOP', 'reducer.py'))),
+    ])
+    run = (f"python3 wordcount.py --mapper mapper.py --reducer reducer.py "
+           f"--corpus-mb {params['corpus_mb']} --runs {params['runs']}")
+    return setup, run
+
+
+STEPS = {'feedback': _feedback_steps, 'wordcount': _wordcount_steps}
+
+
+def user_data(workload_name, params=None, app_url=None):
+    """Boot script that runs the workload once, prints its result to the serial console and stops"""
+    workload = WORKLOADS[workload_name]
+    params = dict(workload['params'], **(params or {}))
+    setup, run = STEPS[workload_name](params, app_url)
+    return f"""#!/bin/bash
+set -euo pipefail
+# Safety net in case the workload hangs; the instance stops rather than terminates
+shutdown -h +{workload['timeout_minutes'] + 15}
+# Stopping makes EC2 post the console output, which Xen instances do not do otherwise
+report() {{ echo "$1" > /dev/console; echo "$1" >> /var/log/instance-bench.log; shutdown -h now; }}
+trap 'report "{FAILURE_MARKER} at line $LINENO"' ERR
+mkdir -p /opt/bench
+cd /opt/bench
+{setup}
+{run} > result.json
+report "{RESULT_MARKER}$(cat result.json)"
+"""
+
+
+def instance_type_info(ec2, instance_types):
+    """{instance type: (architecture, nitro?, burstable?)} for the AMI, console output and report"""
+    info = {}
+    paginator = ec2.get_paginator('describe_instance_types')
+    for page in paginator.paginate(InstanceTypes=list(instance_types)):
+        for entry in page['InstanceTypes']:
+            architectures = entry['ProcessorInfo']['SupportedArchitectures']
+            architecture = 'x86_64' if 'x86_64' in architectures else 'arm64'
+            info[entry['InstanceType']] = (architecture, entry.get('Hypervisor') == 'nitro',
+                                           entry.get('BurstablePerformanceSupported', False))
+    missing = set(instance_types) - set(info)
+    if missing:
+        raise ValueError(f"Unknown instance types: {', '.join(sorted(missing))}")
+    return info
+
+
+def latest_images(ssm, architectures):
+    return {
+        architecture: ssm.get_parameter(Name=IMAGE_PARAMETERS[architecture])['Parameter']['Value']
+        for architecture in set(architectures)
+    }
+
+
+def parse_console(output):
+    """The result dict from console output, None while it is not there yet.
+
+    Raises RuntimeError when the boot script reported a failure.
+    """
+    for line in reversed((output or '').splitlines()):
+        if RESULT_MARKER in line:
+            return json.loads(line.split(RESULT_MARKER, 1)[1])
+        if FAILURE_MARKER in line:
+            raise RuntimeError(line[line.index(FAILURE_MARKER):].strip())
+    return None
+
+
+def failure(result):
+    """Why a reported result has nothing to measure, or None when it is usable"""
+    if not result.get('requests') or result.get('errors', 0) >= result['requests']:
+        return f"all {result.get('requests', 0)} requests failed"
+    if result.get('p50_ms') is None or result.get('p99_ms') is None:
+        return 'no latency percentiles reported'
+    return None
+
+
+def _ms(value, width):
+    return f"{value:{width}.1f}" if value is not None else f"{'-':>{width}}"
+
+
+def wait_for_result(ec2, instance_id, nitro, timeout, **wait_kwargs):
+    # Only Nitro instances can return the latest output; Xen ones post it when the boot
+    # script stops the instance after reporting
+    options = {'Latest': True} if nitro else {}
+
+    def check():
+        return parse_console(ec2.get_console_output(InstanceId=instance_id, **options).get('Output'))
+
+    return waiting.wait_until(check, timeout=timeout, initial=30, maximum=60,
+                              description=f"benchmark result from {instance_id}",
+                              retry_codes=('InvalidInstanceID.NotFound',), **wait_kwargs)
+
+
+def run_benchmark(ec2, ssm, workload_name, instance_types, params=None, app_url=None,
+                  security_group_ids=None, **wait_kwargs):
+    """Run the workload on one instance of each type at once and return the recorded run"""
+    workload = WORKLOADS[workload_name]
+    script = user_data(workload_name, params, app_url)
+    info = instance_type_info(ec2, instance_types)
+    images = latest_images(ssm, [architecture for architecture, _, _ in info.values()])
+    started_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+    launched = {}
+    try:
+        for instance_type in instance_types:
+            options = {'SecurityGroupIds': security_group_ids} if security_group_ids else {}
+            response = ec2.run_instances(
+                ImageId=images[info[instance_type][0]],
+                InstanceType=instance_type,
+                MinCount=1,
+                MaxCount=1,
+                UserData=script,
+                InstanceInitiatedShutdownBehavior='stop',
+                TagSpecifications=[{'ResourceType': 'instance', 'Tags': [
+                    {'Key': 'Name', 'Value': f"bench-{workload_name}-{instance_type}"},
+                ]}],
+                **options
+            )
+            launched[instance_type] = response['Instances'][0]['InstanceId']
+            print(f"Launched {instance_type}: {launched[instance_type]}")
+
+        def collect(instance_type):
+            entry = {'instance_type': instance_type, 'instance_id': launched[instance_type],
+                     'burstable': info[instance_type][2]}
+            try:
+                entry.update(wait_for_result(ec2, launched[instance_type], info[instance_type][1],
+                                             workload['timeout_minutes'] * 60, **wait_kwargs))
+                reason = failure(entry)
+                if reason:
+                    raise RuntimeError(reason)
+                print(f"{instance_type}: {entry['throughput']} {workload['unit']}s/s, p99 {entry['p99_ms']:.0f} ms")
+            # One bad instance must not cost the results of the others
+            except (RuntimeError, TimeoutError, ClientError, ValueError, KeyError) as e:
+                entry['error'] = str(e) or repr(e)
+                print(f"{instance_type}: {e}")
+            return entry
+
+        with ThreadPoolExecutor(max_workers=len(launched)) as pool:
+            results = list(pool.map(collect, instance_types))
+    finally:
+        if launched:
+            ec2.terminate_instances(InstanceIds=list(launched.values()))
+            print(f"Terminated {len(launched)} benchmark instance(s)")
+
+    return {
+        'workload': workload_name,
+        'region': ec2.meta.region_name,
+        'started_at': started_at,
+        'params': dict(workload['params'], **(params or {})),
+        'results': results,
+    }
+
+
+def load_prices(path=PRICES_PATH):
+    with open(path) as f:
+        return json.load(f)['hourly']
+
+
+def is_burstable(result):
+    return result.get('burstable', result['instance_type'].split('.')[0] in BURSTABLE_FAMILIES)
+
+
+def analyze(recorded, prices, region=None, max_p99_ms=None, min_throughput=None, include_burstable=False):
+    """Cost per unit of work for each measured type, and the types to pick.
+
+    Returns (rows, recommendations). A row is eligible when its error rate and p99 are
+    within bounds and, unless include_burstable, it is not a burstable type measured on
+    launch credits; min_throughput sizes a fleet of each type and prices it per hour.
+    """
+    workload = WORKLOADS[recorded['workload']]
+    region = region or recorded['region']
+    if region not in prices:
+        raise ValueError(f"No prices for {region}; add them to the price table")
+    rows = []
+    for result in recorded['results']:
+        # Runs saved before collect() checked for failure() have no 'error' of their own
+        reason = result.get('error') or failure(result)
+        if reason:
+            rows.append({'instance_type': result['instance_type'], 'error': reason, 'eligible': False})
+            continue
+        price = prices[region].get(result['instance_type'])
+        if price is None:
+            raise ValueError(f"No {region} price for {result['instance_type']}")
+        throughput = result['throughput']
+        error_rate = result['errors'] / result['requests'] if result['requests'] else 1.0
+        burstable = is_burstable(result)
+        row = {
+            'instance_type': result['instance_type'],
+            'burstable': burstable,
+            'price_per_hour': price,
+            'throughput': throughput,
+            'p50_ms': result['p50_ms'],
+            'p99_ms': result['p99_ms'],
+            'error_rate': error_rate,
+            'cost_per_unit': price / 3600 / throughput * workload['cost_per'] if throughput else math.inf,
+            'in_bounds': throughput > 0 and error_rate <= MAX_ERROR_RATE
+            and (max_p99_ms is None or result['p99_ms'] <= max_p99_ms),
+        }
+        row['eligible'] = row['in_bounds'] and (include_burstable or not burstable)
+        if min_throughput:
+            row['instances'] = math.ceil(min_throughput / throughput) if throughput else None
+            row['fleet_cost_per_hour'] = row['instances'] * price if throughput else math.inf
+        rows.append(row)
+
+    rows.sort(key=lambda row: row.get('cost_per_unit', math.inf))
+    eligible = [row for row in rows if row['eligible']]
+    recommendations = {}
+    if eligible:
+        recommendations['lowest cost per unit'] = eligible[0]['instance_type']
+        recommendations['lowest latency'] = min(eligible, key=lambda row: row['p99_ms'])['instance_type']
+        if min_throughput:
+            recommendations[f"cheapest fleet for {min_throughput:g} {workload['unit']}s/s"] = min(
+                eligible, key=lambda row: (row['fleet_cost_per_hour'], row['instances']))['instance_type']
+    return rows, recommendations
+
+
+def print_report(recorded, rows, recommendations):
+    workload = WORKLOADS[recorded['workload']]
+    per = f"$/{workload['cost_per']:,} {workload['unit']}s" if workload['cost_per'] > 1 else f"$/{workload['unit']}"
+    print(f"{recorded['workload']} on {recorded['region']}, {recorded['started_at']}: {workload['description']}")
+    print(f"{'type':12} {'$/hour':>8} {workload['unit'] + 's/s':>12} {'p50 ms':>9} {'p99 ms':>9} "
+          f"{'errors':>7} {per:>16} {'fleet':>12}")
+    for row in rows:
+        if 'error' in row:
+            print(f"{row['instance_type']:12} failed: {row['error']}")
+            continue
+        fleet = f"{row['instances']} x ${row['price_per_hour']:.4f}" if row.get('instances') else ''
+        notes = ([] if row['in_bounds'] else ['out of bounds']) + (['burstable'] if row['burstable'] else [])
+        suffix = f"  ({', '.join(notes)})" if notes else ''
+        print(f"{row['instance_type']:12} {row['price_per_hour']:8.4f} {row['throughput']:12.3f} "
+              f"{_ms(row['p50_ms'], 9)} {_ms(row['p99_ms'], 9)} {row['error_rate']:7.2%} {row['cost_per_unit']:16.4f} "
+              f"{fleet:>12}{suffix}")
+    print()
+    if any(row.get('burstable') for row in rows):
+        print("burstable: measured on launch credits, so throughput is above what the type sustains and "
+              "unlimited-mode credit charges are not in the price")
+    if not recommendations:
+        print("No measured type meets the bounds")
+    for reason, instance_type in recommendations.items():
+        print(f"{reason}: {instance_type}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cost/performance benchmark for choosing instance types')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run = commands.add_parser('run', help='benchmark instance types on AWS and save the results')
+    run.add_argument('workload', choices=sorted(WORKLOADS))
+    run.add_argument('instance_types', nargs='+')
+    run.add_argument('--region', default=os.environ.get('AWS_REGION', 'us-east-1'))
+    run.add_argument('--app-url', help='feedback workload: URL of an app bundle (07_BEANSTALK/.bundles), '
+                                    'e.g. a presigned S3 URL')
+    run.add_argument('--security-group-id', action='append', help='default: the VPC default group')
+    run.add_argument('--out', help='results file (default: bench-WORKLOAD-TIMESTAMP.json)')
+    report = commands.add_parser('analyze', help='cost per unit and recommendations from saved results')
+    report.add_argument('results')
+    report.add_argument('--prices', default=PRICES_PATH)
+    report.add_argument('--price-region', help='price the run with another region of the table')
+    report.add_argument('--max-p99-ms', type=float, help='only recommend types with a p99 at or below this')
+    report.add_argument('--throughput', type=float, help='size a fleet for this many units per second')
+    report.add_argument('--include-burstable', action='store_true',
+                        help='also recommend burstable types despite their launch-credit results')
+    args = parser.parse_args()
+
+    if args.command == 'analyze':
+        with open(args.results) as f:
+            recorded = json.load(f)
+        rows, recommendations = analyze(recorded, load_prices(args.prices), args.price_region,
+                                        args.max_p99_ms, args.throughput, args.include_burstable)
+        print_report(recorded, rows, recommendations)
+        return
+
+    recorded = run_benchmark(clients.client('ec2', args.region), clients.client('ssm', args.region),
+                             args.workload, args.instance_types, app_url=args.app_url,
+                             security_group_ids=args.security_group_id)
+    path = args.out or f"bench-{args.workload}-{datetime.now(timezone.utc):%Y%m%dT%H%M%S}.json"
+    with open(path, 'w') as f:
+        json.dump(recorded, f, indent=2)
+    print(f"Saved {path}; analyze it with: python -m aws_common.instance_bench analyze {path}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,275 @@
+import json
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+from botocore.exceptions import ClientError
+
+# On-disk cache of resource IDs the lab scripts look up on every run (security groups,
+# launch templates, AMIs, RDS endpoints). A cached ID is revalidated on every use with
+# something cheaper than the lookup it saves: one describe-by-ID, or for an RDS endpoint
+# a DNS lookup, which stops resolving once the instance is deleted. So a resource
+# deleted outside the scripts is found again or recreated instead of being handed out
+# dead; the TTL only bounds how long an entry without a validator is trusted. IAM role
+# ARNs are not cached: get_role is the only check and costs as much as the lookup. Misses use filtered, paginated describes rather
+# than the exception path of a failed create. Callers that get a NotFound error for a
+# cached ID from some other call wrap it in forget_on_not_found.
+
+DEFAULT_PATH = os.environ.get(
+    'AWS_LAB_REGISTRY', os.path.join(os.path.expanduser('~'), '.cache', 'aws-lab', 'registry.json')
+)
+DEFAULT_TTL = int(os.environ.get('AWS_LAB_REGISTRY_TTL', 24 * 3600))
+# Error codes that mean a cached ID points at a resource that no longer exists
+NOT_FOUND_CODES = (
+    'InvalidGroup.NotFound', 'InvalidGroupId.Malformed', 'InvalidLaunchTemplateId.NotFound',
+    'InvalidLaunchTemplateId.Malformed', 'InvalidAMIID.NotFound', 'InvalidAMIID.Unavailable',
+    'DBInstanceNotFound', 'NoSuchEntity',
+)
+
+
+class ResourceRegistry:
+    def __init__(self, path=DEFAULT_PATH, ttl=DEFAULT_TTL, clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary, 'w') as f:
+            json.dump(self._entries, f, indent=2, sort_keys=True)
+        os.replace(temporary, self.path)
+
+    def get(self, key):
+        """Return (value, fresh) for a cached key, or (None, False)"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None, False
+        return entry['value'], self.clock() < entry['expires']
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = {'value': value, 'expires': self.clock() + self.ttl}
+            self._save()
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._save()
+
+    def resolve(self, key, lookup, validate=None, create=None):
+        """Cached value for key, else lookup(), else create(); None if nothing found.
+
+        validate(value) re-checks a cached value on every call; without it the value is
+        trusted until its TTL runs out.
+        """
+        value, fresh = self.get(key)
+        if value is not None:
+            if validate is None:
+                if fresh:
+                    return value
+            elif validate(value):
+                if not fresh:
+                    self.put(key, value)
+                return value
+            else:
+                # Gone; drop it before lookup() so helpers sharing the cache don't reuse it
+                self.invalidate(key)
+        value = lookup()
+        if value is None and create is not None:
+            value = create()
+        if value is None:
+            self.invalidate(key)
+        else:
+            self.put(key, value)
+        return value
+
+
+_default = None
+
+
+def default_registry():
+    global _default
+    if _default is None:
+        _default = ResourceRegistry()
+    return _default
+
+
+def _region(client):
+    return client.meta.region_name
+
+
+def _exists(call, not_found_codes):
+    try:
+        return bool(call())
+    except ClientError as e:
+        if e.response['Error']['Code'] in not_found_codes:
+            return False
+        raise
+
+
+def security_group_key(ec2, group_name):
+    return f"security-group:{_region(ec2)}:{group_name}"
+
+
+def launch_template_key(ec2, template_name):
+    return f"launch-template:{_region(ec2)}:{template_name}"
+
+
+def db_endpoint_key(rds, identifier):
+    return f"db-endpoint:{_region(rds)}:{identifier}"
+
+
+def image_key(ec2, image_name):
+    return f"image:{_region(ec2)}:{image_name}"
+
+
+@contextmanager
+def forget_on_not_found(*keys, registry=None):
+    """Drop keys from the registry if the block fails because a resource no longer exists"""
+    try:
+        yield
+    except ClientError as e:
+        if e.response['Error']['Code'] in NOT_FOUND_CODES:
+            registry = registry or default_registry()
+            for key in keys:
+                registry.invalidate(key)
+        raise
+
+
+def _resolves(host):
+    try:
+        return bool(socket.getaddrinfo(host, None))
+    except socket.gaierror:
+        return False
+
+
+def _describe_groups(ec2, name, values):
+    paginator = ec2.get_paginator('describe_security_groups')
+    for page in paginator.paginate(Filters=[{'Name': name, 'Values': values}]):
+        yield from page['SecurityGroups']
+
+
+def security_group_ids(ec2, group_names, registry=None):
+    """Resolve many security group names with at most two filtered, paginated describes.
+
+    Cached IDs are checked together with one group-id describe; names whose ID is not
+    cached or no longer exists are then looked up together by name.
+    """
+    registry = registry or default_registry()
+    cached = {}
+    missing = []
+    for name in group_names:
+        value, _ = registry.get(security_group_key(ec2, name))
+        if value is not None:
+            cached[value] = name
+        else:
+            missing.append(name)
+    found = {}
+    if cached:
+        for group in _describe_groups(ec2, 'group-id', list(cached)):
+            found[cached.pop(group['GroupId'])] = group['GroupId']
+        for name in cached.values():
+            registry.invalidate(security_group_key(ec2, name))
+            missing.append(name)
+    if missing:
+        for group in _describe_groups(ec2, 'group-name', missing):
+            found[group['GroupName']] = group['GroupId']
+            registry.put(security_group_key(ec2, group['GroupName']), group['GroupId'])
+    return found
+
+
+def security_group_id(ec2, group_name, create=None, registry=None):
+    registry = registry or default_registry()
+    return registry.resolve(
+        security_group_key(ec2, group_name),
+        lookup=lambda: security_group_ids(ec2, [group_name], registry).get(group_name),
+        validate=lambda group_id: _exists(
+            lambda: ec2.describe_security_groups(GroupIds=[group_id])['SecurityGroups'],
+            ('InvalidGroup.NotFound',)
+        ),
+        create=create
+    )
+
+
+def launch_template_id(ec2, template_name, create=None, registry=None):
+    registry = registry or default_registry()
+
+    def lookup():
+        templates = ec2.describe_launch_templates(
+            Filters=[{'Name': 'launch-template-name', 'Values': [template_name]}]
+        )['LaunchTemplates']
+        return templates[0]['LaunchTemplateId'] if templates else None
+
+    return registry.resolve(
+        launch_template_key(ec2, template_name),
+        lookup=lookup,
+        validate=lambda template_id: _exists(
+            lambda: ec2.describe_launch_templates(LaunchTemplateIds=[template_id])['LaunchTemplates'],
+            ('InvalidLaunchTemplateId.NotFound', 'InvalidLaunchTemplateId.Malformed')
+        ),
+        create=create
+    )
+
+
+def db_endpoint(rds, identifier, registry=None):
+    """Endpoint address of an RDS instance, or None while it has none (or doesn't exist)"""
+    registry = registry or default_registry()
+
+    def lookup():
+        try:
+            instance = rds.describe_db_instances(DBInstanceIdentifier=identifier)['DBInstances'][0]
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'DBInstanceNotFound':
+                return None
+            raise
+        return instance.get('Endpoint', {}).get('Address')
+
+    # A deleted instance's endpoint stops resolving; callers that still hit one within
+    # the DNS TTL drop it with forget_on_not_found
+    return registry.resolve(db_endpoint_key(rds, identifier), lookup=lookup, validate=_resolves)
+
+
+def role_arn(iam, role_name):
+    """ARN of an IAM role, or None if it doesn't exist; one get_role call, not cached"""
+    try:
+        return iam.get_role(RoleName=role_name)['Role']['Arn']
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'NoSuchEntity':
+            return None
+        raise
+
+
+def image_id(ec2, image_name, create=None, registry=None):
+    """ID of an available AMI owned by this account with the given name"""
+    registry = registry or default_registry()
+
+    def lookup():
+        images = ec2.describe_images(
+            Owners=['self'],
+            Filters=[{'Name': 'name', 'Values': [image_name]}, {'Name': 'state', 'Values': ['available']}]
+        )['Images']
+        return images[0]['ImageId'] if images else None
+
+    def available(image):
+        images = ec2.describe_images(ImageIds=[image])['Images']
+        return bool(images) and images[0]['State'] == 'available'
+
+    return registry.resolve(
+        image_key(ec2, image_name),
+        lookup=lookup,
+        validate=lambda image: _exists(lambda: available(image), ('InvalidAMIID.NotFound', 'InvalidAMIID.Unavailable')),
+        create=create
+    )
@@ -0,0 +1,75 @@
+from botocore.exceptions import ClientError
+
+from aws_common import registry as resource_registry
+from aws_common import waiting
+
+# RDS read replicas for the feedback database. Replicas are named after their source
+# (feedback-db-replica-1, -2, ...), so re-running a deploy finds the ones it made before
+# instead of creating more. All missing replicas are requested at once and then waited
+# for together, since RDS builds them in parallel from the same snapshot. RDS gives a
+# new replica the default parameter group and VPC security group, so unless the caller
+# names them, both are copied from the source to keep the replicas configured like it.
+
+
+def replica_identifier(source, number):
+    return f"{source}-replica-{number}"
+
+
+def source_settings(rds, source):
+    """Parameter group and VPC security groups of the source instance"""
+    instance = rds.describe_db_instances(DBInstanceIdentifier=source)['DBInstances'][0]
+    groups = instance.get('DBParameterGroups', [])
+    return {
+        'parameter_group_name': groups[0]['DBParameterGroupName'] if groups else None,
+        'security_group_ids': [group['VpcSecurityGroupId'] for group in instance.get('VpcSecurityGroups', [])],
+    }
+
+
+def create_read_replicas(rds, source, count, instance_class=None, security_group_ids=None,
+                         parameter_group_name=None, timeout=3600, registry=None, **wait_kwargs):
+    """Endpoint addresses of count read replicas of source, creating the missing ones.
+
+    security_group_ids and parameter_group_name default to the source's. The source
+    needs automated backups (BackupRetentionPeriod > 0) to have replicas.
+    """
+    identifiers = [replica_identifier(source, number) for number in range(1, count + 1)]
+    pending = []
+    inherited = None
+    for identifier in identifiers:
+        if resource_registry.db_endpoint(rds, identifier, registry):
+            continue
+        if inherited is None:
+            inherited = source_settings(rds, source)
+        options = {}
+        if instance_class:
+            options['DBInstanceClass'] = instance_class
+        if security_group_ids or inherited['security_group_ids']:
+            options['VpcSecurityGroupIds'] = security_group_ids or inherited['security_group_ids']
+        if parameter_group_name or inherited['parameter_group_name']:
+            options['DBParameterGroupName'] = parameter_group_name or inherited['parameter_group_name']
+        try:
+            rds.create_db_instance_read_replica(
+                DBInstanceIdentifier=identifier,
+                SourceDBInstanceIdentifier=source,
+                PubliclyAccessible=True,
+                **options
+            )
+            print(f"Read replica {identifier} is being created...")
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'DBInstanceAlreadyExists':
+                raise
+        pending.append(identifier)
+
+    if pending:
+        def all_available():
+            statuses = [
+                rds.describe_db_instances(DBInstanceIdentifier=identifier)['DBInstances'][0]['DBInstanceStatus']
+                for identifier in pending
+            ]
+            return all(status == 'available' for status in statuses)
+
+        waiting.wait_until(all_available, timeout=timeout, initial=15, maximum=60,
+                           description=f"read replicas of {source}", retry_codes=('DBInstanceNotFound',),
+                           **wait_kwargs)
+        print(f"Read replicas {', '.join(pending)} are available.")
+    return [resource_registry.db_endpoint(rds, identifier, registry) for identifier in identifiers]
@@ -0,0 +1,86 @@
+import random
+import time
+from datetime import datetime, timezone
+
+from botocore.exceptions import ClientError
+
+# Shared polling helpers for the lab scripts: jittered exponential backoff bounded by a
+# deadline instead of fixed sleeps. Checks start fast (most resources are ready sooner
+# than a fixed 10 s sleep assumes) and back off so long waits make few API calls.
+# sleep and clock can be swapped out so the timing is testable against stubbed clients.
+
+
+def backoff_delays(initial=1.0, maximum=30.0, factor=2.0, rng=random):
+    """Endless jittered delays between half and all of an exponentially growing cap"""
+    cap = initial
+    while True:
+        yield rng.uniform(cap / 2, cap)
+        cap = min(maximum, cap * factor)
+
+
+def wait_until(check, timeout=600, initial=1.0, maximum=30.0, description='resource',
+               retry_codes=(), sleep=time.sleep, clock=time.monotonic):
+    """Call check() until it returns something truthy and return that value.
+
+    ClientErrors whose code is in retry_codes count as 'not ready yet'. Raises
+    TimeoutError once timeout seconds have passed.
+    """
+    deadline = clock() + timeout
+    for delay in backoff_delays(initial, maximum):
+        try:
+            result = check()
+            if result:
+                return result
+        except ClientError as e:
+            if e.response['Error']['Code'] not in retry_codes:
+                raise
+        remaining = deadline - clock()
+        if remaining <= 0:
+            raise TimeoutError(f"Timed out after {timeout}s waiting for {description}")
+        sleep(min(delay, remaining))
+
+
+def wait_for_role(iam_client, role_name, timeout=120, **kwargs):
+    """Wait until IAM returns the role and return its ARN"""
+    return wait_until(
+        lambda: iam_client.get_role(RoleName=role_name)['Role']['Arn'],
+        timeout=timeout, description=f"IAM role {role_name}", retry_codes=('NoSuchEntity',), **kwargs
+    )
+
+
+def wait_for_instance_profile(iam_client, profile_name, role_name, timeout=120, **kwargs):
+    """Wait until the instance profile exists and carries role_name"""
+    def check():
+        profile = iam_client.get_instance_profile(InstanceProfileName=profile_name)['InstanceProfile']
+        return any(role['RoleName'] == role_name for role in profile['Roles']) and profile_name
+
+    return wait_until(
+        check, timeout=timeout, description=f"instance profile {profile_name}",
+        retry_codes=('NoSuchEntity',), **kwargs
+    )
+
+
+class EnvironmentEvents:
+    """Polls describe_events for Elastic Beanstalk events newer than the last ones seen"""
+
+    def __init__(self, eb_client, application_name, environment_name, since=None):
+        self.eb_client = eb_client
+        self.application_name = application_name
+        self.environment_name = environment_name
+        self.since = since or datetime.now(timezone.utc)
+
+    def poll(self):
+        response = self.eb_client.describe_events(
+            ApplicationName=self.application_name,
+            EnvironmentName=self.environment_name,
+            StartTime=self.since
+        )
+        events = [event for event in response['Events'] if event['EventDate'] > self.since]
+        if events:
+            self.since = max(event['EventDate'] for event in events)
+        return sorted(events, key=lambda event: event['EventDate'])
+
+
+def print_events(events):
+    for event in events:
+        print(f"  {event['EventDate']:%H:%M:%S} {event['Severity']:5} {event['Message']}")
@@ -0,0 +1,113 @@
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+import urllib.parse
+
+# Closed-loop load for the feedback app, run on the benchmark instance next to it (see
+# instance_bench.py). The work is fixed rather than the duration: every instance type
+# serves the same sequence of submits and /all_feedbacks reads, so the table every read
+# renders grows identically everywhere and the only thing that differs is the time it
+# takes. Prints one JSON line with the totals. Standard library only.
+
+
+def operations(count, write_ratio, seed):
+    rng = random.Random(seed)
+    return ['submit' if rng.random() < write_ratio else 'list' for _ in range(count)]
+
+
+def request(conn, operation, number):
+    if operation == 'submit':
+        body = urllib.parse.urlencode({
+            'name': f"bench {number}",
+            'email': f"bench{number}@example.com",
+            'message': f"benchmark feedback number {number} about the service",
+        })
+        conn.request('POST', '/submit_feedback', body, {'Content-Type': 'application/x-www-form-urlencoded'})
+        expected = 302
+    else:
+        conn.request('GET', '/all_feedbacks')
+        expected = 200
+    response = conn.getresponse()
+    response.read()
+    return response.status == expected
+
+
+def run(port, ops, clients):
+    """Play ops from clients keep-alive connections; returns latencies per operation and errors"""
+    latencies = {'submit': [], 'list': []}
+    errors = [0]
+    lock = threading.Lock()
+    queue = iter(enumerate(ops))
+
+    def client():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        local = {'submit': [], 'list': []}
+        while True:
+            with lock:
+                item = next(queue, None)
+            if item is None:
+                break
+            number, operation = item
+            start = time.perf_counter()
+            try:
+                ok = request(conn, operation, number)
+            except (OSError, http.client.HTTPException):
+                ok = False
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            if ok:
+                local[operation].append(time.perf_counter() - start)
+            else:
+                with lock:
+                    errors[0] += 1
+        conn.close()
+        with lock:
+            for operation, values in local.items():
+                latencies[operation].extend(values)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0]
+
+
+def percentile_ms(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] * 1000 if values else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fixed submit/list mix against a local feedback app')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--warmup-requests', type=int, default=1000)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--write-ratio', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    run(args.port, operations(args.warmup_requests, args.write_ratio, args.seed + 1), args.clients)
+    ops = operations(args.requests, args.write_ratio, args.seed)
+    start = time.perf_counter()
+    latencies, errors = run(args.port, ops, args.clients)
+    seconds = time.perf_counter() - start
+    every = latencies['submit'] + latencies['list']
+    print(json.dumps({
+        'requests': len(ops),
+        'errors': errors,
+        'seconds': round(seconds, 3),
+        'throughput': round(len(every) / seconds, 2),
+        'p50_ms': percentile_ms(every, 0.50),
+        'p99_ms': percentile_ms(every, 0.99),
+        'submit_p99_ms': percentile_ms(latencies['submit'], 0.99),
+        'list_p99_ms': percentile_ms(latencies['list'], 0.99),
+    }))
+
+
+if __name__ == '__main__':
+    main()
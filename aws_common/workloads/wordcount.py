@@ -0,0 +1,92 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+# The Hadoop streaming word count from 08_HADOOP (mapper.py | sort | reducer.py) as a
+# single-node job for the benchmark instances (see instance_bench.py): the corpus is
+# split into one chunk per vCPU, the mappers run in parallel as Hadoop's map tasks
+# would, and one sort feeds the reducer. The corpus is generated from a fixed seed so
+# every instance type counts the same words. Prints one JSON line with the job times.
+
+
+def build_corpus(directory, megabytes, chunks, seed):
+    rng = random.Random(seed)
+    vocabulary = [f"word{index}" for index in range(50000)]
+    # Zipf-like frequencies, like real text
+    cum_weights = []
+    total = 0.0
+    for rank in range(len(vocabulary)):
+        total += 1 / (rank + 1)
+        cum_weights.append(total)
+    paths = [os.path.join(directory, f"chunk{number}.txt") for number in range(chunks)]
+    per_chunk = megabytes * 1024 * 1024 // chunks
+    for path in paths:
+        with open(path, 'w') as f:
+            written = 0
+            while written < per_chunk:
+                line = ' '.join(rng.choices(vocabulary, cum_weights=cum_weights, k=12)) + ' .\n'
+                f.write(line)
+                written += len(line)
+    return paths
+
+
+def run_job(paths, mapper, reducer, directory):
+    mapped = [f"{path}.mapped" for path in paths]
+    processes = []
+    for source, target in zip(paths, mapped):
+        with open(source) as stdin, open(target, 'w') as stdout:
+            processes.append(subprocess.Popen([sys.executable, mapper], stdin=stdin, stdout=stdout))
+    if any(process.wait() for process in processes):
+        raise RuntimeError('mapper failed')
+    env = dict(os.environ, LC_ALL='C')
+    sort = subprocess.Popen(['sort', f"--parallel={len(paths)}", '-S', '50%', '-T', directory] + mapped,
+                            stdout=subprocess.PIPE, env=env)
+    with open(os.path.join(directory, 'counts.txt'), 'w') as output:
+        reduce = subprocess.run([sys.executable, reducer], stdin=sort.stdout, stdout=output)
+    sort.stdout.close()
+    if sort.wait() or reduce.returncode:
+        raise RuntimeError('sort or reducer failed')
+    for path in mapped:
+        os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Timed single-node runs of the streaming word count')
+    parser.add_argument('--mapper', required=True)
+    parser.add_argument('--reducer', required=True)
+    parser.add_argument('--corpus-mb', type=int, default=256)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='wordcount')
+    paths = build_corpus(directory, args.corpus_mb, os.cpu_count() or 1, args.seed)
+    durations = []
+    errors = 0
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        try:
+            run_job(paths, args.mapper, args.reducer, directory)
+            durations.append(time.perf_counter() - start)
+        except RuntimeError:
+            errors += 1
+    durations.sort()
+    total = sum(durations)
+    print(json.dumps({
+        'requests': args.runs,
+        'errors': errors,
+        'seconds': round(total, 3),
+        'throughput': round(len(durations) / total, 6) if total else 0,
+        'p50_ms': durations[len(durations) // 2] * 1000 if durations else None,
+        'p99_ms': durations[-1] * 1000 if durations else None,
+        'mb_per_second': round(args.corpus_mb * len(durations) / total, 2) if total else 0,
+    }))
+
+
+if __name__ == '__main__':
+    main()
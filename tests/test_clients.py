@@ -0,0 +1,119 @@
+import json
+
+import boto3
+import pytest
+from botocore.awsrequest import AWSResponse
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from botocore.retries import bucket
+from botocore.stub import Stubber
+
+from aws_common import clients
+
+CREDENTIALS = {'aws_access_key_id': 'testing', 'aws_secret_access_key': 'testing'}
+THROTTLED = {'__type': 'com.amazonaws.dynamodb.v20120810#ThrottlingException', 'message': 'Rate exceeded'}
+
+
+class RawBody:
+    def __init__(self, body):
+        self.body = body
+
+    def stream(self, **kwargs):
+        yield self.body
+
+
+@pytest.fixture(autouse=True)
+def fresh_clients():
+    clients.reset()
+    yield
+    clients.reset()
+
+
+@pytest.fixture
+def retry_timing(monkeypatch):
+    """Backoff sleeps and rate limiter acquisitions, recorded instead of waited for"""
+    recorded = {'sleeps': [], 'acquired': 0}
+
+    def acquire(self, amount=1, block=True):
+        recorded['acquired'] += 1
+        return True
+
+    monkeypatch.setattr('time.sleep', recorded['sleeps'].append)
+    monkeypatch.setattr(bucket.TokenBucket, 'acquire', acquire)
+    return recorded
+
+
+def throttled_client(failures):
+    """A shared DynamoDB client whose first `failures` requests are throttled"""
+    client = clients.client('dynamodb', 'us-east-1', **CREDENTIALS)
+    attempts = []
+
+    def send(request, **kwargs):
+        attempts.append(request.url)
+        if len(attempts) <= failures:
+            status, body = 400, THROTTLED
+        else:
+            status, body = 200, {'TableNames': ['feedback']}
+        return AWSResponse(request.url, status, {'content-type': 'application/x-amz-json-1.0'},
+                           RawBody(json.dumps(body).encode()))
+
+    client.meta.events.register('before-send.dynamodb', send)
+    return client, attempts
+
+
+def test_default_config_uses_adaptive_retries():
+    config = clients.client('ec2', 'us-east-1', **CREDENTIALS).meta.config
+    # botocore counts max_attempts as retries after the first attempt
+    assert config.retries == {'mode': 'adaptive', 'total_max_attempts': clients.MAX_ATTEMPTS + 1}
+    assert config.max_pool_connections == clients.MAX_POOL_CONNECTIONS
+    assert config.connect_timeout == clients.CONNECT_TIMEOUT
+    assert config.read_timeout == clients.READ_TIMEOUT
+
+
+def test_config_overrides_keep_the_retry_mode():
+    config = clients.client('ec2', 'us-east-1', config=Config(read_timeout=5), **CREDENTIALS).meta.config
+    assert config.read_timeout == 5
+    assert config.retries['mode'] == 'adaptive'
+
+
+def test_throttled_calls_are_retried_with_backoff(retry_timing):
+    client, attempts = throttled_client(failures=2)
+
+    assert client.list_tables()['TableNames'] == ['feedback']
+
+    assert len(attempts) == 3
+    assert len(retry_timing['sleeps']) == 2
+    # Full-jitter exponential backoff, capped by botocore at 20 s
+    assert all(0 <= seconds <= 20 for seconds in retry_timing['sleeps'])
+    # Adaptive mode turns the client-side rate limiter on at the first throttling error,
+    # and every retry then waits for a token from it
+    assert retry_timing['acquired'] == 2
+
+
+def test_throttling_gives_up_after_max_attempts(retry_timing):
+    client, attempts = throttled_client(failures=100)
+
+    with pytest.raises(ClientError) as raised:
+        client.list_tables()
+
+    assert raised.value.response['Error']['Code'] == 'ThrottlingException'
+    assert len(attempts) == clients.MAX_ATTEMPTS + 1
+    assert len(retry_timing['sleeps']) == clients.MAX_ATTEMPTS
+
+
+def test_clients_are_shared_per_service_and_region():
+    ec2 = clients.client('ec2', 'us-east-1', **CREDENTIALS)
+    assert clients.client('ec2', 'us-east-1', **CREDENTIALS) is ec2
+    assert clients.client('ec2', 'eu-west-1', **CREDENTIALS) is not ec2
+    assert clients.client('ec2', 'us-east-1', config=Config(read_timeout=5), **CREDENTIALS) is not ec2
+
+
+def test_lazy_client_uses_a_stubbed_client():
+    s3 = boto3.client('s3', region_name='us-east-1', **CREDENTIALS)
+    clients.use('s3', s3, 'us-east-1')
+    lazy = clients.lazy_client('s3', 'us-east-1')
+
+    with Stubber(s3) as stubber:
+        stubber.add_response('list_buckets', {'Buckets': [{'Name': 'site-bucket'}]})
+        assert [b['Name'] for b in lazy.list_buckets()['Buckets']] == ['site-bucket']
+        stubber.assert_no_pending_responses()
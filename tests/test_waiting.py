@@ -0,0 +1,130 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+from botocore.stub import Stubber
+
+from aws_common import waiting
+
+ROLE_ARN = 'arn:aws:iam::123456789012:role/WebServerInstanceRole'
+
+
+class FakeClock:
+    """Monotonic clock that only moves when sleep() is called"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def iam():
+    client = boto3.client('iam', region_name='us-east-1',
+                          aws_access_key_id='testing', aws_secret_access_key='testing')
+    with Stubber(client) as stubber:
+        client.stubber = stubber
+        yield client
+
+
+def role_response(name='WebServerInstanceRole'):
+    return {'Role': {'Path': '/', 'RoleName': name, 'RoleId': 'AROAEXAMPLEROLEID01', 'Arn': ROLE_ARN,
+                     'CreateDate': datetime(2024, 1, 1, tzinfo=timezone.utc)}}
+
+
+def test_backoff_delays_grow_exponentially_with_jitter_and_cap():
+    delays = waiting.backoff_delays(initial=1.0, maximum=10.0, rng=random.Random(1))
+    caps = [1, 2, 4, 8, 10, 10, 10]
+    for cap in caps:
+        assert cap / 2 <= next(delays) <= cap
+
+
+def test_wait_for_role_retries_until_the_role_is_visible(iam, clock):
+    for _ in range(3):
+        iam.stubber.add_client_error('get_role', 'NoSuchEntity', expected_params={'RoleName': 'WebServerInstanceRole'})
+    iam.stubber.add_response('get_role', role_response(), {'RoleName': 'WebServerInstanceRole'})
+
+    arn = waiting.wait_for_role(iam, 'WebServerInstanceRole', sleep=clock.sleep, clock=clock)
+
+    assert arn == ROLE_ARN
+    iam.stubber.assert_no_pending_responses()
+    # One jittered sleep per miss, each within half to all of 1, 2 and 4 seconds
+    assert len(clock.sleeps) == 3
+    for seconds, cap in zip(clock.sleeps, [1, 2, 4]):
+        assert cap / 2 <= seconds <= cap
+
+
+def test_wait_until_stops_at_the_deadline(iam, clock):
+    for _ in range(20):
+        iam.stubber.add_client_error('get_role', 'NoSuchEntity')
+
+    with pytest.raises(TimeoutError, match='IAM role WebServerInstanceRole'):
+        waiting.wait_for_role(iam, 'WebServerInstanceRole', timeout=10, maximum=4,
+                              sleep=clock.sleep, clock=clock)
+
+    # The last sleep is cut short so the wait ends exactly at the deadline
+    assert clock.now == pytest.approx(10)
+    assert max(clock.sleeps) <= 4
+    # Backing off keeps the call count well below one call per second
+    assert len(clock.sleeps) + 1 < 10
+
+
+def test_wait_until_raises_errors_it_does_not_retry(iam, clock):
+    iam.stubber.add_client_error('get_role', 'AccessDenied', http_status_code=403)
+
+    with pytest.raises(ClientError) as raised:
+        waiting.wait_for_role(iam, 'WebServerInstanceRole', sleep=clock.sleep, clock=clock)
+
+    assert raised.value.response['Error']['Code'] == 'AccessDenied'
+    assert clock.sleeps == []
+
+
+def test_wait_for_instance_profile_waits_for_the_role(iam, clock):
+    def profile(roles):
+        return {'InstanceProfile': {
+            'Path': '/', 'InstanceProfileName': 'WebServerInstanceRole', 'InstanceProfileId': 'AIPAEXAMPLEPROFILE01',
+            'Arn': 'arn:aws:iam::123456789012:instance-profile/WebServerInstanceRole',
+            'CreateDate': datetime(2024, 1, 1, tzinfo=timezone.utc), 'Roles': roles,
+        }}
+
+    iam.stubber.add_client_error('get_instance_profile', 'NoSuchEntity')
+    iam.stubber.add_response('get_instance_profile', profile([]))
+    iam.stubber.add_response('get_instance_profile', profile([role_response()['Role']]))
+
+    name = waiting.wait_for_instance_profile(iam, 'WebServerInstanceRole', 'WebServerInstanceRole',
+                                             sleep=clock.sleep, clock=clock)
+
+    assert name == 'WebServerInstanceRole'
+    assert len(clock.sleeps) == 2
+    iam.stubber.assert_no_pending_responses()
+
+
+def test_environment_events_returns_each_event_once():
+    eb = boto3.client('elasticbeanstalk', region_name='us-east-1',
+                      aws_access_key_id='testing', aws_secret_access_key='testing')
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    first = {'EventDate': start + timedelta(seconds=5), 'Message': 'createEnvironment is starting.',
+             'Severity': 'INFO'}
+    second = {'EventDate': start + timedelta(seconds=9), 'Message': 'Created EIP.', 'Severity': 'INFO'}
+    events = waiting.EnvironmentEvents(eb, 'feedback-app2', 'feedback-env2', since=start)
+
+    with Stubber(eb) as stubber:
+        stubber.add_response('describe_events', {'Events': [second, first]},
+                             {'ApplicationName': 'feedback-app2', 'EnvironmentName': 'feedback-env2',
+                              'StartTime': start})
+        stubber.add_response('describe_events', {'Events': [second]})
+        assert [event['Message'] for event in events.poll()] == ['createEnvironment is starting.', 'Created EIP.']
+        assert events.poll() == []